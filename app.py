@@ -1,20 +1,36 @@
-from flask import Flask, render_template, abort, request, jsonify, redirect, url_for, send_file
+from flask import Flask, render_template, abort, request, jsonify, redirect, url_for, send_file, g, has_app_context
 from settings import DIARY_PERIOD_BASE_DATE, DIARY_PERIOD_MONTH_SPAN
 from lab import lab_bp
+import db
+import migrations
+import ogp
+import timeline_images
+import click
+import hashlib
 import html
 import ipaddress
 import io
 import json
+import multiprocessing
 import os
+import queue
 import re
 import secrets
+import shutil
 import socket
 import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
 from contextlib import suppress
+from dataclasses import dataclass
 from datetime import datetime, timezone
+from itertools import zip_longest
 from zoneinfo import ZoneInfo
 from urllib.error import URLError, HTTPError
-from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 from urllib.request import Request, urlopen
 
 try:
@@ -24,30 +40,20 @@ except ImportError:
     ImageOps = None
     UnidentifiedImageError = Exception
 
-try:
-    from pillow_heif import open_heif, register_heif_opener
-except ImportError:
-    open_heif = None
-    register_heif_opener = None
-
 try:
     from google.oauth2 import credentials as google_oauth_credentials
     from google.oauth2 import service_account
     from googleapiclient.discovery import build
     from googleapiclient.errors import HttpError
-    from googleapiclient.http import MediaIoBaseUpload
+    from googleapiclient.http import MediaIoBaseDownload, MediaIoBaseUpload
 except ImportError:
     google_oauth_credentials = None
     service_account = None
     build = None
     HttpError = None
+    MediaIoBaseDownload = None
     MediaIoBaseUpload = None
 
-try:
-    import psycopg
-except ImportError:
-    psycopg = None
-
 app = Flask(__name__)
 app.json.ensure_ascii = False
 
@@ -58,18 +64,49 @@ TAG_PATTERN = re.compile(r"#([0-9A-Za-z_ぁ-んァ-ヶ一-龠ー]+)")
 URL_PATTERN = re.compile(r"(https?://[^\s<>'\"`]+)")
 TOKYO_TZ = ZoneInfo("Asia/Tokyo")
 OGP_CACHE_TTL_SECONDS = 60 * 60 * 24
+LINK_PREVIEW_QUEUE_MAX = 256
+LINK_PREVIEW_BATCH_SIZE = 200
+LINK_PREVIEW_FETCH_CONCURRENCY = 8
+LINK_PREVIEW_FETCH_PER_HOST = 2
+LINK_PREVIEW_FETCH_TIMEOUT_SECONDS = 5
+LINK_PREVIEW_BATCH_DEADLINE_SECONDS = 15
+LINK_PREVIEW_RETRY_BASE_SECONDS = 5 * 60
+LINK_PREVIEW_RETRY_MAX_SECONDS = 60 * 60 * 24 * 7
+LINK_PREVIEW_BREAKER_THRESHOLD = 3
+LINK_PREVIEW_BREAKER_COOLDOWN_SECONDS = 10 * 60
+LINK_PREVIEW_MEMORY_MAX_ENTRIES = 1024
+LINK_PREVIEW_MEMORY_TTL_SECONDS = 10 * 60
+LINK_PREVIEW_MAX_ROWS = int(os.getenv("LINK_PREVIEW_MAX_ROWS", "5000"))
+LINK_PREVIEW_TOUCH_FLUSH_SECONDS = 60
+LINK_PREVIEW_PRUNE_INTERVAL_SECONDS = 60 * 60
+# Link cards show a 72px square; 2x covers high-density screens.
+LINK_PREVIEW_IMAGE_SIZE = 144
+LINK_PREVIEW_IMAGE_MAX_BYTES = 5 * 1024 * 1024
+LINK_PREVIEW_IMAGE_WEBP_QUALITY = 80
+LINK_PREVIEW_IMAGE_CACHE_DIR = os.getenv("LINK_PREVIEW_IMAGE_CACHE_DIR") or os.path.join(app.root_path, "preview_image_cache")
+LINK_PREVIEW_IMAGE_CACHE_MAX_BYTES = int(os.getenv("LINK_PREVIEW_IMAGE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
 FETCH_USER_AGENT = "Mozilla/5.0 (compatible; diary-timeline-bot/1.0; +https://diary.aaaaaso.com)"
-MYTIMELINE_IMAGE_MAX_BYTES = 8 * 1024 * 1024
-MYTIMELINE_IMAGE_MAX_DIMENSION = 1600
-MYTIMELINE_JPEG_QUALITY = 82
-MYTIMELINE_WEBP_QUALITY = 80
-MYTIMELINE_ALLOWED_IMAGE_FORMATS = {"JPEG", "PNG", "WEBP", "GIF", "HEIF", "HEIC"}
+MYTIMELINE_IMAGE_MAX_BYTES = timeline_images.MAX_BYTES
+MYTIMELINE_ALLOWED_IMAGE_FORMATS = timeline_images.ALLOWED_FORMATS
 DRIVE_UPLOAD_SCOPES = ("https://www.googleapis.com/auth/drive",)
 LOCAL_TIMELINE_UPLOAD_DIR = os.path.join(app.root_path, "timeline_uploads")
-
-if register_heif_opener is not None:
-    register_heif_opener()
-
+# Raw uploads wait here until the background image worker has normalized and stored them.
+TIMELINE_IMAGE_PENDING_DIR = os.getenv("TIMELINE_IMAGE_PENDING_DIR") or os.path.join(app.root_path, "timeline_image_pending")
+TIMELINE_IMAGE_WORKERS = int(os.getenv("TIMELINE_IMAGE_WORKERS", "1"))
+TIMELINE_IMAGE_CACHE_DIR = os.getenv("TIMELINE_IMAGE_CACHE_DIR") or os.path.join(app.root_path, "timeline_image_cache")
+TIMELINE_IMAGE_CACHE_MAX_BYTES = int(os.getenv("TIMELINE_IMAGE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+IMMUTABLE_CACHE_SECONDS = 60 * 60 * 24 * 365
+# Cached files are touched at most this often on hits; their mtime is the LRU clock.
+DISK_CACHE_TOUCH_SECONDS = 60 * 60
+# Bump when _render_diary_html output changes so stored body_html is re-rendered.
+DIARY_RENDER_VERSION = 1
+DIARY_SEARCH_PER_PAGE = 20
+DIARY_SEARCH_MAX_TERMS = 5
+DIARY_SEARCH_SNIPPET_RADIUS = 40
+TIMELINE_FIRST_PAGE_SIZE = 20
+TIMELINE_PAGE_SIZE = 50
+DIARY_PAGE_CACHE_MAX_ENTRIES = 64
+DIARY_PAGE_CACHE_REVALIDATE_SECONDS = 60
 
 def _timeline_database_url() -> str:
     return os.getenv("MYTIMELINE_DATABASE_URL") or os.getenv("DATABASE_URL", "")
@@ -121,8 +158,7 @@ def _timeline_image_upload_enabled() -> bool:
     return Image is not None
 
 
-class TimelineImageError(ValueError):
-    pass
+TimelineImageError = timeline_images.TimelineImageError
 
 
 def _timeline_image_error(message: str) -> ValueError:
@@ -163,91 +199,45 @@ def _get_drive_service():
     return build("drive", "v3", credentials=credentials, cache_discovery=False)
 
 
-def _normalize_uploaded_image(file_storage):
+def _read_uploaded_image(file_storage):
     if not file_storage or not getattr(file_storage, "filename", ""):
         return None
     if Image is None:
         raise RuntimeError("Pillow is not installed. Install requirements.txt first.")
 
-    raw_bytes = file_storage.read()
-    file_storage.stream.seek(0)
+    # Werkzeug already spools large request files to disk; measure and sniff the
+    # stream in place instead of copying the whole upload into memory.
+    stream = file_storage.stream
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(0)
 
-    if not raw_bytes:
+    if not size:
         return None
-    if len(raw_bytes) > MYTIMELINE_IMAGE_MAX_BYTES:
+    if size > MYTIMELINE_IMAGE_MAX_BYTES:
         raise _timeline_image_error("画像は8MB以内にしてください。")
 
-    image_extension = os.path.splitext(file_storage.filename or "")[1].lower()
-    force_heif = image_extension in {".heic", ".heif"} or (file_storage.mimetype or "").lower() in {"image/heic", "image/heif"}
-
-    try:
-        if force_heif:
-            if open_heif is None:
-                raise _timeline_image_error("HEIC / HEIF を扱う設定が不足しています。")
-            image = open_heif(io.BytesIO(raw_bytes)).to_pillow()
-            image_format = "HEIF"
-        else:
-            with Image.open(io.BytesIO(raw_bytes)) as verified:
-                image_format = (verified.format or "").upper()
-                verified.verify()
-            image = Image.open(io.BytesIO(raw_bytes))
-            if not image_format:
-                image_format = (image.format or "").upper()
-
-        with image:
-            if image_format not in MYTIMELINE_ALLOWED_IMAGE_FORMATS:
-                raise _timeline_image_error("画像は JPEG / PNG / WEBP / GIF / HEIC / HEIF のみ対応です。")
-            if image_format == "GIF":
-                width, height = image.size
-                normalized_bytes = raw_bytes
-                mime_type = Image.MIME.get(image_format, file_storage.mimetype or "application/octet-stream")
-            else:
-                working = ImageOps.exif_transpose(image) if ImageOps is not None else image.copy()
-                if working.mode not in {"RGB", "RGBA"}:
-                    if "A" in working.getbands():
-                        working = working.convert("RGBA")
-                    else:
-                        working = working.convert("RGB")
-
-                working.thumbnail(
-                    (MYTIMELINE_IMAGE_MAX_DIMENSION, MYTIMELINE_IMAGE_MAX_DIMENSION),
-                    Image.Resampling.LANCZOS,
-                )
-                width, height = working.size
-
-                output = io.BytesIO()
-                has_alpha = "A" in working.getbands()
-                if has_alpha:
-                    working.save(output, format="WEBP", quality=MYTIMELINE_WEBP_QUALITY, method=6)
-                    image_format = "WEBP"
-                else:
-                    if working.mode != "RGB":
-                        working = working.convert("RGB")
-                    working.save(
-                        output,
-                        format="JPEG",
-                        quality=MYTIMELINE_JPEG_QUALITY,
-                        optimize=True,
-                        progressive=True,
-                    )
-                    image_format = "JPEG"
-                normalized_bytes = output.getvalue()
-                mime_type = Image.MIME.get(image_format, file_storage.mimetype or "application/octet-stream")
-    except TimelineImageError:
-        raise
-    except (UnidentifiedImageError, ValueError, EOFError, SyntaxError, RuntimeError, OSError) as exc:
-        raise _timeline_image_error("画像ファイルを読み取れませんでした。") from exc
-
-    if len(normalized_bytes) > MYTIMELINE_IMAGE_MAX_BYTES:
-        raise _timeline_image_error("圧縮後も画像サイズが大きすぎます。もう少し小さい画像を使ってください。")
-
-    return {
-        "bytes": normalized_bytes,
-        "mime_type": mime_type,
-        "width": int(width),
-        "height": int(height),
+    upload = {
+        "stream": stream,
         "filename": os.path.basename(file_storage.filename or "upload"),
+        "mimetype": file_storage.mimetype or "",
     }
+    # Only the header is checked here so the request can answer at once; decoding,
+    # resizing and storage run in the background image worker.
+    if timeline_images.is_heif_upload(upload["filename"], upload["mimetype"]):
+        if not timeline_images.HEIF_SUPPORTED:
+            raise _timeline_image_error("HEIC / HEIF を扱う設定が不足しています。")
+        return upload
+    try:
+        with Image.open(stream) as image:
+            image_format = (image.format or "").upper()
+    except (UnidentifiedImageError, ValueError, EOFError, SyntaxError, OSError) as exc:
+        raise _timeline_image_error("画像ファイルを読み取れませんでした。") from exc
+    finally:
+        stream.seek(0)
+    if image_format not in MYTIMELINE_ALLOWED_IMAGE_FORMATS:
+        raise _timeline_image_error("画像は JPEG / PNG / WEBP / GIF / HEIC / HEIF のみ対応です。")
+    return upload
 
 
 def _upload_image_to_drive(image_payload: dict):
@@ -284,6 +274,8 @@ def _upload_image_to_drive(image_payload: dict):
 def _timeline_local_image_filename(mime_type: str) -> str:
     if mime_type == "image/webp":
         extension = ".webp"
+    elif mime_type == "image/avif":
+        extension = ".avif"
     elif mime_type == "image/gif":
         extension = ".gif"
     else:
@@ -312,7 +304,7 @@ def _store_image_locally(image_payload: dict):
     }
 
 
-def _store_timeline_image(image_payload: dict):
+def _store_timeline_image_file(image_payload: dict):
     if _timeline_drive_folder_id():
         try:
             return _upload_image_to_drive(image_payload)
@@ -321,6 +313,45 @@ def _store_timeline_image(image_payload: dict):
     return _store_image_locally(image_payload)
 
 
+def _store_timeline_image_variants(variant_payloads):
+    stored = []
+    try:
+        for payload in variant_payloads:
+            stored.append(_store_timeline_image_file(payload))
+    except Exception as exc:
+        # Variants only save bandwidth; keep the post and let backfill-image-variants retry later.
+        app.logger.warning("Failed to store image variants: %s", exc)
+        _delete_timeline_images(meta["drive_file_id"] for meta in stored)
+        return []
+    return stored
+
+
+def _store_timeline_image(image_payload: dict):
+    image_meta = _store_timeline_image_file(image_payload)
+    image_meta["variants"] = _store_timeline_image_variants(image_payload.get("variants") or [])
+    return image_meta
+
+
+def _timeline_post_image_meta(post) -> dict:
+    return {
+        "drive_file_id": post.get("image_drive_file_id", ""),
+        "mime_type": post.get("image_mime_type", ""),
+        "width": post.get("image_width"),
+        "height": post.get("image_height"),
+        "variants": post.get("image_variants") or [],
+        "status": post.get("image_status", ""),
+        "upload": post.get("image_upload") or {},
+    }
+
+
+def _timeline_image_file_ids(image_meta):
+    if not image_meta:
+        return []
+    file_ids = [image_meta.get("drive_file_id", "")]
+    file_ids.extend(variant.get("drive_file_id", "") for variant in image_meta.get("variants") or [])
+    return [file_id for file_id in file_ids if file_id]
+
+
 def _delete_timeline_image(file_id: str) -> None:
     if not file_id:
         return
@@ -328,6 +359,8 @@ def _delete_timeline_image(file_id: str) -> None:
         with suppress(FileNotFoundError):
             os.remove(_timeline_local_image_path(file_id))
         return
+    with suppress(FileNotFoundError):
+        os.remove(_timeline_image_cache_path(file_id))
     try:
         service = _get_drive_service()
         service.files().delete(fileId=file_id, supportsAllDrives=True).execute()
@@ -335,12 +368,112 @@ def _delete_timeline_image(file_id: str) -> None:
         app.logger.warning("Failed to delete Drive image %s: %s", file_id, exc)
 
 
-def _download_timeline_image(file_id: str) -> bytes:
-    if file_id.startswith("local:"):
-        with open(_timeline_local_image_path(file_id), "rb") as f:
-            return f.read()
+def _delete_timeline_images(file_ids) -> None:
+    for file_id in file_ids:
+        _delete_timeline_image(file_id)
+
+
+_disk_cache_lock = threading.Lock()
+_disk_cache_bytes = {}
+
+
+def _disk_cache_path(cache_dir: str, key: str, extension: str = "") -> str:
+    return os.path.join(cache_dir, key[:2], f"{key}{extension}")
+
+
+def _disk_cache_files(cache_dir: str):
+    files = []
+    with suppress(FileNotFoundError):
+        for entry in os.scandir(cache_dir):
+            if not entry.is_dir():
+                continue
+            for child in os.scandir(entry.path):
+                with suppress(FileNotFoundError):
+                    stat = child.stat()
+                    files.append((stat.st_mtime, stat.st_size, child.path))
+    return files
+
+
+def _prune_disk_cache(cache_dir: str, max_bytes: int):
+    # File mtimes double as the LRU clock: hits touch them, so the oldest are the least recently served.
+    files = _disk_cache_files(cache_dir)
+    total = sum(size for _, size, _ in files)
+    # Evict down to 90% so a full cache does not rescan on every new file.
+    target = max_bytes * 9 // 10
+    removed = 0
+    for _, size, path in sorted(files):
+        if total <= target:
+            break
+        with suppress(FileNotFoundError):
+            os.remove(path)
+            removed += 1
+        total -= size
+    return total, removed
+
+
+def _disk_cache_added(cache_dir: str, added_bytes: int, max_bytes: int) -> None:
+    with _disk_cache_lock:
+        total = _disk_cache_bytes.get(cache_dir)
+        if total is None:
+            total = sum(size for _, size, _ in _disk_cache_files(cache_dir))
+        else:
+            total += added_bytes
+        if total > max_bytes:
+            total, removed = _prune_disk_cache(cache_dir, max_bytes)
+            app.logger.info("Evicted %d files from %s", removed, cache_dir)
+        _disk_cache_bytes[cache_dir] = total
+
+
+def _touch_disk_cache_file(path: str) -> None:
+    with suppress(OSError):
+        if time.time() - os.stat(path).st_mtime > DISK_CACHE_TOUCH_SECONDS:
+            os.utime(path, None)
+
+
+def _timeline_image_key(file_id: str) -> str:
+    # Drive files are never rewritten in place (edits upload a new file), so the id pins the bytes.
+    return hashlib.sha256(file_id.encode("utf-8")).hexdigest()[:32]
+
+
+def _timeline_image_cache_path(file_id: str) -> str:
+    return _disk_cache_path(TIMELINE_IMAGE_CACHE_DIR, _timeline_image_key(file_id))
+
+
+def _download_drive_image(file_id: str, target_path: str) -> int:
+    if MediaIoBaseDownload is None:
+        raise RuntimeError("Google Drive dependencies are not installed. Install requirements.txt first.")
     service = _get_drive_service()
-    return service.files().get_media(fileId=file_id, supportsAllDrives=True).execute()
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    tmp_path = f"{target_path}.{secrets.token_hex(4)}.tmp"
+    try:
+        # Stream straight to disk so a large image never sits in memory.
+        with open(tmp_path, "wb") as f:
+            downloader = MediaIoBaseDownload(f, service.files().get_media(fileId=file_id, supportsAllDrives=True))
+            done = False
+            while not done:
+                _, done = downloader.next_chunk()
+            size = f.tell()
+        os.replace(tmp_path, target_path)
+    except BaseException:
+        with suppress(FileNotFoundError):
+            os.remove(tmp_path)
+        raise
+    return size
+
+
+def _timeline_image_path(file_id: str) -> str:
+    if file_id.startswith("local:"):
+        path = _timeline_local_image_path(file_id)
+        if not os.path.isfile(path):
+            raise FileNotFoundError(path)
+        return path
+    path = _timeline_image_cache_path(file_id)
+    if os.path.exists(path):
+        _touch_disk_cache_file(path)
+        return path
+    size = _download_drive_image(file_id, path)
+    _disk_cache_added(TIMELINE_IMAGE_CACHE_DIR, size, TIMELINE_IMAGE_CACHE_MAX_BYTES)
+    return path
 
 
 def _postgres_conninfo() -> str:
@@ -354,13 +487,21 @@ def _postgres_conninfo() -> str:
 
 def _open_timeline_db():
     if _timeline_db_kind() == "postgres":
-        if psycopg is None:
-            raise RuntimeError("psycopg is required when using PostgreSQL. Install dependencies from requirements.txt.")
-        return psycopg.connect(_postgres_conninfo())
+        return db.postgres_connection(_postgres_conninfo())
+    return db.sqlite_connection(SQLITE_PATH)
+
 
-    conn = sqlite3.connect(SQLITE_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+def _timeline_auto_migrate_enabled() -> bool:
+    return os.getenv("MYTIMELINE_AUTO_MIGRATE", "1").strip().lower() not in {"0", "false", "no", "off"}
+
+
+def _run_migrations():
+    kind = _timeline_db_kind()
+    with _open_timeline_db() as conn:
+        applied = migrations.apply_migrations(conn, kind)
+    for version in applied:
+        app.logger.info("Applied schema migration %s", version)
+    return applied
 
 
 def _diary_period_base_date():
@@ -391,6 +532,13 @@ def _render_diary_html(body: str) -> str:
     return "\n".join(paragraphs)
 
 
+def _stored_diary_html(body_html: str, stale_body) -> str:
+    # stale_body is only set when the stored HTML predates DIARY_RENDER_VERSION.
+    if stale_body is None:
+        return body_html or ""
+    return _render_diary_html(stale_body)
+
+
 def _format_diary_date_label(entry_date) -> str:
     if isinstance(entry_date, datetime):
         value = entry_date.date()
@@ -399,147 +547,124 @@ def _format_diary_date_label(entry_date) -> str:
     return f"{value.month}/{value.day}"
 
 
-def _list_diary_period_ids():
-    _init_diary_table()
+def _load_diary_period_index():
     if _timeline_db_kind() == "postgres":
         with _open_timeline_db() as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
-                    SELECT DISTINCT period_id
-                    FROM diary_entries
-                    WHERE period_id IS NOT NULL
+                    SELECT period_id, entry_count, first_entry_date, last_entry_date, last_updated_at
+                    FROM diary_periods
+                    WHERE entry_count > 0
                     ORDER BY period_id DESC
                     """
                 )
                 rows = cur.fetchall()
-        return [int(row[0]) for row in rows]
+        return [
+            {
+                "period_id": int(period_id),
+                "entry_count": int(entry_count),
+                "first_entry_date": first_entry_date,
+                "last_entry_date": last_entry_date,
+                "last_updated_at": last_updated_at,
+            }
+            for period_id, entry_count, first_entry_date, last_entry_date, last_updated_at in rows
+        ]
 
     with _open_timeline_db() as conn:
         rows = conn.execute(
             """
-            SELECT DISTINCT period_id
-            FROM diary_entries
-            WHERE period_id IS NOT NULL
+            SELECT period_id, entry_count, first_entry_date, last_entry_date, last_updated_at
+            FROM diary_periods
+            WHERE entry_count > 0
             ORDER BY period_id DESC
             """
         ).fetchall()
-    return [int(row["period_id"]) for row in rows]
+    return [
+        {
+            "period_id": int(row["period_id"]),
+            "entry_count": int(row["entry_count"]),
+            "first_entry_date": row["first_entry_date"],
+            "last_entry_date": row["last_entry_date"],
+            "last_updated_at": row["last_updated_at"],
+        }
+        for row in rows
+    ]
 
 
-def _resolve_diary_period_id_for_page(page_no: int):
-    if page_no < 1:
-        return None
-    period_ids = _list_diary_period_ids()
-    if page_no > len(period_ids):
-        return None
-    return period_ids[page_no - 1]
+def _diary_period_index():
+    # Memoized per request so the pager and page -> period lookup share one query.
+    if not has_app_context():
+        return _load_diary_period_index()
+    index = g.get("diary_period_index")
+    if index is None:
+        index = _load_diary_period_index()
+        g.diary_period_index = index
+    return index
 
 
-def _diary_total_pages() -> int:
-    return len(_list_diary_period_ids())
+def _forget_diary_period_index() -> None:
+    if has_app_context():
+        g.pop("diary_period_index", None)
+
+
+def _list_diary_period_ids():
+    return [period["period_id"] for period in _diary_period_index()]
 
 
-def _init_diary_table() -> None:
+def _refresh_diary_periods(conn, period_ids) -> None:
+    targets = sorted({int(period_id) for period_id in period_ids if period_id is not None})
     if _timeline_db_kind() == "postgres":
-        with _open_timeline_db() as conn:
-            with conn.cursor() as cur:
-                cur.execute(
-                    """
-                    CREATE TABLE IF NOT EXISTS diary_entries (
-                      id BIGSERIAL PRIMARY KEY,
-                      period_id INTEGER,
-                      entry_date DATE NOT NULL,
-                      body TEXT NOT NULL,
-                      created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
-                      updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
-                    )
-                    """
-                )
+        with conn.cursor() as cur:
+            for period_id in targets:
+                cur.execute("DELETE FROM diary_periods WHERE period_id = %s", (period_id,))
                 cur.execute(
                     """
-                    ALTER TABLE diary_entries
-                    ADD COLUMN IF NOT EXISTS period_id INTEGER
-                    """
-                )
-                cur.execute(
-                    """
-                    UPDATE diary_entries
-                    SET period_id = (
-                      (((EXTRACT(YEAR FROM entry_date)::INT - %s) * 12)
-                      + (EXTRACT(MONTH FROM entry_date)::INT - %s)) / %s
-                    ) + 1
-                    WHERE period_id IS NULL
-                    AND entry_date >= %s
+                    INSERT INTO diary_periods (period_id, entry_count, first_entry_date, last_entry_date, last_updated_at)
+                    SELECT period_id, COUNT(*), MIN(entry_date), MAX(entry_date), MAX(updated_at)
+                    FROM diary_entries
+                    WHERE period_id = %s
+                    GROUP BY period_id
                     """,
-                    (
-                        _diary_period_base_date().year,
-                        _diary_period_base_date().month,
-                        DIARY_PERIOD_MONTH_SPAN,
-                        _diary_period_base_date(),
-                    ),
-                )
-                cur.execute(
-                    """
-                    CREATE INDEX IF NOT EXISTS diary_entries_period_id_idx
-                    ON diary_entries (period_id DESC, entry_date DESC, id DESC)
-                    """
-                )
-                cur.execute(
-                    """
-                    CREATE INDEX IF NOT EXISTS diary_entries_entry_date_idx
-                    ON diary_entries (entry_date DESC, id DESC)
-                    """
+                    (period_id,),
                 )
-            conn.commit()
         return
 
-    with _open_timeline_db() as conn:
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS diary_entries (
-              id INTEGER PRIMARY KEY AUTOINCREMENT,
-              period_id INTEGER,
-              entry_date TEXT NOT NULL,
-              body TEXT NOT NULL,
-              created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
-              updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
-            )
-            """
-        )
-        columns = conn.execute("PRAGMA table_info(diary_entries)").fetchall()
-        column_names = {col["name"] for col in columns}
-        if "period_id" not in column_names:
-            conn.execute(
-                """
-                ALTER TABLE diary_entries
-                ADD COLUMN period_id INTEGER
-                """
-            )
-        base_date = _diary_period_base_date()
+    for period_id in targets:
+        conn.execute("DELETE FROM diary_periods WHERE period_id = ?", (period_id,))
         conn.execute(
             """
-            UPDATE diary_entries
-            SET period_id = (((CAST(strftime('%Y', entry_date) AS INTEGER) - ?) * 12)
-              + (CAST(strftime('%m', entry_date) AS INTEGER) - ?)) / ? + 1
-            WHERE period_id IS NULL
-            AND entry_date >= ?
+            INSERT INTO diary_periods (period_id, entry_count, first_entry_date, last_entry_date, last_updated_at)
+            SELECT period_id, COUNT(*), MIN(entry_date), MAX(entry_date), MAX(updated_at)
+            FROM diary_entries
+            WHERE period_id = ?
+            GROUP BY period_id
             """,
-            (base_date.year, base_date.month, DIARY_PERIOD_MONTH_SPAN, base_date.isoformat()),
-        )
-        conn.execute(
-            """
-            CREATE INDEX IF NOT EXISTS diary_entries_period_id_idx
-            ON diary_entries (period_id DESC, entry_date DESC, id DESC)
-            """
-        )
-        conn.execute(
-            """
-            CREATE INDEX IF NOT EXISTS diary_entries_entry_date_idx
-            ON diary_entries (entry_date DESC, id DESC)
-            """
+            (period_id,),
         )
-        conn.commit()
+
+
+def _diary_entry_period_id(conn, entry_id: int):
+    if _timeline_db_kind() == "postgres":
+        with conn.cursor() as cur:
+            cur.execute("SELECT period_id FROM diary_entries WHERE id = %s", (entry_id,))
+            row = cur.fetchone()
+    else:
+        row = conn.execute("SELECT period_id FROM diary_entries WHERE id = ?", (entry_id,)).fetchone()
+    return row[0] if row else None
+
+
+def _resolve_diary_period_id_for_page(page_no: int):
+    if page_no < 1:
+        return None
+    period_ids = _list_diary_period_ids()
+    if page_no > len(period_ids):
+        return None
+    return period_ids[page_no - 1]
+
+
+def _diary_total_pages() -> int:
+    return len(_list_diary_period_ids())
 
 
 def _fetch_diary_entries_for_window(page_no: int):
@@ -555,32 +680,35 @@ def _fetch_diary_entries_for_window(page_no: int):
             with conn.cursor() as cur:
                 cur.execute(
                     """
-                    SELECT id, entry_date, body
+                    SELECT id, entry_date, body_html,
+                      CASE WHEN body_html_version = %s THEN NULL ELSE body END AS stale_body
                     FROM diary_entries
                     WHERE period_id = %s
                     ORDER BY entry_date ASC, id ASC
                     """,
-                    (period_id,),
+                    (DIARY_RENDER_VERSION, period_id),
                 )
                 rows = cur.fetchall()
 
         return [
             {
                 "date": _format_diary_date_label(entry_date),
-                "html": _render_diary_html(body),
+                "entry_date": entry_date.isoformat(),
+                "html": _stored_diary_html(body_html, stale_body),
             }
-            for _, entry_date, body in rows
+            for _, entry_date, body_html, stale_body in rows
         ]
 
     with _open_timeline_db() as conn:
         rows = conn.execute(
             """
-            SELECT id, entry_date, body
+            SELECT id, entry_date, body_html,
+              CASE WHEN body_html_version = ? THEN NULL ELSE body END AS stale_body
             FROM diary_entries
             WHERE period_id = ?
             ORDER BY entry_date ASC, id ASC
             """,
-            (period_id,),
+            (DIARY_RENDER_VERSION, period_id),
         ).fetchall()
 
     entries = []
@@ -588,7 +716,8 @@ def _fetch_diary_entries_for_window(page_no: int):
         entry_date = datetime.strptime(row["entry_date"], "%Y-%m-%d").date()
         entries.append({
             "date": _format_diary_date_label(entry_date),
-            "html": _render_diary_html(row["body"]),
+            "entry_date": row["entry_date"],
+            "html": _stored_diary_html(row["body_html"], row["stale_body"]),
         })
     return entries
 
@@ -603,7 +732,7 @@ def _fetch_diary_entry_records_for_page(page_no: int):
             with conn.cursor() as cur:
                 cur.execute(
                     """
-                    SELECT id, entry_date, body
+                    SELECT id, entry_date, body, body_html, body_html_version
                     FROM diary_entries
                     WHERE period_id = %s
                     ORDER BY entry_date ASC, id ASC
@@ -618,15 +747,18 @@ def _fetch_diary_entry_records_for_page(page_no: int):
                 "date": _format_diary_date_label(entry_date),
                 "entry_date": entry_date.isoformat(),
                 "body": body,
-                "html": _render_diary_html(body),
+                "html": _stored_diary_html(
+                    body_html,
+                    None if body_html_version == DIARY_RENDER_VERSION else body,
+                ),
             }
-            for entry_id, entry_date, body in rows
+            for entry_id, entry_date, body, body_html, body_html_version in rows
         ]
 
     with _open_timeline_db() as conn:
         rows = conn.execute(
             """
-            SELECT id, entry_date, body
+            SELECT id, entry_date, body, body_html, body_html_version
             FROM diary_entries
             WHERE period_id = ?
             ORDER BY entry_date ASC, id ASC
@@ -642,139 +774,399 @@ def _fetch_diary_entry_records_for_page(page_no: int):
             "date": _format_diary_date_label(entry_date),
             "entry_date": entry_date.isoformat(),
             "body": row["body"],
-            "html": _render_diary_html(row["body"]),
+            "html": _stored_diary_html(
+                row["body_html"],
+                None if row["body_html_version"] == DIARY_RENDER_VERSION else row["body"],
+            ),
         })
     return records
 
 
-def _fetch_all_diary_entry_records():
-    _init_diary_table()
+def _parse_diary_export_since(value: str):
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def _format_diary_export_time(value) -> str:
+    parsed = _parse_cached_time(value)
+    if parsed is None:
+        return str(value or "")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).isoformat().replace("+00:00", "Z")
 
+
+def _iter_diary_entry_records(since=None, batch_size: int = 500):
     if _timeline_db_kind() == "postgres":
         with _open_timeline_db() as conn:
-            with conn.cursor() as cur:
-                cur.execute(
-                    """
-                    SELECT id, entry_date, body
-                    FROM diary_entries
-                    ORDER BY entry_date ASC, id ASC
-                    """
-                )
-                rows = cur.fetchall()
-
-        return [
-            {
-                "id": str(entry_id),
-                "date": entry_date.isoformat(),
-                "diary": body,
-            }
-            for entry_id, entry_date, body in rows
-        ]
+            # A named cursor keeps the result set on the server; rows arrive itersize at a time.
+            with conn.cursor(name="diary_export") as cur:
+                cur.itersize = batch_size
+                if since is None:
+                    cur.execute(
+                        """
+                        SELECT id, entry_date, body, updated_at
+                        FROM diary_entries
+                        ORDER BY entry_date ASC, id ASC
+                        """
+                    )
+                else:
+                    cur.execute(
+                        """
+                        SELECT id, entry_date, body, updated_at
+                        FROM diary_entries
+                        WHERE updated_at > %s
+                        ORDER BY entry_date ASC, id ASC
+                        """,
+                        (since,),
+                    )
+                for entry_id, entry_date, body, updated_at in cur:
+                    yield {
+                        "id": str(entry_id),
+                        "date": entry_date.isoformat(),
+                        "diary": body,
+                        "updated_at": _format_diary_export_time(updated_at),
+                    }
+        return
 
     with _open_timeline_db() as conn:
-        rows = conn.execute(
-            """
-            SELECT id, entry_date, body
-            FROM diary_entries
-            ORDER BY entry_date ASC, id ASC
-            """
-        ).fetchall()
-
-    return [
-        {
-            "id": str(row["id"]),
-            "date": row["entry_date"],
-            "diary": row["body"],
-        }
-        for row in rows
-    ]
+        if since is None:
+            cursor = conn.execute(
+                """
+                SELECT id, entry_date, body, updated_at
+                FROM diary_entries
+                ORDER BY entry_date ASC, id ASC
+                """
+            )
+        else:
+            cursor = conn.execute(
+                """
+                SELECT id, entry_date, body, updated_at
+                FROM diary_entries
+                WHERE updated_at > ?
+                ORDER BY entry_date ASC, id ASC
+                """,
+                (since.strftime("%Y-%m-%d %H:%M:%S"),),
+            )
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield {
+                    "id": str(row["id"]),
+                    "date": row["entry_date"],
+                    "diary": row["body"],
+                    "updated_at": _format_diary_export_time(row["updated_at"]),
+                }
+
+
+def _stream_diary_export_json(records):
+    yield '{"items": ['
+    for index, record in enumerate(records):
+        yield ("," if index else "") + json.dumps(record, ensure_ascii=False)
+    yield "]}\n"
+
+
+def _stream_diary_export_ndjson(records):
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + "\n"
+
+
+def _after_diary_write(period_ids) -> None:
+    _forget_diary_period_index()
+    _invalidate_diary_page_cache()
+    if _diary_freeze_dir():
+        try:
+            _refreeze_diary_periods(period_ids)
+        except Exception as exc:
+            app.logger.warning("Failed to refresh frozen diary pages: %s", exc)
 
 
-def _diary_upsert_entry(entry_date_str: str, body: str) -> None:
+def _diary_upsert_entry(entry_date_str: str, body: str) -> int:
     entry_date = datetime.strptime(entry_date_str, "%Y-%m-%d").date()
     period_id = _compute_diary_period_id(entry_date)
-    _init_diary_table()
-
+    body_html = _render_diary_html(body)
     if _timeline_db_kind() == "postgres":
         with _open_timeline_db() as conn:
             with conn.cursor() as cur:
-                cur.execute("DELETE FROM diary_entries WHERE entry_date = %s", (entry_date,))
                 cur.execute(
                     """
-                    INSERT INTO diary_entries (period_id, entry_date, body, updated_at)
-                    VALUES (%s, %s, %s, NOW())
+                    INSERT INTO diary_entries (period_id, entry_date, body, body_html, body_html_version, updated_at)
+                    VALUES (%s, %s, %s, %s, %s, NOW())
+                    ON CONFLICT (entry_date)
+                    DO UPDATE SET
+                      period_id = EXCLUDED.period_id,
+                      body = EXCLUDED.body,
+                      body_html = EXCLUDED.body_html,
+                      body_html_version = EXCLUDED.body_html_version,
+                      updated_at = EXCLUDED.updated_at
+                    RETURNING id
                     """,
-                    (period_id, entry_date, body),
+                    (period_id, entry_date, body, body_html, DIARY_RENDER_VERSION),
                 )
+                entry_id = cur.fetchone()[0]
+            _refresh_diary_periods(conn, [period_id])
             conn.commit()
-        return
-
-    with _open_timeline_db() as conn:
-        conn.execute("DELETE FROM diary_entries WHERE entry_date = ?", (entry_date_str,))
-        conn.execute(
-            """
-            INSERT INTO diary_entries (period_id, entry_date, body, updated_at)
-            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
-            """,
-            (period_id, entry_date_str, body),
-        )
-        conn.commit()
+    else:
+        with _open_timeline_db() as conn:
+            entry_id = conn.execute(
+                """
+                INSERT INTO diary_entries (period_id, entry_date, body, body_html, body_html_version, updated_at)
+                VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(entry_date) DO UPDATE SET
+                  period_id=excluded.period_id,
+                  body=excluded.body,
+                  body_html=excluded.body_html,
+                  body_html_version=excluded.body_html_version,
+                  updated_at=excluded.updated_at
+                RETURNING id
+                """,
+                (period_id, entry_date_str, body, body_html, DIARY_RENDER_VERSION),
+            ).fetchone()[0]
+            _refresh_diary_periods(conn, [period_id])
+            conn.commit()
+    _after_diary_write([period_id])
+    return int(entry_id)
 
 
 def _diary_update_entry(entry_id: int, entry_date_str: str, body: str) -> None:
     entry_date = datetime.strptime(entry_date_str, "%Y-%m-%d").date()
     period_id = _compute_diary_period_id(entry_date)
-    _init_diary_table()
-
+    body_html = _render_diary_html(body)
     if _timeline_db_kind() == "postgres":
         with _open_timeline_db() as conn:
+            previous_period_id = _diary_entry_period_id(conn, entry_id)
             with conn.cursor() as cur:
                 cur.execute("DELETE FROM diary_entries WHERE entry_date = %s AND id <> %s", (entry_date, entry_id))
                 cur.execute(
                     """
                     UPDATE diary_entries
-                    SET period_id = %s, entry_date = %s, body = %s, updated_at = NOW()
+                    SET period_id = %s, entry_date = %s, body = %s, body_html = %s, body_html_version = %s,
+                      updated_at = NOW()
                     WHERE id = %s
                     """,
-                    (period_id, entry_date, body, entry_id),
+                    (period_id, entry_date, body, body_html, DIARY_RENDER_VERSION, entry_id),
                 )
+            _refresh_diary_periods(conn, [previous_period_id, period_id])
             conn.commit()
-        return
-
-    with _open_timeline_db() as conn:
-        conn.execute("DELETE FROM diary_entries WHERE entry_date = ? AND id <> ?", (entry_date_str, entry_id))
-        conn.execute(
-            """
-            UPDATE diary_entries
-            SET period_id = ?, entry_date = ?, body = ?, updated_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-            """,
-            (period_id, entry_date_str, body, entry_id),
-        )
-        conn.commit()
+    else:
+        with _open_timeline_db() as conn:
+            previous_period_id = _diary_entry_period_id(conn, entry_id)
+            conn.execute("DELETE FROM diary_entries WHERE entry_date = ? AND id <> ?", (entry_date_str, entry_id))
+            conn.execute(
+                """
+                UPDATE diary_entries
+                SET period_id = ?, entry_date = ?, body = ?, body_html = ?, body_html_version = ?,
+                  updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+                """,
+                (period_id, entry_date_str, body, body_html, DIARY_RENDER_VERSION, entry_id),
+            )
+            _refresh_diary_periods(conn, [previous_period_id, period_id])
+            conn.commit()
+    _after_diary_write([previous_period_id, period_id])
 
 
 def _diary_delete_entry(entry_id: int) -> None:
-    _init_diary_table()
-
     if _timeline_db_kind() == "postgres":
         with _open_timeline_db() as conn:
+            period_id = _diary_entry_period_id(conn, entry_id)
             with conn.cursor() as cur:
                 cur.execute("DELETE FROM diary_entries WHERE id = %s", (entry_id,))
+            _refresh_diary_periods(conn, [period_id])
             conn.commit()
-        return
+    else:
+        with _open_timeline_db() as conn:
+            period_id = _diary_entry_period_id(conn, entry_id)
+            conn.execute("DELETE FROM diary_entries WHERE id = ?", (entry_id,))
+            _refresh_diary_periods(conn, [period_id])
+            conn.commit()
+    _after_diary_write([period_id])
+
+
+def _backfill_diary_html(force: bool = False, batch_size: int = 500) -> int:
+    rendered = 0
+    last_id = 0
+    placeholder = "%s" if _timeline_db_kind() == "postgres" else "?"
+    version_filter = "" if force else f"AND body_html_version <> {placeholder}"
+    select_sql = f"""
+        SELECT id, body
+        FROM diary_entries
+        WHERE id > {placeholder} {version_filter}
+        ORDER BY id ASC
+        LIMIT {placeholder}
+    """
+    update_sql = f"""
+        UPDATE diary_entries
+        SET body_html = {placeholder}, body_html_version = {placeholder}
+        WHERE id = {placeholder}
+    """
+    while True:
+        params = (last_id,) if force else (last_id, DIARY_RENDER_VERSION)
+        params += (batch_size,)
+        with _open_timeline_db() as conn:
+            if _timeline_db_kind() == "postgres":
+                with conn.cursor() as cur:
+                    cur.execute(select_sql, params)
+                    rows = cur.fetchall()
+                    cur.executemany(
+                        update_sql,
+                        [(_render_diary_html(body), DIARY_RENDER_VERSION, entry_id) for entry_id, body in rows],
+                    )
+            else:
+                rows = [tuple(row) for row in conn.execute(select_sql, params).fetchall()]
+                conn.executemany(
+                    update_sql,
+                    [(_render_diary_html(body), DIARY_RENDER_VERSION, entry_id) for entry_id, body in rows],
+                )
+            conn.commit()
+        if not rows:
+            break
+        rendered += len(rows)
+        last_id = rows[-1][0]
+    if rendered:
+        _invalidate_diary_page_cache()
+    return rendered
 
-    with _open_timeline_db() as conn:
-        conn.execute("DELETE FROM diary_entries WHERE id = ?", (entry_id,))
-        conn.commit()
 
+def _diary_search_terms(query: str):
+    terms = []
+    for term in (query or "").split():
+        term = term[:50]
+        if term and term not in terms:
+            terms.append(term)
+    return terms[:DIARY_SEARCH_MAX_TERMS]
 
-def _normalize_tag(tag: str) -> str:
-    return tag.strip().lstrip("#").lower()
 
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
 
-def _extract_tags(content: str):
-    tags = []
+
+_diary_fts_ready = None
+
+
+def _diary_fts_available() -> bool:
+    global _diary_fts_ready
+    if _diary_fts_ready is None:
+        with _open_timeline_db() as conn:
+            row = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'diary_entries_fts'"
+            ).fetchone()
+        _diary_fts_ready = row is not None
+    return _diary_fts_ready
+
+
+def _diary_search_snippet(body: str, terms) -> str:
+    text = re.sub(r"\s+", " ", body or "").strip()
+    lowered = text.lower()
+    positions = [lowered.find(term.lower()) for term in terms]
+    positions = [pos for pos in positions if pos >= 0]
+    first = min(positions) if positions else 0
+    start = max(0, first - DIARY_SEARCH_SNIPPET_RADIUS)
+    end = min(len(text), first + DIARY_SEARCH_SNIPPET_RADIUS * 2)
+    window = text[start:end]
+
+    pattern = re.compile("|".join(re.escape(term) for term in terms), flags=re.IGNORECASE)
+    parts = []
+    last_index = 0
+    for match in pattern.finditer(window):
+        parts.append(html.escape(window[last_index:match.start()]))
+        parts.append(f"<mark>{html.escape(match.group(0))}</mark>")
+        last_index = match.end()
+    parts.append(html.escape(window[last_index:]))
+    prefix = "…" if start > 0 else ""
+    suffix = "…" if end < len(text) else ""
+    return prefix + "".join(parts) + suffix
+
+
+def _diary_search_rows(terms, limit: int, offset: int):
+    if _timeline_db_kind() == "postgres":
+        conditions = " AND ".join(["body ILIKE %s"] * len(terms))
+        params = [f"%{_escape_like(term)}%" for term in terms]
+        with _open_timeline_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    f"""
+                    SELECT id, entry_date, body, period_id
+                    FROM diary_entries
+                    WHERE {conditions}
+                    ORDER BY word_similarity(%s, body) DESC, entry_date DESC, id DESC
+                    LIMIT %s OFFSET %s
+                    """,
+                    (*params, " ".join(terms), limit, offset),
+                )
+                rows = cur.fetchall()
+        return [(entry_id, entry_date.isoformat(), body, period_id) for entry_id, entry_date, body, period_id in rows]
+
+    # Trigrams can only match terms of three or more characters.
+    if _diary_fts_available() and all(len(term) >= 3 for term in terms):
+        match_query = " AND ".join('"' + term.replace('"', '""') + '"' for term in terms)
+        with _open_timeline_db() as conn:
+            rows = conn.execute(
+                """
+                SELECT d.id, d.entry_date, d.body, d.period_id
+                FROM diary_entries_fts AS f
+                JOIN diary_entries AS d ON d.id = f.rowid
+                WHERE diary_entries_fts MATCH ?
+                ORDER BY f.rank, d.entry_date DESC, d.id DESC
+                LIMIT ? OFFSET ?
+                """,
+                (match_query, limit, offset),
+            ).fetchall()
+        return [tuple(row) for row in rows]
+
+    conditions = " AND ".join(["body LIKE ? ESCAPE '\\'"] * len(terms))
+    params = [f"%{_escape_like(term)}%" for term in terms]
+    with _open_timeline_db() as conn:
+        rows = conn.execute(
+            f"""
+            SELECT id, entry_date, body, period_id
+            FROM diary_entries
+            WHERE {conditions}
+            ORDER BY entry_date DESC, id DESC
+            LIMIT ? OFFSET ?
+            """,
+            (*params, limit, offset),
+        ).fetchall()
+    return [tuple(row) for row in rows]
+
+
+def _diary_search(query: str, page_no: int):
+    terms = _diary_search_terms(query)
+    if not terms:
+        return [], False
+    offset = (page_no - 1) * DIARY_SEARCH_PER_PAGE
+    rows = _diary_search_rows(terms, DIARY_SEARCH_PER_PAGE + 1, offset)
+    has_next = len(rows) > DIARY_SEARCH_PER_PAGE
+
+    page_by_period = {period_id: index for index, period_id in enumerate(_list_diary_period_ids(), start=1)}
+    results = []
+    for entry_id, entry_date_str, body, period_id in rows[:DIARY_SEARCH_PER_PAGE]:
+        entry_date = datetime.strptime(entry_date_str, "%Y-%m-%d").date()
+        diary_page = page_by_period.get(period_id)
+        href = ""
+        if diary_page:
+            href = ("/" if diary_page == 1 else f"/page{diary_page}") + f"#d-{entry_date_str}"
+        results.append({
+            "id": entry_id,
+            "date": f"{entry_date.year}/{_format_diary_date_label(entry_date)}",
+            "snippet_html": _diary_search_snippet(body, terms),
+            "href": href,
+        })
+    return results, has_next
+
+
+def _normalize_tag(tag: str) -> str:
+    return tag.strip().lstrip("#").lower()
+
+
+def _extract_tags(content: str):
+    tags = []
     seen = set()
     for raw in TAG_PATTERN.findall(content):
         tag = _normalize_tag(raw)
@@ -795,23 +1187,90 @@ def _strip_tags_from_content(content: str) -> str:
     return "\n".join(lines).strip()
 
 
-def _timeline_search_posts(posts, query: str):
-    if not query:
-        return posts
-    q = query.lower().strip()
-    hashtag_terms = [_normalize_tag(tag) for tag in TAG_PATTERN.findall(query)]
-    text_query = TAG_PATTERN.sub(" ", query)
+def _timeline_parse_search_query(query: str):
+    tags = []
+    for raw in TAG_PATTERN.findall(query or ""):
+        tag = _normalize_tag(raw)
+        if tag and tag not in tags:
+            tags.append(tag)
+    text_query = TAG_PATTERN.sub(" ", query or "")
     text_query = re.sub(r"\s+", " ", text_query).strip().lower()
-    filtered = []
-    for post in posts:
-        content = (post.get("content") or "").lower()
-        tags = [str(t).lower() for t in (post.get("tags") or [])]
-        hashtag_match = all(term in tags for term in hashtag_terms) if hashtag_terms else True
-        text_match = (not text_query) or (text_query in content) or any(text_query in t for t in tags)
-        fallback_match = q in content or any(q in t for t in tags)
-        if hashtag_match and text_match and (hashtag_terms or text_query or fallback_match):
-            filtered.append(post)
-    return filtered
+    return tags, text_query
+
+
+_timeline_fts_ready = None
+
+
+def _timeline_fts_available() -> bool:
+    global _timeline_fts_ready
+    if _timeline_fts_ready is None:
+        with _open_timeline_db() as conn:
+            row = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'mytimeline_posts_fts'"
+            ).fetchone()
+        _timeline_fts_ready = row is not None
+    return _timeline_fts_ready
+
+
+def _format_timeline_cursor(post) -> str:
+    created_at = post.get("created_at")
+    if not isinstance(created_at, datetime):
+        return ""
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return f"{created_at.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')},{post['id']}"
+
+
+def _parse_timeline_cursor(value: str):
+    created_raw, _, id_raw = (value or "").strip().rpartition(",")
+    try:
+        created_at = datetime.strptime(created_raw, "%Y-%m-%dT%H:%M:%S.%fZ").replace(tzinfo=timezone.utc)
+        return created_at, int(id_raw)
+    except ValueError:
+        return None
+
+
+def _timeline_post_filter(tags, text_query: str, before=None):
+    if _timeline_db_kind() == "postgres":
+        placeholder, like, escape = "%s", "ILIKE", ""
+    else:
+        placeholder, like, escape = "?", "LIKE", " ESCAPE '\\'"
+    clauses = []
+    params = []
+    if before:
+        # Row-value comparison walks the (created_at DESC, id DESC) index from the cursor.
+        before_created_at, before_id = before
+        if placeholder == "?":
+            before_created_at = before_created_at.strftime("%Y-%m-%d %H:%M:%S")
+        clauses.append(f"(created_at, id) < ({placeholder}, {placeholder})")
+        params.extend([before_created_at, before_id])
+    if tags:
+        # Every hashtag must match, so intersect the per-tag post id sets in the index.
+        tag_select = f"SELECT post_id FROM mytimeline_post_tags WHERE tag = {placeholder}"
+        clauses.append(f"id IN ({' INTERSECT '.join([tag_select] * len(tags))})")
+        params.extend(tags)
+    if text_query:
+        pattern = f"%{_escape_like(text_query)}%"
+        # Postgres serves the ILIKE from the pg_trgm index; SQLite needs the FTS5
+        # trigram table, which can only match queries of three or more characters.
+        # Both halves produce candidate ids, so the outer query is driven by that set
+        # rather than scanning every post and probing each one.
+        content_select = f"SELECT id FROM mytimeline_posts WHERE content {like} {placeholder}{escape}"
+        content_param = pattern
+        if placeholder == "?" and len(text_query) >= 3 and _timeline_fts_available():
+            content_select = "SELECT rowid FROM mytimeline_posts_fts WHERE mytimeline_posts_fts MATCH ?"
+            content_param = '"' + text_query.replace('"', '""') + '"'
+        clauses.append(
+            f"""id IN (
+              {content_select}
+              UNION
+              SELECT post_id FROM mytimeline_post_tags WHERE tag {like} {placeholder}{escape}
+            )"""
+        )
+        params.extend([content_param, pattern])
+    if not clauses:
+        return "", []
+    return "WHERE " + " AND ".join(clauses), params
 
 
 def _timeline_collect_tags(posts):
@@ -929,7 +1388,7 @@ def _remove_urls_from_content(content: str, urls_to_remove):
     return "\n".join(lines).strip()
 
 
-def _fetch_text(url: str, timeout: int = 5, max_bytes: int = 250_000):
+def _fetch_text(url: str, timeout: float = 5, max_bytes: int = 250_000):
     req = Request(url, headers={"User-Agent": FETCH_USER_AGENT})
     with urlopen(req, timeout=timeout) as res:
         raw = res.read(max_bytes + 1)
@@ -942,66 +1401,46 @@ def _fetch_text(url: str, timeout: int = 5, max_bytes: int = 250_000):
         return raw.decode(charset, errors="replace")
 
 
-def _fetch_json(url: str, timeout: int = 5):
+def _fetch_json(url: str, timeout: float = 5):
     text = _fetch_text(url, timeout=timeout, max_bytes=200_000)
     return json.loads(text)
 
 
-def _extract_attr(tag: str, attr_name: str):
-    pattern = rf'{attr_name}\s*=\s*["\']([^"\']+)["\']'
-    match = re.search(pattern, tag, flags=re.IGNORECASE)
-    return match.group(1).strip() if match else ""
-
+# Returned by the preview fetchers when the origin answered 304 to our validators.
+LINK_PREVIEW_NOT_MODIFIED = object()
 
-def _extract_ogp_from_html(page_url: str, html_text: str):
-    head = html_text[:200_000]
-    metas = re.findall(r"<meta\s+[^>]*>", head, flags=re.IGNORECASE)
 
-    by_property = {}
-    by_name = {}
-    for meta_tag in metas:
-        prop = _extract_attr(meta_tag, "property").lower()
-        name = _extract_attr(meta_tag, "name").lower()
-        content = _extract_attr(meta_tag, "content")
-        if not content:
-            continue
-        if prop:
-            by_property[prop] = content
-        if name:
-            by_name[name] = content
-
-    title = by_property.get("og:title") or by_name.get("twitter:title")
-    if not title:
-        title_match = re.search(r"<title[^>]*>(.*?)</title>", head, flags=re.IGNORECASE | re.DOTALL)
-        title = title_match.group(1).strip() if title_match else ""
-
-    description = (
-        by_property.get("og:description")
-        or by_name.get("twitter:description")
-        or by_name.get("description")
-        or ""
-    )
-    image_url = by_property.get("og:image") or by_name.get("twitter:image") or ""
-    site_name = by_property.get("og:site_name") or urlsplit(page_url).hostname or ""
-
-    if image_url:
-        image_url = urljoin(page_url, image_url)
-
-    if not title:
-        return None
-
-    return {
-        "url": page_url,
-        "title": title,
-        "description": description,
-        "image_url": image_url,
-        "site_name": site_name,
-    }
+def _fetch_ogp_preview(url: str, timeout: float = 5, cached=None):
+    headers = {"User-Agent": FETCH_USER_AGENT, "Accept": "text/html,application/xhtml+xml"}
+    if cached and cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
+    if cached and cached.get("last_modified"):
+        headers["If-Modified-Since"] = cached["last_modified"]
+    try:
+        res = urlopen(Request(url, headers=headers), timeout=timeout)
+    except HTTPError as exc:
+        if exc.code == 304 and cached:
+            exc.close()
+            return LINK_PREVIEW_NOT_MODIFIED
+        raise
+    with res:
+        content_type = res.headers.get_content_type()
+        if content_type not in {"text/html", "application/xhtml+xml", "text/plain"}:
+            return None
+        preview, _ = ogp.parse_ogp_stream(
+            url,
+            ogp.iter_response_chunks(res),
+            charset=res.headers.get_content_charset() or "",
+        )
+        if preview:
+            preview["etag"] = res.headers.get("ETag", "")
+            preview["last_modified"] = res.headers.get("Last-Modified", "")
+        return preview
 
 
-def _fetch_spotify_preview(url: str):
+def _fetch_spotify_preview(url: str, timeout: float = LINK_PREVIEW_FETCH_TIMEOUT_SECONDS):
     oembed_url = f"https://open.spotify.com/oembed?url={url}"
-    data = _fetch_json(oembed_url, timeout=5)
+    data = _fetch_json(oembed_url, timeout=timeout)
     title = (data.get("title") or "").strip()
     image_url = (data.get("thumbnail_url") or "").strip()
     if not title:
@@ -1015,57 +1454,36 @@ def _fetch_spotify_preview(url: str):
     }
 
 
-def _fetch_link_preview(url: str):
+def _remaining_seconds(deadline: float) -> float:
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise TimeoutError("link preview time budget exhausted")
+    return remaining
+
+
+def _fetch_link_preview_or_raise(url: str, deadline: float, cached=None):
+    # The oEmbed attempt and the HTML fallback share one time budget.
     host = (urlsplit(url).hostname or "").lower()
-    try:
-        if host.endswith("open.spotify.com"):
-            preview = _fetch_spotify_preview(url)
-            if preview:
-                return preview
+    if host.endswith("open.spotify.com"):
+        try:
+            preview = _fetch_spotify_preview(url, timeout=_remaining_seconds(deadline))
+        except (HTTPError, ValueError):
+            preview = None
+        if preview:
+            return preview
+
+    return _fetch_ogp_preview(url, timeout=_remaining_seconds(deadline), cached=cached)
+
 
-        page = _fetch_text(url, timeout=5, max_bytes=250_000)
-        return _extract_ogp_from_html(url, page)
+def _fetch_link_preview(url: str, timeout: float = LINK_PREVIEW_FETCH_TIMEOUT_SECONDS):
+    try:
+        return _fetch_link_preview_or_raise(url, time.monotonic() + timeout)
     except (URLError, HTTPError, TimeoutError, socket.timeout, ValueError, json.JSONDecodeError):
         return None
     except Exception:
         return None
 
 
-def _init_timeline_preview_table() -> None:
-    if _timeline_db_kind() == "postgres":
-        with _open_timeline_db() as conn:
-            with conn.cursor() as cur:
-                cur.execute(
-                    """
-                    CREATE TABLE IF NOT EXISTS mytimeline_link_previews (
-                      url TEXT PRIMARY KEY,
-                      title TEXT NOT NULL,
-                      description TEXT NOT NULL DEFAULT '',
-                      image_url TEXT NOT NULL DEFAULT '',
-                      site_name TEXT NOT NULL DEFAULT '',
-                      fetched_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
-                    )
-                    """
-                )
-            conn.commit()
-        return
-
-    with _open_timeline_db() as conn:
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS mytimeline_link_previews (
-              url TEXT PRIMARY KEY,
-              title TEXT NOT NULL,
-              description TEXT NOT NULL DEFAULT '',
-              image_url TEXT NOT NULL DEFAULT '',
-              site_name TEXT NOT NULL DEFAULT '',
-              fetched_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
-            )
-            """
-        )
-        conn.commit()
-
-
 def _parse_cached_time(value):
     if isinstance(value, datetime):
         return value
@@ -1080,104 +1498,408 @@ def _parse_cached_time(value):
     return None
 
 
-def _get_cached_preview(url: str):
-    _init_timeline_preview_table()
+def _cached_preview_from_row(url, title, description, image_url, site_name, fetched_at, etag, last_modified):
+    return {
+        "url": url,
+        "title": title,
+        "description": description,
+        "image_url": image_url,
+        "site_name": site_name,
+        "image_key": migrations.preview_image_key(image_url),
+        "fetched_at": _parse_cached_time(fetched_at),
+        "etag": etag or "",
+        "last_modified": last_modified or "",
+    }
+
+
+@dataclass
+class LinkPreviewMemoryEntry:
+    preview: dict
+    expires_at: float
+
+
+_link_preview_memory = OrderedDict()
+_link_preview_memory_lock = threading.Lock()
+_link_preview_memory_stats = {"hits": 0, "misses": 0, "evictions": 0}
+_link_preview_touched = set()
+
+
+def _link_preview_memory_get_many(urls):
+    found = {}
+    now = time.monotonic()
+    with _link_preview_memory_lock:
+        for url in urls:
+            entry = _link_preview_memory.get(url)
+            if entry is None or entry.expires_at <= now:
+                if entry is not None:
+                    del _link_preview_memory[url]
+                _link_preview_memory_stats["misses"] += 1
+                continue
+            _link_preview_memory.move_to_end(url)
+            _link_preview_memory_stats["hits"] += 1
+            found[url] = entry.preview
+    return found
+
+
+def _link_preview_memory_put_many(previews) -> None:
+    expires_at = time.monotonic() + LINK_PREVIEW_MEMORY_TTL_SECONDS
+    with _link_preview_memory_lock:
+        for preview in previews:
+            _link_preview_memory[preview["url"]] = LinkPreviewMemoryEntry(preview, expires_at)
+            _link_preview_memory.move_to_end(preview["url"])
+        while len(_link_preview_memory) > LINK_PREVIEW_MEMORY_MAX_ENTRIES:
+            _link_preview_memory.popitem(last=False)
+            _link_preview_memory_stats["evictions"] += 1
+
+
+def _link_preview_memory_discard(urls) -> None:
+    with _link_preview_memory_lock:
+        for url in urls:
+            _link_preview_memory.pop(url, None)
+
+
+def _link_preview_cache_stats():
+    with _link_preview_memory_lock:
+        stats = dict(_link_preview_memory_stats)
+        stats["entries"] = len(_link_preview_memory)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+    return stats
+
+
+def _get_cached_previews(urls):
+    urls = list(dict.fromkeys(url for url in urls if url))
+    found = _link_preview_memory_get_many(urls)
+    missing = [url for url in urls if url not in found]
+    if missing:
+        loaded = _load_cached_previews(missing)
+        _link_preview_memory_put_many(loaded.values())
+        found.update(loaded)
+    with _link_preview_memory_lock:
+        _link_preview_touched.update(found)
+    return found
+
+
+def _load_cached_previews(urls):
+    if not urls:
+        return {}
     if _timeline_db_kind() == "postgres":
         with _open_timeline_db() as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
-                    SELECT url, title, description, image_url, site_name, fetched_at
+                    SELECT url, title, description, image_url, site_name, fetched_at, etag, last_modified
                     FROM mytimeline_link_previews
-                    WHERE url = %s
+                    WHERE url = ANY(%s)
                     """,
-                    (url,),
+                    (urls,),
                 )
-                row = cur.fetchone()
-        if not row:
-            return None
-        url_value, title, description, image_url, site_name, fetched_at = row
-        return {
-            "url": url_value,
-            "title": title,
-            "description": description,
-            "image_url": image_url,
-            "site_name": site_name,
-            "fetched_at": _parse_cached_time(fetched_at),
-        }
+                rows = cur.fetchall()
+        return {row[0]: _cached_preview_from_row(*row) for row in rows}
 
+    rows = []
     with _open_timeline_db() as conn:
-        row = conn.execute(
-            """
-            SELECT url, title, description, image_url, site_name, fetched_at
-            FROM mytimeline_link_previews
-            WHERE url = ?
-            """,
-            (url,),
-        ).fetchone()
-    if not row:
-        return None
-    return {
-        "url": row["url"],
-        "title": row["title"],
-        "description": row["description"],
-        "image_url": row["image_url"],
-        "site_name": row["site_name"],
-        "fetched_at": _parse_cached_time(row["fetched_at"]),
-    }
+        # Chunked to stay under SQLITE_MAX_VARIABLE_NUMBER on older builds.
+        for start in range(0, len(urls), LINK_PREVIEW_BATCH_SIZE):
+            chunk = urls[start:start + LINK_PREVIEW_BATCH_SIZE]
+            placeholders = ", ".join("?" * len(chunk))
+            rows.extend(
+                conn.execute(
+                    f"""
+                    SELECT url, title, description, image_url, site_name, fetched_at, etag, last_modified
+                    FROM mytimeline_link_previews
+                    WHERE url IN ({placeholders})
+                    """,
+                    chunk,
+                ).fetchall()
+            )
+    return {row["url"]: _cached_preview_from_row(*row) for row in rows}
 
 
-def _upsert_preview(preview: dict):
-    _init_timeline_preview_table()
+def _get_cached_preview(url: str):
+    return _get_cached_previews([url]).get(url)
+
+
+def _upsert_previews(previews) -> None:
+    previews = list(previews)
+    rows = [
+        (
+            preview["url"],
+            preview.get("title", ""),
+            preview.get("description", ""),
+            preview.get("image_url", ""),
+            migrations.preview_image_key(preview.get("image_url", "")),
+            preview.get("site_name", ""),
+            preview.get("etag", ""),
+            preview.get("last_modified", ""),
+        )
+        for preview in previews
+    ]
+    if not rows:
+        return
     if _timeline_db_kind() == "postgres":
         with _open_timeline_db() as conn:
             with conn.cursor() as cur:
-                cur.execute(
+                cur.executemany(
                     """
-                    INSERT INTO mytimeline_link_previews (url, title, description, image_url, site_name, fetched_at)
-                    VALUES (%s, %s, %s, %s, %s, NOW())
+                    INSERT INTO mytimeline_link_previews (
+                      url, title, description, image_url, image_key, site_name, etag, last_modified,
+                      fetched_at, last_accessed_at
+                    )
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW())
                     ON CONFLICT (url)
                     DO UPDATE SET
                       title = EXCLUDED.title,
                       description = EXCLUDED.description,
                       image_url = EXCLUDED.image_url,
+                      image_key = EXCLUDED.image_key,
                       site_name = EXCLUDED.site_name,
+                      etag = EXCLUDED.etag,
+                      last_modified = EXCLUDED.last_modified,
                       fetched_at = NOW()
                     """,
-                    (
-                        preview["url"],
-                        preview.get("title", ""),
-                        preview.get("description", ""),
-                        preview.get("image_url", ""),
-                        preview.get("site_name", ""),
-                    ),
+                    rows,
+                )
+            conn.commit()
+    else:
+        with _open_timeline_db() as conn:
+            conn.executemany(
+                """
+                INSERT INTO mytimeline_link_previews (
+                  url, title, description, image_url, image_key, site_name, etag, last_modified,
+                  fetched_at, last_accessed_at
                 )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+                ON CONFLICT(url) DO UPDATE SET
+                  title=excluded.title,
+                  description=excluded.description,
+                  image_url=excluded.image_url,
+                  image_key=excluded.image_key,
+                  site_name=excluded.site_name,
+                  etag=excluded.etag,
+                  last_modified=excluded.last_modified,
+                  fetched_at=CURRENT_TIMESTAMP
+                """,
+                rows,
+            )
             conn.commit()
+
+    fetched_at = datetime.now(timezone.utc)
+    _link_preview_memory_put_many(
+        {**preview, "image_key": row[4], "fetched_at": fetched_at} for preview, row in zip(previews, rows)
+    )
+
+
+def _upsert_preview(preview: dict):
+    _upsert_previews([preview])
+
+
+def _mark_previews_revalidated(previews) -> None:
+    previews = list(previews)
+    if not previews:
         return
+    urls = [preview["url"] for preview in previews]
+    if _timeline_db_kind() == "postgres":
+        with _open_timeline_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute("UPDATE mytimeline_link_previews SET fetched_at = NOW() WHERE url = ANY(%s)", (urls,))
+            conn.commit()
+    else:
+        with _open_timeline_db() as conn:
+            conn.executemany(
+                "UPDATE mytimeline_link_previews SET fetched_at = CURRENT_TIMESTAMP WHERE url = ?",
+                [(url,) for url in urls],
+            )
+            conn.commit()
+
+    fetched_at = datetime.now(timezone.utc)
+    _link_preview_memory_put_many({**preview, "fetched_at": fetched_at} for preview in previews)
+
+
+def _flush_link_preview_touches() -> int:
+    with _link_preview_memory_lock:
+        urls = list(_link_preview_touched)
+        _link_preview_touched.clear()
+    if not urls:
+        return 0
+    if _timeline_db_kind() == "postgres":
+        with _open_timeline_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "UPDATE mytimeline_link_previews SET last_accessed_at = NOW() WHERE url = ANY(%s)",
+                    (urls,),
+                )
+            conn.commit()
+        return len(urls)
 
     with _open_timeline_db() as conn:
-        conn.execute(
+        conn.executemany(
+            "UPDATE mytimeline_link_previews SET last_accessed_at = CURRENT_TIMESTAMP WHERE url = ?",
+            [(url,) for url in urls],
+        )
+        conn.commit()
+    return len(urls)
+
+
+def _prune_link_previews(max_rows: int = LINK_PREVIEW_MAX_ROWS):
+    # Keep the max_rows most recently used previews and drop failure records nobody has retried in a month.
+    if _timeline_db_kind() == "postgres":
+        with _open_timeline_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    DELETE FROM mytimeline_link_previews
+                    WHERE url IN (
+                      SELECT url FROM mytimeline_link_previews
+                      ORDER BY last_accessed_at DESC, url
+                      OFFSET %s
+                    )
+                    RETURNING url
+                    """,
+                    (max_rows,),
+                )
+                pruned = [row[0] for row in cur.fetchall()]
+                cur.execute(
+                    """
+                    DELETE FROM mytimeline_link_preview_failures
+                    WHERE retry_after < NOW() - INTERVAL '30 days'
+                    """
+                )
+                pruned_failures = cur.rowcount
+            conn.commit()
+    else:
+        with _open_timeline_db() as conn:
+            pruned = [
+                row[0]
+                for row in conn.execute(
+                    """
+                    DELETE FROM mytimeline_link_previews
+                    WHERE url IN (
+                      SELECT url FROM mytimeline_link_previews
+                      ORDER BY last_accessed_at DESC, url
+                      LIMIT -1 OFFSET ?
+                    )
+                    RETURNING url
+                    """,
+                    (max_rows,),
+                ).fetchall()
+            ]
+            pruned_failures = conn.execute(
+                """
+                DELETE FROM mytimeline_link_preview_failures
+                WHERE retry_after < datetime('now', '-30 days')
+                """
+            ).rowcount
+            conn.commit()
+    _link_preview_memory_discard(pruned)
+    return len(pruned), pruned_failures
+
+
+def _get_preview_failures(urls):
+    urls = list(dict.fromkeys(url for url in urls if url))
+    if not urls:
+        return {}
+    if _timeline_db_kind() == "postgres":
+        with _open_timeline_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT url, failure_count, retry_after
+                    FROM mytimeline_link_preview_failures
+                    WHERE url = ANY(%s)
+                    """,
+                    (urls,),
+                )
+                rows = cur.fetchall()
+        return {url: {"failure_count": count, "retry_after": _parse_cached_time(retry_after)} for url, count, retry_after in rows}
+
+    rows = []
+    with _open_timeline_db() as conn:
+        for start in range(0, len(urls), LINK_PREVIEW_BATCH_SIZE):
+            chunk = urls[start:start + LINK_PREVIEW_BATCH_SIZE]
+            placeholders = ", ".join("?" * len(chunk))
+            rows.extend(
+                conn.execute(
+                    f"""
+                    SELECT url, failure_count, retry_after
+                    FROM mytimeline_link_preview_failures
+                    WHERE url IN ({placeholders})
+                    """,
+                    chunk,
+                ).fetchall()
+            )
+    return {
+        row["url"]: {"failure_count": row["failure_count"], "retry_after": _parse_cached_time(row["retry_after"])}
+        for row in rows
+    }
+
+
+def _is_preview_backing_off(failure) -> bool:
+    retry_after = (failure or {}).get("retry_after")
+    return isinstance(retry_after, datetime) and retry_after > datetime.now(timezone.utc)
+
+
+def _record_preview_failures(errors, failures) -> None:
+    now = datetime.now(timezone.utc)
+    rows = []
+    for url, error in errors.items():
+        failure_count = (failures.get(url) or {}).get("failure_count", 0) + 1
+        delay = min(LINK_PREVIEW_RETRY_BASE_SECONDS * 2 ** (failure_count - 1), LINK_PREVIEW_RETRY_MAX_SECONDS)
+        retry_after = datetime.fromtimestamp(now.timestamp() + delay, timezone.utc)
+        rows.append((url, failure_count, error[:500], retry_after))
+    if not rows:
+        return
+    if _timeline_db_kind() == "postgres":
+        with _open_timeline_db() as conn:
+            with conn.cursor() as cur:
+                cur.executemany(
+                    """
+                    INSERT INTO mytimeline_link_preview_failures (url, failure_count, last_error, last_failed_at, retry_after)
+                    VALUES (%s, %s, %s, NOW(), %s)
+                    ON CONFLICT (url)
+                    DO UPDATE SET
+                      failure_count = EXCLUDED.failure_count,
+                      last_error = EXCLUDED.last_error,
+                      last_failed_at = NOW(),
+                      retry_after = EXCLUDED.retry_after
+                    """,
+                    rows,
+                )
+            conn.commit()
+        return
+
+    with _open_timeline_db() as conn:
+        conn.executemany(
             """
-            INSERT INTO mytimeline_link_previews (url, title, description, image_url, site_name, fetched_at)
-            VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            INSERT INTO mytimeline_link_preview_failures (url, failure_count, last_error, last_failed_at, retry_after)
+            VALUES (?, ?, ?, CURRENT_TIMESTAMP, ?)
             ON CONFLICT(url) DO UPDATE SET
-              title=excluded.title,
-              description=excluded.description,
-              image_url=excluded.image_url,
-              site_name=excluded.site_name,
-              fetched_at=CURRENT_TIMESTAMP
+              failure_count=excluded.failure_count,
+              last_error=excluded.last_error,
+              last_failed_at=CURRENT_TIMESTAMP,
+              retry_after=excluded.retry_after
             """,
-            (
-                preview["url"],
-                preview.get("title", ""),
-                preview.get("description", ""),
-                preview.get("image_url", ""),
-                preview.get("site_name", ""),
-            ),
+            [(url, count, error, retry_after.strftime("%Y-%m-%d %H:%M:%S")) for url, count, error, retry_after in rows],
         )
         conn.commit()
 
 
+def _clear_preview_failures(urls) -> None:
+    urls = list(urls)
+    if not urls:
+        return
+    if _timeline_db_kind() == "postgres":
+        with _open_timeline_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM mytimeline_link_preview_failures WHERE url = ANY(%s)", (urls,))
+            conn.commit()
+        return
+
+    with _open_timeline_db() as conn:
+        conn.executemany("DELETE FROM mytimeline_link_preview_failures WHERE url = ?", [(url,) for url in urls])
+        conn.commit()
+
+
 def _is_preview_stale(cached: dict) -> bool:
     fetched_at = cached.get("fetched_at")
     if not isinstance(fetched_at, datetime):
@@ -1188,24 +1910,404 @@ def _is_preview_stale(cached: dict) -> bool:
     return age.total_seconds() > OGP_CACHE_TTL_SECONDS
 
 
-def _get_preview_with_cache(url: str):
-    cached = _get_cached_preview(url)
-    if cached and not _is_preview_stale(cached):
-        return cached
+_link_preview_queue = queue.Queue(maxsize=LINK_PREVIEW_QUEUE_MAX)
+_link_preview_pending = set()
+_link_preview_lock = threading.Lock()
+# image_key -> (consecutive failures, monotonic retry time) for thumbnails that could not be cached.
+_preview_image_backoff = {}
+_link_preview_worker = None
+
+
+_link_preview_host_slots = {}
+
+
+def _link_preview_host_slot(host: str):
+    with _link_preview_lock:
+        slot = _link_preview_host_slots.get(host)
+        if slot is None:
+            slot = threading.BoundedSemaphore(LINK_PREVIEW_FETCH_PER_HOST)
+            _link_preview_host_slots[host] = slot
+    return slot
+
+
+@dataclass
+class LinkPreviewHostCircuit:
+    failures: int = 0
+    open_until: float = 0.0
+    probing: bool = False
+
+
+_link_preview_circuits = {}
+
+
+def _link_preview_host_allowed(host: str) -> bool:
+    with _link_preview_lock:
+        circuit = _link_preview_circuits.get(host)
+        if circuit is None or circuit.failures < LINK_PREVIEW_BREAKER_THRESHOLD:
+            return True
+        if circuit.probing or time.monotonic() < circuit.open_until:
+            return False
+        # Half-open: let a single probe through once the cooldown has passed.
+        circuit.probing = True
+        return True
+
+
+def _record_link_preview_host_result(host: str, reachable: bool) -> None:
+    with _link_preview_lock:
+        if reachable:
+            _link_preview_circuits.pop(host, None)
+            return
+        circuit = _link_preview_circuits.setdefault(host, LinkPreviewHostCircuit())
+        circuit.probing = False
+        circuit.failures += 1
+        if circuit.failures >= LINK_PREVIEW_BREAKER_THRESHOLD:
+            circuit.open_until = time.monotonic() + LINK_PREVIEW_BREAKER_COOLDOWN_SECONDS
+            if circuit.failures == LINK_PREVIEW_BREAKER_THRESHOLD:
+                app.logger.warning("Link preview circuit opened for %s after %d failures", host, circuit.failures)
+
+
+def _fetch_link_preview_before(url: str, deadline: float, cached=None):
+    # Returns (preview, error). Both are None when the fetch was skipped and should simply be retried later.
+    host = (urlsplit(url).hostname or "").lower()
+    slot = _link_preview_host_slot(host)
+    remaining = deadline - time.monotonic()
+    if remaining <= 0 or not slot.acquire(timeout=remaining):
+        return None, None
+    if not _link_preview_host_allowed(host):
+        slot.release()
+        return None, None
+    try:
+        budget_deadline = min(deadline, time.monotonic() + LINK_PREVIEW_FETCH_TIMEOUT_SECONDS)
+        preview = _fetch_link_preview_or_raise(url, budget_deadline, cached=cached)
+    except HTTPError as exc:
+        _record_link_preview_host_result(host, True)
+        return None, f"HTTP {exc.code}"
+    except (URLError, TimeoutError, socket.timeout, OSError) as exc:
+        _record_link_preview_host_result(host, False)
+        return None, f"{type(exc).__name__}: {exc}"
+    except Exception as exc:
+        _record_link_preview_host_result(host, True)
+        return None, f"{type(exc).__name__}: {exc}"
+    finally:
+        slot.release()
+    _record_link_preview_host_result(host, True)
+    if not preview:
+        return None, "no preview metadata"
+    return preview, None
+
+
+def _fetch_link_previews(urls, cached=None):
+    cached = cached or {}
+    if not urls:
+        return [], [], {}
+    # Interleave hosts so pool threads are rarely parked on a busy host's slot.
+    by_host = defaultdict(list)
+    for url in urls:
+        by_host[(urlsplit(url).hostname or "").lower()].append(url)
+    ordered = [url for group in zip_longest(*by_host.values()) for url in group if url]
+
+    deadline = time.monotonic() + LINK_PREVIEW_BATCH_DEADLINE_SECONDS
+    executor = ThreadPoolExecutor(
+        max_workers=min(LINK_PREVIEW_FETCH_CONCURRENCY, len(ordered)),
+        thread_name_prefix="link-preview-fetch",
+    )
+    try:
+        futures = [executor.submit(_fetch_link_preview_before, url, deadline, cached.get(url)) for url in ordered]
+        done, not_done = wait(futures, timeout=LINK_PREVIEW_BATCH_DEADLINE_SECONDS)
+    finally:
+        # Fetches still running past the deadline finish on their own; their results are dropped.
+        executor.shutdown(wait=False, cancel_futures=True)
+    if not_done:
+        app.logger.warning("Link preview batch hit its deadline with %d of %d fetches unfinished", len(not_done), len(futures))
+    previews = []
+    not_modified = []
+    errors = {}
+    for url, future in zip(ordered, futures):
+        if future not in done or future.exception() is not None:
+            continue
+        preview, error = future.result()
+        if preview is LINK_PREVIEW_NOT_MODIFIED:
+            not_modified.append(cached[url])
+        elif preview:
+            previews.append(preview)
+        elif error:
+            errors[url] = error
+    return previews, not_modified, errors
+
+
+def _refresh_link_previews(urls) -> None:
+    cached = _get_cached_previews(urls)
+    failures = _get_preview_failures(urls)
+    stale_urls = [
+        url
+        for url in urls
+        if (url not in cached or _is_preview_stale(cached[url])) and not _is_preview_backing_off(failures.get(url))
+    ]
+    previews, not_modified, errors = _fetch_link_previews(stale_urls, cached=cached)
+    _upsert_previews(previews)
+    _mark_previews_revalidated(not_modified)
+    _clear_preview_failures(preview["url"] for preview in previews + not_modified if preview["url"] in failures)
+    _record_preview_failures(errors, failures)
+    refreshed = {preview["url"] for preview in previews}
+    _warm_preview_images([*previews, *(preview for url, preview in cached.items() if url not in refreshed)])
+
+
+def _run_link_preview_maintenance(last_flush: float, last_prune: float):
+    now = time.monotonic()
+    try:
+        if now - last_flush >= LINK_PREVIEW_TOUCH_FLUSH_SECONDS:
+            last_flush = now
+            _flush_link_preview_touches()
+        if now - last_prune >= LINK_PREVIEW_PRUNE_INTERVAL_SECONDS:
+            last_prune = now
+            pruned, pruned_failures = _prune_link_previews()
+            app.logger.info(
+                "Pruned %d link previews and %d failure records; memory cache %s",
+                pruned,
+                pruned_failures,
+                _link_preview_cache_stats(),
+            )
+    except Exception as exc:
+        app.logger.warning("Link preview maintenance failed: %s", exc)
+    return last_flush, last_prune
+
+
+def _link_preview_worker_loop() -> None:
+    last_flush = time.monotonic()
+    last_prune = 0.0
+    while True:
+        try:
+            urls = [_link_preview_queue.get(timeout=LINK_PREVIEW_TOUCH_FLUSH_SECONDS)]
+        except queue.Empty:
+            urls = []
+        while urls and len(urls) < LINK_PREVIEW_BATCH_SIZE:
+            try:
+                urls.append(_link_preview_queue.get_nowait())
+            except queue.Empty:
+                break
+        if urls:
+            try:
+                _refresh_link_previews(urls)
+            except Exception as exc:
+                app.logger.warning("Failed to refresh link previews for %s: %s", ", ".join(urls), exc)
+            finally:
+                with _link_preview_lock:
+                    _link_preview_pending.difference_update(urls)
+                for _ in urls:
+                    _link_preview_queue.task_done()
+        last_flush, last_prune = _run_link_preview_maintenance(last_flush, last_prune)
+
+
+def _ensure_link_preview_worker() -> None:
+    global _link_preview_worker
+    # Started lazily and re-checked each time, so a forked worker process gets its own thread.
+    with _link_preview_lock:
+        if _link_preview_worker is None or not _link_preview_worker.is_alive():
+            _link_preview_worker = threading.Thread(
+                target=_link_preview_worker_loop,
+                name="link-preview-worker",
+                daemon=True,
+            )
+            _link_preview_worker.start()
+
 
-    fetched = _fetch_link_preview(url)
-    if fetched:
-        _upsert_preview(fetched)
-        fetched["fetched_at"] = datetime.now(timezone.utc)
-        return fetched
+def _enqueue_link_previews(urls) -> None:
+    with _link_preview_lock:
+        for url in urls:
+            if url in _link_preview_pending:
+                continue
+            try:
+                _link_preview_queue.put_nowait(url)
+            except queue.Full:
+                app.logger.warning("Link preview queue is full; dropping %s", url)
+                break
+            _link_preview_pending.add(url)
+    _ensure_link_preview_worker()
+
+
+def _get_previews_for_render(urls):
+    # Renders never fetch: serve whatever is cached (even if stale) and let the worker refresh it.
+    cached = _get_cached_previews(urls)
+    stale_urls = [
+        url
+        for url in dict.fromkeys(urls)
+        if url not in cached or _is_preview_stale(cached[url]) or _preview_image_needs_warming(cached[url])
+    ]
+    if stale_urls:
+        _enqueue_link_previews(stale_urls)
+    elif cached:
+        # The worker also flushes last-access times and prunes, so keep it alive while pages are read.
+        _ensure_link_preview_worker()
     return cached
 
 
-def _timeline_prepare_posts(posts):
+def _preview_image_cache_path(image_key: str) -> str:
+    return _disk_cache_path(LINK_PREVIEW_IMAGE_CACHE_DIR, image_key, ".webp")
+
+
+def _preview_image_proxyable(preview: dict) -> bool:
+    image_url = preview.get("image_url", "")
+    return Image is not None and bool(preview.get("image_key")) and _is_public_fetchable_url(image_url)
+
+
+def _preview_image_needs_warming(preview: dict) -> bool:
+    if not _preview_image_proxyable(preview):
+        return False
+    image_key = preview["image_key"]
+    if os.path.exists(_preview_image_cache_path(image_key)):
+        return False
+    with _link_preview_lock:
+        backoff = _preview_image_backoff.get(image_key)
+    return backoff is None or backoff[1] <= time.monotonic()
+
+
+def _preview_image_src(preview: dict) -> str:
+    image_url = preview.get("image_url", "")
+    if not image_url:
+        return ""
+    # Until the worker has cached the thumbnail, the card hotlinks the original.
+    if not _preview_image_proxyable(preview) or not os.path.exists(_preview_image_cache_path(preview["image_key"])):
+        return image_url
+    return url_for("mytimeline_preview_image", image_key=preview["image_key"])
+
+
+def _preview_image_source(image_key: str):
+    if _timeline_db_kind() == "postgres":
+        with _open_timeline_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "SELECT url, image_url FROM mytimeline_link_previews WHERE image_key = %s LIMIT 1",
+                    (image_key,),
+                )
+                row = cur.fetchone()
+    else:
+        with _open_timeline_db() as conn:
+            row = conn.execute(
+                "SELECT url, image_url FROM mytimeline_link_previews WHERE image_key = ? LIMIT 1",
+                (image_key,),
+            ).fetchone()
+    return (row[0], row[1]) if row else ("", "")
+
+
+def _fetch_preview_image(image_url: str) -> bytes:
+    host = (urlsplit(image_url).hostname or "").lower()
+    slot = _link_preview_host_slot(host)
+    if not slot.acquire(timeout=LINK_PREVIEW_FETCH_TIMEOUT_SECONDS):
+        raise TimeoutError(f"no free fetch slot for {host}")
+    try:
+        if not _link_preview_host_allowed(host):
+            raise URLError(f"circuit open for {host}")
+        req = Request(image_url, headers={"User-Agent": FETCH_USER_AGENT, "Accept": "image/*"})
+        try:
+            with urlopen(req, timeout=LINK_PREVIEW_FETCH_TIMEOUT_SECONDS) as res:
+                if res.headers.get_content_maintype() != "image":
+                    raise ValueError(f"not an image: {res.headers.get_content_type()}")
+                raw = res.read(LINK_PREVIEW_IMAGE_MAX_BYTES + 1)
+        except HTTPError:
+            _record_link_preview_host_result(host, True)
+            raise
+        except (URLError, TimeoutError, socket.timeout, OSError):
+            _record_link_preview_host_result(host, False)
+            raise
+        _record_link_preview_host_result(host, True)
+    finally:
+        slot.release()
+    if len(raw) > LINK_PREVIEW_IMAGE_MAX_BYTES:
+        raise ValueError("image too large")
+    return raw
+
+
+def _render_preview_image_thumbnail(raw: bytes) -> bytes:
+    size = (LINK_PREVIEW_IMAGE_SIZE, LINK_PREVIEW_IMAGE_SIZE)
+    with Image.open(io.BytesIO(raw)) as image:
+        # Lets JPEG decode at a reduced scale instead of full resolution.
+        image.draft("RGB", (size[0] * 2, size[1] * 2))
+        working = ImageOps.exif_transpose(image)
+        working = working.convert("RGBA" if "A" in working.getbands() or "transparency" in working.info else "RGB")
+        thumbnail = ImageOps.fit(working, size, Image.Resampling.LANCZOS)
+    output = io.BytesIO()
+    thumbnail.save(output, format="WEBP", quality=LINK_PREVIEW_IMAGE_WEBP_QUALITY)
+    return output.getvalue()
+
+
+def _store_preview_image(image_key: str, body: bytes) -> None:
+    path = _preview_image_cache_path(image_key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _write_file_atomic(path, body)
+    _disk_cache_added(LINK_PREVIEW_IMAGE_CACHE_DIR, len(body), LINK_PREVIEW_IMAGE_CACHE_MAX_BYTES)
+
+
+def _warm_preview_image(image_key: str, image_url: str) -> None:
+    try:
+        _store_preview_image(image_key, _render_preview_image_thumbnail(_fetch_preview_image(image_url)))
+    except Exception as exc:
+        app.logger.warning("Failed to cache preview image %s: %s", image_url, exc)
+        with _link_preview_lock:
+            failures = _preview_image_backoff.get(image_key, (0, 0.0))[0] + 1
+            delay = min(LINK_PREVIEW_RETRY_BASE_SECONDS * 2 ** (failures - 1), LINK_PREVIEW_RETRY_MAX_SECONDS)
+            _preview_image_backoff[image_key] = (failures, time.monotonic() + delay)
+        return
+    with _link_preview_lock:
+        _preview_image_backoff.pop(image_key, None)
+
+
+def _warm_preview_images(previews) -> None:
+    # Runs on the link-preview worker so the image route never fetches on a request.
+    pending = {}
+    for preview in previews:
+        preview = {**preview, "image_key": migrations.preview_image_key(preview.get("image_url", ""))}
+        if _preview_image_needs_warming(preview):
+            pending.setdefault(preview["image_key"], preview["image_url"])
+    if not pending:
+        return
+    executor = ThreadPoolExecutor(
+        max_workers=min(LINK_PREVIEW_FETCH_CONCURRENCY, len(pending)),
+        thread_name_prefix="link-preview-image",
+    )
+    try:
+        futures = [executor.submit(_warm_preview_image, image_key, image_url) for image_key, image_url in pending.items()]
+        _, not_done = wait(futures, timeout=LINK_PREVIEW_BATCH_DEADLINE_SECONDS)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    if not_done:
+        app.logger.warning("Preview image warming hit its deadline with %d of %d fetches unfinished", len(not_done), len(futures))
+
+
+def _timeline_image_variants_from_json(variants_raw):
+    try:
+        variants = json.loads(variants_raw or "[]")
+    except (ValueError, TypeError):
+        return []
+    return [variant for variant in variants if isinstance(variant, dict) and variant.get("drive_file_id")]
+
+
+def _timeline_image_sources(post, image_url: str):
+    srcsets = {}
+    for variant in post.get("image_variants") or []:
+        variant_url = url_for(
+            "mytimeline_image_variant",
+            post_id=post["id"],
+            image_key=_timeline_image_key(variant["drive_file_id"]),
+        )
+        srcsets.setdefault(variant["mime_type"], []).append((variant["width"], variant_url))
+    # Variants skip the width the original already covers in its own format.
+    if post.get("image_mime_type") in srcsets and post.get("image_width"):
+        srcsets[post["image_mime_type"]].append((post["image_width"], image_url))
+    return [
+        {"type": mime_type, "srcset": ", ".join(f"{url} {width}w" for width, url in sorted(entries))}
+        for mime_type, entries in srcsets.items()
+    ]
+
+
+def _timeline_prepare_posts(posts, prev_created_at=None):
     prepared = []
     prev_date_label = None
-    runtime_preview_cache = {}
-    for index, post in enumerate(posts):
+    if prev_created_at is not None:
+        prev_display_dt = prev_created_at.astimezone(TOKYO_TZ)
+        prev_date_label = f"{prev_display_dt.month}/{prev_display_dt.day}"
+    post_urls = [_extract_urls(post.get("content", "")) for post in posts]
+    cached_previews = _get_previews_for_render([url for urls in post_urls for url in urls])
+    for post, urls in zip(posts, post_urls):
         created_at = post.get("created_at")
         if hasattr(created_at, "month") and hasattr(created_at, "day") and hasattr(created_at, "hour") and hasattr(created_at, "minute"):
             if getattr(created_at, "tzinfo", None) is None:
@@ -1221,16 +2323,11 @@ def _timeline_prepare_posts(posts):
             edit_datetime_local = ""
 
         content = post.get("content", "")
-        urls = _extract_urls(content)
-        link_previews = []
-        for link_url in urls:
-            if link_url in runtime_preview_cache:
-                preview = runtime_preview_cache[link_url]
-            else:
-                preview = _get_preview_with_cache(link_url)
-                runtime_preview_cache[link_url] = preview
-            if preview:
-                link_previews.append(preview)
+        link_previews = [
+            {**cached_previews[url], "image_src": _preview_image_src(cached_previews[url])}
+            for url in urls
+            if url in cached_previews
+        ]
 
         preview_urls = [p.get("url", "") for p in link_previews]
         display_content = _remove_urls_from_content(content, preview_urls)
@@ -1242,7 +2339,13 @@ def _timeline_prepare_posts(posts):
         item["content_html"] = _linkify_content(display_content)
         item["link_previews"] = link_previews
         item["edit_datetime_local"] = edit_datetime_local
-        item["image_url"] = url_for("mytimeline_image", post_id=post["id"]) if post.get("image_drive_file_id") else ""
+        item["image_url"] = (
+            url_for("mytimeline_image", post_id=post["id"], v=_timeline_image_key(post["image_drive_file_id"]))
+            if post.get("image_drive_file_id")
+            else ""
+        )
+        item["image_sources"] = _timeline_image_sources(post, item["image_url"]) if item["image_url"] else []
+        item["image_error"] = (post.get("image_upload") or {}).get("error", "") if post.get("image_status") == "failed" else ""
         prepared.append(item)
 
         if date_label:
@@ -1250,130 +2353,34 @@ def _timeline_prepare_posts(posts):
     return prepared
 
 
-def _init_timeline_table() -> None:
-    if _timeline_db_kind() == "postgres":
-        with _open_timeline_db() as conn:
-            with conn.cursor() as cur:
-                cur.execute(
-                    """
-                    CREATE TABLE IF NOT EXISTS mytimeline_posts (
-                      id BIGSERIAL PRIMARY KEY,
-                      content TEXT NOT NULL,
-                      tags TEXT NOT NULL DEFAULT '[]',
-                      image_drive_file_id TEXT NOT NULL DEFAULT '',
-                      image_mime_type TEXT NOT NULL DEFAULT '',
-                      image_width INTEGER,
-                      image_height INTEGER,
-                      created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
-                    )
-                    """
-                )
-                cur.execute(
-                    """
-                    ALTER TABLE mytimeline_posts
-                    ADD COLUMN IF NOT EXISTS tags TEXT NOT NULL DEFAULT '[]'
-                    """
-                )
-                cur.execute(
-                    """
-                    ALTER TABLE mytimeline_posts
-                    ADD COLUMN IF NOT EXISTS image_drive_file_id TEXT NOT NULL DEFAULT ''
-                    """
-                )
-                cur.execute(
-                    """
-                    ALTER TABLE mytimeline_posts
-                    ADD COLUMN IF NOT EXISTS image_mime_type TEXT NOT NULL DEFAULT ''
-                    """
-                )
-                cur.execute(
-                    """
-                    ALTER TABLE mytimeline_posts
-                    ADD COLUMN IF NOT EXISTS image_width INTEGER
-                    """
-                )
-                cur.execute(
-                    """
-                    ALTER TABLE mytimeline_posts
-                    ADD COLUMN IF NOT EXISTS image_height INTEGER
-                    """
-                )
-            conn.commit()
+def _timeline_list_posts(limit: int = TIMELINE_PAGE_SIZE, query: str = "", tags=None, before=None):
+    if tags is None:
+        tags, text_query = _timeline_parse_search_query(query)
     else:
-        with _open_timeline_db() as conn:
-            conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS mytimeline_posts (
-                  id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  content TEXT NOT NULL,
-                  tags TEXT NOT NULL DEFAULT '[]',
-                  image_drive_file_id TEXT NOT NULL DEFAULT '',
-                  image_mime_type TEXT NOT NULL DEFAULT '',
-                  image_width INTEGER,
-                  image_height INTEGER,
-                  created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
-                )
-                """
-            )
-            columns = conn.execute("PRAGMA table_info(mytimeline_posts)").fetchall()
-            column_names = {col["name"] for col in columns}
-            if "tags" not in column_names:
-                conn.execute(
-                    """
-                    ALTER TABLE mytimeline_posts
-                    ADD COLUMN tags TEXT NOT NULL DEFAULT '[]'
-                    """
-                )
-            if "image_drive_file_id" not in column_names:
-                conn.execute(
-                    """
-                    ALTER TABLE mytimeline_posts
-                    ADD COLUMN image_drive_file_id TEXT NOT NULL DEFAULT ''
-                    """
-                )
-            if "image_mime_type" not in column_names:
-                conn.execute(
-                    """
-                    ALTER TABLE mytimeline_posts
-                    ADD COLUMN image_mime_type TEXT NOT NULL DEFAULT ''
-                    """
-                )
-            if "image_width" not in column_names:
-                conn.execute(
-                    """
-                    ALTER TABLE mytimeline_posts
-                    ADD COLUMN image_width INTEGER
-                    """
-                )
-            if "image_height" not in column_names:
-                conn.execute(
-                    """
-                    ALTER TABLE mytimeline_posts
-                    ADD COLUMN image_height INTEGER
-                    """
-                )
-            conn.commit()
-
-
-def _timeline_list_posts(limit: int = 200):
-    _init_timeline_table()
+        text_query = ""
+    where_sql, params = _timeline_post_filter(tags, text_query, before=before)
     if _timeline_db_kind() == "postgres":
         with _open_timeline_db() as conn:
             with conn.cursor() as cur:
                 cur.execute(
-                    """
-                    SELECT id, content, tags, image_drive_file_id, image_mime_type, image_width, image_height, created_at
+                    f"""
+                    SELECT id, content, tags, image_drive_file_id, image_mime_type, image_width, image_height,
+                      image_variants, image_status, image_upload, created_at
                     FROM mytimeline_posts
+                    {where_sql}
                     ORDER BY created_at DESC, id DESC
                     LIMIT %s
                     """,
-                    (limit,),
+                    (*params, limit),
                 )
                 rows = cur.fetchall()
 
         posts = []
         for row in rows:
-            post_id, content, tags_raw, image_drive_file_id, image_mime_type, image_width, image_height, created_at = row
+            (
+                post_id, content, tags_raw, image_drive_file_id, image_mime_type,
+                image_width, image_height, image_variants_raw, image_status, image_upload_raw, created_at,
+            ) = row
             try:
                 tags = json.loads(tags_raw or "[]")
             except (ValueError, TypeError):
@@ -1386,19 +2393,24 @@ def _timeline_list_posts(limit: int = 200):
                 "image_mime_type": image_mime_type or "",
                 "image_width": image_width,
                 "image_height": image_height,
+                "image_variants": _timeline_image_variants_from_json(image_variants_raw),
+                "image_status": image_status or "",
+                "image_upload": _timeline_image_upload_from_json(image_upload_raw),
                 "created_at": created_at,
             })
         return posts
 
     with _open_timeline_db() as conn:
         rows = conn.execute(
-            """
-            SELECT id, content, tags, image_drive_file_id, image_mime_type, image_width, image_height, created_at
+            f"""
+            SELECT id, content, tags, image_drive_file_id, image_mime_type, image_width, image_height,
+              image_variants, image_status, image_upload, created_at
             FROM mytimeline_posts
+            {where_sql}
             ORDER BY created_at DESC, id DESC
             LIMIT ?
             """,
-            (limit,),
+            (*params, limit),
         ).fetchall()
 
     posts = []
@@ -1420,22 +2432,60 @@ def _timeline_list_posts(limit: int = 200):
             "image_mime_type": row["image_mime_type"] or "",
             "image_width": row["image_width"],
             "image_height": row["image_height"],
+            "image_variants": _timeline_image_variants_from_json(row["image_variants"]),
+            "image_status": row["image_status"] or "",
+            "image_upload": _timeline_image_upload_from_json(row["image_upload"]),
             "created_at": parsed_created_at,
         })
     return posts
 
 
-def _timeline_insert_post(content: str, tags, image_meta=None) -> None:
+def _timeline_page(before=None, query: str = "", tags=None):
+    limit = TIMELINE_PAGE_SIZE if before else TIMELINE_FIRST_PAGE_SIZE
+    posts = _timeline_list_posts(limit=limit + 1, query=query, tags=tags, before=before)
+    next_cursor = _format_timeline_cursor(posts[limit - 1]) if len(posts) > limit else ""
+    return posts[:limit], next_cursor
+
+
+def _timeline_request_cursor():
+    raw_before = request.args.get("before", "").strip()
+    if not raw_before:
+        return None
+    before = _parse_timeline_cursor(raw_before)
+    if before is None:
+        abort(400)
+    return before
+
+
+def _timeline_replace_post_tags(conn, post_id: int, tags) -> None:
+    rows = [(post_id, tag) for tag in dict.fromkeys(_normalize_tag(str(t)) for t in tags or []) if tag]
+    if _timeline_db_kind() == "postgres":
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM mytimeline_post_tags WHERE post_id = %s", (post_id,))
+            if rows:
+                cur.executemany("INSERT INTO mytimeline_post_tags (post_id, tag) VALUES (%s, %s)", rows)
+        return
+
+    conn.execute("DELETE FROM mytimeline_post_tags WHERE post_id = ?", (post_id,))
+    conn.executemany("INSERT INTO mytimeline_post_tags (post_id, tag) VALUES (?, ?)", rows)
+
+
+def _timeline_insert_post(content: str, tags, image_meta=None) -> int:
     tags_json = json.dumps(tags, ensure_ascii=False)
     image_meta = image_meta or {}
-    _init_timeline_table()
+    variants_json = json.dumps(image_meta.get("variants") or [])
+    upload_json = _timeline_image_upload_to_json(image_meta.get("upload"))
     if _timeline_db_kind() == "postgres":
         with _open_timeline_db() as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
-                    INSERT INTO mytimeline_posts (content, tags, image_drive_file_id, image_mime_type, image_width, image_height)
-                    VALUES (%s, %s, %s, %s, %s, %s)
+                    INSERT INTO mytimeline_posts (
+                      content, tags, image_drive_file_id, image_mime_type, image_width, image_height, image_variants,
+                      image_status, image_upload
+                    )
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    RETURNING id
                     """,
                     (
                         content,
@@ -1444,16 +2494,24 @@ def _timeline_insert_post(content: str, tags, image_meta=None) -> None:
                         image_meta.get("mime_type", ""),
                         image_meta.get("width"),
                         image_meta.get("height"),
+                        variants_json,
+                        image_meta.get("status", ""),
+                        upload_json,
                     ),
                 )
+                post_id = cur.fetchone()[0]
+            _timeline_replace_post_tags(conn, post_id, tags)
             conn.commit()
-        return
+        return post_id
 
     with _open_timeline_db() as conn:
-        conn.execute(
+        cur = conn.execute(
             """
-            INSERT INTO mytimeline_posts (content, tags, image_drive_file_id, image_mime_type, image_width, image_height)
-            VALUES (?, ?, ?, ?, ?, ?)
+            INSERT INTO mytimeline_posts (
+              content, tags, image_drive_file_id, image_mime_type, image_width, image_height, image_variants,
+              image_status, image_upload
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
             """,
             (
                 content,
@@ -1462,9 +2520,14 @@ def _timeline_insert_post(content: str, tags, image_meta=None) -> None:
                 image_meta.get("mime_type", ""),
                 image_meta.get("width"),
                 image_meta.get("height"),
+                variants_json,
+                image_meta.get("status", ""),
+                upload_json,
             ),
         )
+        _timeline_replace_post_tags(conn, cur.lastrowid, tags)
         conn.commit()
+    return cur.lastrowid
 
 
 def _parse_timeline_local_datetime(value: str):
@@ -1478,13 +2541,13 @@ def _parse_timeline_local_datetime(value: str):
 
 
 def _timeline_get_post(post_id: int):
-    _init_timeline_table()
     if _timeline_db_kind() == "postgres":
         with _open_timeline_db() as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
-                    SELECT id, content, tags, image_drive_file_id, image_mime_type, image_width, image_height, created_at
+                    SELECT id, content, tags, image_drive_file_id, image_mime_type, image_width, image_height,
+                      image_variants, image_status, image_upload, created_at
                     FROM mytimeline_posts
                     WHERE id = %s
                     """,
@@ -1493,7 +2556,10 @@ def _timeline_get_post(post_id: int):
                 row = cur.fetchone()
         if not row:
             return None
-        post_id, content, tags_raw, image_drive_file_id, image_mime_type, image_width, image_height, created_at = row
+        (
+            post_id, content, tags_raw, image_drive_file_id, image_mime_type,
+            image_width, image_height, image_variants_raw, image_status, image_upload_raw, created_at,
+        ) = row
         with suppress(ValueError, TypeError):
             tags = json.loads(tags_raw or "[]")
             return {
@@ -1504,6 +2570,9 @@ def _timeline_get_post(post_id: int):
                 "image_mime_type": image_mime_type or "",
                 "image_width": image_width,
                 "image_height": image_height,
+                "image_variants": _timeline_image_variants_from_json(image_variants_raw),
+                "image_status": image_status or "",
+                "image_upload": _timeline_image_upload_from_json(image_upload_raw),
                 "created_at": created_at,
             }
         return {
@@ -1514,13 +2583,17 @@ def _timeline_get_post(post_id: int):
             "image_mime_type": image_mime_type or "",
             "image_width": image_width,
             "image_height": image_height,
+            "image_variants": _timeline_image_variants_from_json(image_variants_raw),
+            "image_status": image_status or "",
+            "image_upload": _timeline_image_upload_from_json(image_upload_raw),
             "created_at": created_at,
         }
 
     with _open_timeline_db() as conn:
         row = conn.execute(
             """
-            SELECT id, content, tags, image_drive_file_id, image_mime_type, image_width, image_height, created_at
+            SELECT id, content, tags, image_drive_file_id, image_mime_type, image_width, image_height,
+              image_variants, image_status, image_upload, created_at
             FROM mytimeline_posts
             WHERE id = ?
             """,
@@ -1545,108 +2618,410 @@ def _timeline_get_post(post_id: int):
         "image_mime_type": row["image_mime_type"] or "",
         "image_width": row["image_width"],
         "image_height": row["image_height"],
+        "image_variants": _timeline_image_variants_from_json(row["image_variants"]),
+        "image_status": row["image_status"] or "",
+        "image_upload": _timeline_image_upload_from_json(row["image_upload"]),
         "created_at": parsed_created_at,
     }
 
 
-def _timeline_update_post(post_id: int, content: str, tags, created_at_utc: datetime, image_meta=None) -> None:
-    tags_json = json.dumps(tags, ensure_ascii=False)
-    image_meta = image_meta or {}
-    _init_timeline_table()
+def _timeline_update_post(post_id: int, content: str, tags, created_at_utc: datetime, image_meta=None, expected_image_meta=None) -> bool:
+    # Without image_meta the image columns are left alone, so a text edit cannot undo what the
+    # image worker wrote meanwhile. An image change only applies while the row still holds
+    # expected_image_meta; False means the worker (or another edit) got there first.
+    tags_json = json.dumps(tags, ensure_ascii=False)
+    placeholder = "%s" if _timeline_db_kind() == "postgres" else "?"
+    if placeholder == "?":
+        created_at_value = created_at_utc.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    else:
+        created_at_value = created_at_utc
+    assignments = ["content", "tags", "created_at"]
+    params = [content, tags_json, created_at_value]
+    conditions = ["id"]
+    condition_params = [post_id]
+    if image_meta is not None:
+        assignments += [
+            "image_drive_file_id", "image_mime_type", "image_width", "image_height",
+            "image_variants", "image_status", "image_upload",
+        ]
+        params += [
+            image_meta.get("drive_file_id", ""),
+            image_meta.get("mime_type", ""),
+            image_meta.get("width"),
+            image_meta.get("height"),
+            json.dumps(image_meta.get("variants") or []),
+            image_meta.get("status", ""),
+            _timeline_image_upload_to_json(image_meta.get("upload")),
+        ]
+        if expected_image_meta is not None:
+            conditions += ["COALESCE(image_drive_file_id, '')", "COALESCE(image_status, '')", "COALESCE(image_upload, '')"]
+            condition_params += [
+                expected_image_meta.get("drive_file_id", ""),
+                expected_image_meta.get("status", ""),
+                _timeline_image_upload_to_json(expected_image_meta.get("upload")),
+            ]
+    sql = (
+        "UPDATE mytimeline_posts SET "
+        + ", ".join(f"{column} = {placeholder}" for column in assignments)
+        + " WHERE "
+        + " AND ".join(f"{column} = {placeholder}" for column in conditions)
+    )
+
+    if placeholder == "%s":
+        with _open_timeline_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute(sql, (*params, *condition_params))
+                updated = cur.rowcount > 0
+            if updated:
+                _timeline_replace_post_tags(conn, post_id, tags)
+            conn.commit()
+        return updated
+
+    with _open_timeline_db() as conn:
+        updated = conn.execute(sql, (*params, *condition_params)).rowcount > 0
+        if updated:
+            _timeline_replace_post_tags(conn, post_id, tags)
+        conn.commit()
+    return updated
+
+
+def _timeline_delete_post(post_id: int) -> None:
+    existing = _timeline_get_post(post_id)
+    if _timeline_db_kind() == "postgres":
+        with _open_timeline_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM mytimeline_post_tags WHERE post_id = %s", (post_id,))
+                cur.execute("DELETE FROM mytimeline_posts WHERE id = %s", (post_id,))
+            conn.commit()
+    else:
+        with _open_timeline_db() as conn:
+            conn.execute("DELETE FROM mytimeline_post_tags WHERE post_id = ?", (post_id,))
+            conn.execute("DELETE FROM mytimeline_posts WHERE id = ?", (post_id,))
+            conn.commit()
+    if existing:
+        _delete_timeline_images(_timeline_image_file_ids(_timeline_post_image_meta(existing)))
+        _discard_timeline_image_upload(existing.get("image_upload"))
+
+
+def _timeline_posts_missing_image_variants(limit: int = 0):
+    sql = """
+        SELECT id, image_drive_file_id
+        FROM mytimeline_posts
+        WHERE image_drive_file_id <> '' AND image_variants = '[]' AND image_mime_type <> 'image/gif'
+        ORDER BY id DESC
+    """
+    if _timeline_db_kind() == "postgres":
+        with _open_timeline_db() as conn:
+            with conn.cursor() as cur:
+                if limit:
+                    cur.execute(sql + " LIMIT %s", (limit,))
+                else:
+                    cur.execute(sql)
+                rows = cur.fetchall()
+    else:
+        with _open_timeline_db() as conn:
+            rows = conn.execute(sql + " LIMIT ?", (limit or -1,)).fetchall()
+    return [{"id": row[0], "image_drive_file_id": row[1]} for row in rows]
+
+
+def _timeline_set_image_variants(post_id: int, file_id: str, variants) -> bool:
+    # Guarded on the file id so a post whose image was replaced meanwhile is left alone.
+    variants_json = json.dumps(variants)
+    if _timeline_db_kind() == "postgres":
+        with _open_timeline_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "UPDATE mytimeline_posts SET image_variants = %s WHERE id = %s AND image_drive_file_id = %s",
+                    (variants_json, post_id, file_id),
+                )
+                updated = cur.rowcount
+            conn.commit()
+        return updated > 0
+    with _open_timeline_db() as conn:
+        updated = conn.execute(
+            "UPDATE mytimeline_posts SET image_variants = ? WHERE id = ? AND image_drive_file_id = ?",
+            (variants_json, post_id, file_id),
+        ).rowcount
+        conn.commit()
+    return updated > 0
+
+
+def _backfill_timeline_image_variants(workers: int, limit: int = 0):
+    posts = iter(_timeline_posts_missing_image_variants(limit))
+    processed = failed = 0
+    pending = {}
+    # Resizing is CPU-bound, so it runs in a process pool; downloads, uploads and
+    # database writes stay in this process.
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while True:
+            # A small window keeps only a few originals in memory at once.
+            while len(pending) < workers * 2:
+                post = next(posts, None)
+                if post is None:
+                    break
+                try:
+                    with open(_timeline_image_path(post["image_drive_file_id"]), "rb") as f:
+                        raw_bytes = f.read()
+                except Exception as exc:
+                    app.logger.warning("Failed to read image for post %s: %s", post["id"], exc)
+                    failed += 1
+                    continue
+                future = pool.submit(timeline_images.render_variants, raw_bytes, f"mytimeline-{post['id']}")
+                pending[future] = post
+            if not pending:
+                break
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                post = pending.pop(future)
+                try:
+                    variants = _store_timeline_image_variants(future.result())
+                except Exception as exc:
+                    app.logger.warning("Failed to render image variants for post %s: %s", post["id"], exc)
+                    failed += 1
+                    continue
+                if not variants:
+                    failed += 1
+                    continue
+                if not _timeline_set_image_variants(post["id"], post["image_drive_file_id"], variants):
+                    _delete_timeline_images(variant["drive_file_id"] for variant in variants)
+                    continue
+                processed += 1
+    return processed, failed
+
+
+def _timeline_image_upload_from_json(upload_raw):
+    try:
+        upload = json.loads(upload_raw or "{}")
+    except (ValueError, TypeError):
+        return {}
+    return upload if isinstance(upload, dict) else {}
+
+
+def _timeline_image_upload_to_json(upload) -> str:
+    return json.dumps(upload, ensure_ascii=False) if upload else ""
+
+
+def _spool_timeline_image_upload(upload) -> dict:
+    os.makedirs(TIMELINE_IMAGE_PENDING_DIR, exist_ok=True)
+    spool_name = f"{datetime.now(TOKYO_TZ).strftime('%Y%m%d-%H%M%S')}-{secrets.token_hex(8)}.upload"
+    spool_path = os.path.join(TIMELINE_IMAGE_PENDING_DIR, spool_name)
+    tmp_path = f"{spool_path}.{secrets.token_hex(4)}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            shutil.copyfileobj(upload["stream"], f)
+        os.replace(tmp_path, spool_path)
+    finally:
+        with suppress(FileNotFoundError):
+            os.remove(tmp_path)
+    return {"spool": spool_name, "filename": upload["filename"], "mimetype": upload["mimetype"]}
+
+
+def _discard_timeline_image_upload(upload) -> None:
+    if upload and upload.get("spool"):
+        with suppress(FileNotFoundError):
+            os.remove(os.path.join(TIMELINE_IMAGE_PENDING_DIR, os.path.basename(upload["spool"])))
+
+
+def _timeline_pending_image_post_ids():
+    if _timeline_db_kind() == "postgres":
+        with _open_timeline_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT id FROM mytimeline_posts WHERE image_status = 'pending' ORDER BY id")
+                rows = cur.fetchall()
+    else:
+        with _open_timeline_db() as conn:
+            rows = conn.execute("SELECT id FROM mytimeline_posts WHERE image_status = 'pending' ORDER BY id").fetchall()
+    return [row[0] for row in rows]
+
+
+def _timeline_get_image_upload(post_id: int):
+    if _timeline_db_kind() == "postgres":
+        with _open_timeline_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT image_status, image_upload FROM mytimeline_posts WHERE id = %s", (post_id,))
+                row = cur.fetchone()
+    else:
+        with _open_timeline_db() as conn:
+            row = conn.execute("SELECT image_status, image_upload FROM mytimeline_posts WHERE id = ?", (post_id,)).fetchone()
+    return (row[0], row[1]) if row else ("", "")
+
+
+def _timeline_finish_image_upload(post_id: int, upload_raw: str, image_meta) -> bool:
+    # Guarded on the upload so a newer replacement or a removal made meanwhile wins.
+    params = (
+        image_meta.get("drive_file_id", ""),
+        image_meta.get("mime_type", ""),
+        image_meta.get("width"),
+        image_meta.get("height"),
+        json.dumps(image_meta.get("variants") or []),
+        post_id,
+        upload_raw,
+    )
     if _timeline_db_kind() == "postgres":
         with _open_timeline_db() as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
                     UPDATE mytimeline_posts
-                    SET content = %s, tags = %s, image_drive_file_id = %s, image_mime_type = %s, image_width = %s, image_height = %s, created_at = %s
-                    WHERE id = %s
+                    SET image_drive_file_id = %s, image_mime_type = %s, image_width = %s, image_height = %s,
+                        image_variants = %s, image_status = '', image_upload = ''
+                    WHERE id = %s AND image_status = 'pending' AND image_upload = %s
                     """,
-                    (
-                        content,
-                        tags_json,
-                        image_meta.get("drive_file_id", ""),
-                        image_meta.get("mime_type", ""),
-                        image_meta.get("width"),
-                        image_meta.get("height"),
-                        created_at_utc,
-                        post_id,
-                    ),
+                    params,
                 )
+                updated = cur.rowcount
             conn.commit()
-        return
-
-    created_at_str = created_at_utc.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        return updated > 0
     with _open_timeline_db() as conn:
-        conn.execute(
+        updated = conn.execute(
             """
             UPDATE mytimeline_posts
-            SET content = ?, tags = ?, image_drive_file_id = ?, image_mime_type = ?, image_width = ?, image_height = ?, created_at = ?
-            WHERE id = ?
+            SET image_drive_file_id = ?, image_mime_type = ?, image_width = ?, image_height = ?,
+                image_variants = ?, image_status = '', image_upload = ''
+            WHERE id = ? AND image_status = 'pending' AND image_upload = ?
             """,
-            (
-                content,
-                tags_json,
-                image_meta.get("drive_file_id", ""),
-                image_meta.get("mime_type", ""),
-                image_meta.get("width"),
-                image_meta.get("height"),
-                created_at_str,
-                post_id,
-            ),
-        )
+            params,
+        ).rowcount
         conn.commit()
+    return updated > 0
 
 
-def _timeline_delete_post(post_id: int) -> None:
-    existing = _timeline_get_post(post_id)
-    _init_timeline_table()
-    if _timeline_db_kind() == "postgres":
-        with _open_timeline_db() as conn:
-            with conn.cursor() as cur:
-                cur.execute("DELETE FROM mytimeline_posts WHERE id = %s", (post_id,))
-            conn.commit()
-    else:
-        with _open_timeline_db() as conn:
-            conn.execute("DELETE FROM mytimeline_posts WHERE id = ?", (post_id,))
-            conn.commit()
-    if existing and existing.get("image_drive_file_id"):
-        _delete_timeline_image(existing["image_drive_file_id"])
-
-
-def _init_tetris_ranking_table() -> None:
+def _timeline_fail_image_upload(post_id: int, upload_raw: str, message: str) -> None:
+    params = (json.dumps({"error": message}, ensure_ascii=False), post_id, upload_raw)
     if _timeline_db_kind() == "postgres":
         with _open_timeline_db() as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
-                    CREATE TABLE IF NOT EXISTS super_tetris_scores (
-                      id BIGSERIAL PRIMARY KEY,
-                      name VARCHAR(16) NOT NULL,
-                      score INTEGER NOT NULL CHECK (score >= 0),
-                      created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
-                    )
-                    """
+                    UPDATE mytimeline_posts SET image_status = 'failed', image_upload = %s
+                    WHERE id = %s AND image_status = 'pending' AND image_upload = %s
+                    """,
+                    params,
                 )
             conn.commit()
         return
-
     with _open_timeline_db() as conn:
         conn.execute(
             """
-            CREATE TABLE IF NOT EXISTS super_tetris_scores (
-              id INTEGER PRIMARY KEY AUTOINCREMENT,
-              name TEXT NOT NULL,
-              score INTEGER NOT NULL CHECK (score >= 0),
-              created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
-            )
-            """
+            UPDATE mytimeline_posts SET image_status = 'failed', image_upload = ?
+            WHERE id = ? AND image_status = 'pending' AND image_upload = ?
+            """,
+            params,
         )
         conn.commit()
 
 
+_timeline_image_queue = queue.Queue()
+_timeline_image_lock = threading.Lock()
+_timeline_image_worker = None
+_timeline_image_pool = None
+
+
+def _timeline_image_process_pool():
+    global _timeline_image_pool
+    with _timeline_image_lock:
+        if _timeline_image_pool is None:
+            # spawn, not fork: the web process has live threads and DB connections to leave behind.
+            # Children only need timeline_images, but spawn also re-runs the parent's main
+            # script, which may import this module; the startup work below skips child processes.
+            _timeline_image_pool = ProcessPoolExecutor(
+                max_workers=max(1, TIMELINE_IMAGE_WORKERS),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _timeline_image_pool
+
+
+def _reset_timeline_image_process_pool() -> None:
+    global _timeline_image_pool
+    with _timeline_image_lock:
+        pool, _timeline_image_pool = _timeline_image_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _process_timeline_image_uploads(post_ids) -> None:
+    jobs = {}
+    for post_id in dict.fromkeys(post_ids):
+        status, upload_raw = _timeline_get_image_upload(post_id)
+        if status != "pending":
+            continue
+        upload = _timeline_image_upload_from_json(upload_raw)
+        spool_path = os.path.join(TIMELINE_IMAGE_PENDING_DIR, os.path.basename(upload.get("spool", "")))
+        if not os.path.isfile(spool_path):
+            app.logger.warning("Pending image for post %s is gone: %s", post_id, spool_path)
+            _timeline_fail_image_upload(post_id, upload_raw, "画像が見つかりませんでした。もう一度アップロードしてください。")
+            continue
+        # The worker process opens the spool file itself, so the upload is never copied through the pipe.
+        payload = {"path": spool_path, "filename": upload.get("filename", ""), "mimetype": upload.get("mimetype", "")}
+        future = _timeline_image_process_pool().submit(timeline_images.normalize_upload, payload)
+        jobs[future] = (post_id, upload_raw, upload)
+
+    for future in wait(jobs).done:
+        post_id, upload_raw, upload = jobs[future]
+        try:
+            image_meta = _store_timeline_image(future.result())
+        except TimelineImageError as exc:
+            _timeline_fail_image_upload(post_id, upload_raw, str(exc))
+        except Exception as exc:
+            app.logger.warning("Failed to process image for post %s: %s", post_id, exc)
+            if isinstance(exc, BrokenProcessPool):
+                _reset_timeline_image_process_pool()
+            _timeline_fail_image_upload(post_id, upload_raw, "画像の処理に失敗しました。")
+        else:
+            previous = _timeline_get_post(post_id)
+            if _timeline_finish_image_upload(post_id, upload_raw, image_meta):
+                if previous and previous.get("image_drive_file_id"):
+                    _delete_timeline_images(_timeline_image_file_ids(_timeline_post_image_meta(previous)))
+            else:
+                _delete_timeline_images(_timeline_image_file_ids(image_meta))
+        _discard_timeline_image_upload(upload)
+
+
+def _timeline_image_worker_loop() -> None:
+    # Uploads accepted before a restart are still marked pending; pick them up first.
+    for post_id in _timeline_pending_image_post_ids():
+        _timeline_image_queue.put(post_id)
+    while True:
+        post_ids = [_timeline_image_queue.get()]
+        with suppress(queue.Empty):
+            while len(post_ids) < max(1, TIMELINE_IMAGE_WORKERS) * 4:
+                post_ids.append(_timeline_image_queue.get_nowait())
+        try:
+            _process_timeline_image_uploads(post_ids)
+        except Exception as exc:
+            app.logger.warning("Timeline image worker batch failed: %s", exc)
+
+
+def _ensure_timeline_image_worker() -> None:
+    global _timeline_image_worker
+    with _timeline_image_lock:
+        if _timeline_image_worker is not None and _timeline_image_worker.is_alive():
+            return
+        _timeline_image_worker = threading.Thread(
+            target=_timeline_image_worker_loop,
+            name="timeline-image-worker",
+            daemon=True,
+        )
+        _timeline_image_worker.start()
+
+
+def _resume_timeline_image_uploads() -> None:
+    # Uploads accepted before a restart are still pending; the worker picks them up as it starts.
+    try:
+        pending = _timeline_pending_image_post_ids()
+    except Exception as exc:
+        app.logger.warning("Could not check for pending timeline images: %s", exc)
+        return
+    if pending:
+        _ensure_timeline_image_worker()
+
+
+def _enqueue_timeline_image(post_id: int) -> None:
+    _ensure_timeline_image_worker()
+    _timeline_image_queue.put(post_id)
+
+
 def _tetris_insert_score(name: str, score: int) -> None:
-    _init_tetris_ranking_table()
     safe_name = (name or "NONAME").strip()[:16] or "NONAME"
     safe_score = max(0, int(score))
     if _timeline_db_kind() == "postgres":
@@ -1674,7 +3049,6 @@ def _tetris_insert_score(name: str, score: int) -> None:
 
 
 def _tetris_top3():
-    _init_tetris_ranking_table()
     if _timeline_db_kind() == "postgres":
         with _open_timeline_db() as conn:
             with conn.cursor() as cur:
@@ -1739,31 +3113,354 @@ def fetch_diary_by_page(page_no: int):
             "html": f"<p>日記の取得に失敗しました。<br>{html.escape(str(exc))}</p>",
         }]
 
+@dataclass
+class DiaryPageCacheEntry:
+    version_key: str
+    etag: str
+    body: bytes
+    generation: tuple
+    validated_at: float
+
+
+_diary_page_cache: "OrderedDict[str, DiaryPageCacheEntry]" = OrderedDict()
+_diary_page_cache_lock = threading.Lock()
+_diary_page_cache_local_generation = 0
+_diary_shared_page_cache_ready = set()
+_diary_page_template_digest = None
+
+
+def _diary_page_cache_dir() -> str:
+    return os.getenv("DIARY_PAGE_CACHE_DIR", "").strip()
+
+
+def _diary_page_cache_hosts():
+    # The page embeds the request host in its og tags, so only known hosts are cached;
+    # anything else in the Host header renders uncached instead of growing the cache.
+    hosts = {urlsplit(_diary_freeze_base_url()).hostname or "", app.config.get("SERVER_NAME") or ""}
+    hosts.update(os.getenv("DIARY_PAGE_CACHE_HOSTS", "").split(","))
+    return {host.strip().lower() for host in hosts if host.strip()}
+
+
+def _diary_page_cache_key(page_no: int):
+    if request.host.lower() not in _diary_page_cache_hosts():
+        return None
+    return f"{request.host_url}|{page_no}"
+
+
+def _diary_page_cache_stamp_path() -> str:
+    return os.path.join(_diary_page_cache_dir(), "diary_pages.stamp")
+
+
+def _diary_page_cache_db_path() -> str:
+    return os.path.join(_diary_page_cache_dir(), "diary_pages.sqlite3")
+
+
+def _diary_page_cache_generation():
+    # Writes in this process bump the counter; writes in other workers touch the
+    # shared stamp file, so a stat() is enough to notice them.
+    stamp_mtime = 0
+    if _diary_page_cache_dir():
+        with suppress(OSError):
+            stamp_mtime = os.stat(_diary_page_cache_stamp_path()).st_mtime_ns
+    return (_diary_page_cache_local_generation, stamp_mtime)
+
+
+def _diary_page_cache_get(cache_key: str, generation, version_key=None):
+    with _diary_page_cache_lock:
+        entry = _diary_page_cache.get(cache_key)
+        if entry is None:
+            return None
+        if version_key is None:
+            fresh = time.monotonic() - entry.validated_at < DIARY_PAGE_CACHE_REVALIDATE_SECONDS
+            if entry.generation != generation or not fresh:
+                return None
+        elif entry.version_key != version_key:
+            return None
+        else:
+            entry.generation = generation
+            entry.validated_at = time.monotonic()
+        _diary_page_cache.move_to_end(cache_key)
+        return entry
+
+
+def _diary_page_cache_put(cache_key: str, entry: DiaryPageCacheEntry) -> None:
+    with _diary_page_cache_lock:
+        _diary_page_cache[cache_key] = entry
+        _diary_page_cache.move_to_end(cache_key)
+        while len(_diary_page_cache) > DIARY_PAGE_CACHE_MAX_ENTRIES:
+            _diary_page_cache.popitem(last=False)
+
+
+def _open_diary_shared_page_cache():
+    cache_dir = _diary_page_cache_dir()
+    if not cache_dir:
+        return None
+    db_path = _diary_page_cache_db_path()
+    if db_path not in _diary_shared_page_cache_ready:
+        os.makedirs(cache_dir, exist_ok=True)
+        with db.sqlite_connection(db_path) as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS diary_page_cache (
+                  cache_key TEXT PRIMARY KEY,
+                  version_key TEXT NOT NULL,
+                  etag TEXT NOT NULL,
+                  body BLOB NOT NULL
+                )
+                """
+            )
+        _diary_shared_page_cache_ready.add(db_path)
+    return db.sqlite_connection(db_path)
+
+
+def _diary_shared_page_cache_get(cache_key: str, version_key: str):
+    try:
+        context = _open_diary_shared_page_cache()
+        if context is None:
+            return None
+        with context as conn:
+            row = conn.execute(
+                "SELECT etag, body FROM diary_page_cache WHERE cache_key = ? AND version_key = ?",
+                (cache_key, version_key),
+            ).fetchone()
+    except (OSError, sqlite3.Error) as exc:
+        app.logger.warning("Shared diary page cache read failed: %s", exc)
+        return None
+    if not row:
+        return None
+    return row["etag"], bytes(row["body"])
+
+
+def _diary_shared_page_cache_put(cache_key: str, version_key: str, etag: str, body: bytes) -> None:
+    try:
+        context = _open_diary_shared_page_cache()
+        if context is None:
+            return
+        with context as conn:
+            # REPLACE gives the row a fresh rowid, so rowid order is write order for pruning.
+            conn.execute(
+                "INSERT OR REPLACE INTO diary_page_cache (cache_key, version_key, etag, body) VALUES (?, ?, ?, ?)",
+                (cache_key, version_key, etag, body),
+            )
+            conn.execute(
+                """
+                DELETE FROM diary_page_cache
+                WHERE rowid NOT IN (SELECT rowid FROM diary_page_cache ORDER BY rowid DESC LIMIT ?)
+                """,
+                (DIARY_PAGE_CACHE_MAX_ENTRIES,),
+            )
+    except (OSError, sqlite3.Error) as exc:
+        app.logger.warning("Shared diary page cache write failed: %s", exc)
+
+
+def _invalidate_diary_page_cache() -> None:
+    global _diary_page_cache_local_generation
+    with _diary_page_cache_lock:
+        _diary_page_cache.clear()
+        _diary_page_cache_local_generation += 1
+    if not _diary_page_cache_dir():
+        return
+    try:
+        context = _open_diary_shared_page_cache()
+        with context as conn:
+            conn.execute("DELETE FROM diary_page_cache")
+        with open(_diary_page_cache_stamp_path(), "a"):
+            os.utime(_diary_page_cache_stamp_path(), None)
+    except (OSError, sqlite3.Error) as exc:
+        app.logger.warning("Failed to invalidate shared diary page cache: %s", exc)
+
+
+def _diary_page_template_fingerprint() -> str:
+    # The shared tier outlives deploys, so key entries on the template source too.
+    global _diary_page_template_digest
+    if _diary_page_template_digest is None:
+        source, _, _ = app.jinja_env.loader.get_source(app.jinja_env, "index.html")
+        _diary_page_template_digest = hashlib.sha256(source.encode("utf-8")).hexdigest()[:12]
+    return _diary_page_template_digest
+
+
+def _diary_page_version_key(page_no: int) -> str:
+    periods = _diary_period_index()
+    if page_no < 1 or page_no > len(periods):
+        return f"{len(periods)}|missing"
+    period = periods[page_no - 1]
+    return "|".join(
+        str(value)
+        for value in (
+            _diary_page_template_fingerprint(),
+            DIARY_RENDER_VERSION,
+            len(periods),
+            period["period_id"],
+            period["entry_count"],
+            period["last_updated_at"],
+        )
+    )
+
+
+def _render_diary_page(page_no: int, allow_empty: bool) -> DiaryPageCacheEntry:
+    cache_key = _diary_page_cache_key(page_no)
+    generation = _diary_page_cache_generation()
+    entry = _diary_page_cache_get(cache_key, generation) if cache_key else None
+    if entry is not None:
+        return entry
+
+    total_pages = _diary_total_pages()
+    if not (allow_empty and page_no == 1) and (page_no < 1 or page_no > total_pages):
+        abort(404)
+
+    version_key = _diary_page_version_key(page_no)
+    entry = _diary_page_cache_get(cache_key, generation, version_key=version_key) if cache_key else None
+    if entry is not None:
+        return entry
+
+    shared = _diary_shared_page_cache_get(cache_key, version_key) if cache_key else None
+    if shared is not None:
+        etag, body = shared
+    else:
+        diary = fetch_diary_by_page(page_no)
+        body = render_template(
+            "index.html",
+            diary=diary,
+            current_page=page_no,
+            total_pages=total_pages,
+            diary_pages=_diary_page_items(),
+        ).encode("utf-8")
+        etag = hashlib.sha256(body).hexdigest()[:32]
+        if not cache_key or any(item.get("date") == "error" for item in diary):
+            return DiaryPageCacheEntry(version_key, etag, body, generation, time.monotonic())
+        _diary_shared_page_cache_put(cache_key, version_key, etag, body)
+
+    entry = DiaryPageCacheEntry(version_key, etag, body, generation, time.monotonic())
+    _diary_page_cache_put(cache_key, entry)
+    return entry
+
+
+def _diary_freeze_dir() -> str:
+    return os.getenv("DIARY_FREEZE_DIR", "").strip()
+
+
+def _diary_serve_frozen_enabled() -> bool:
+    return os.getenv("DIARY_SERVE_FROZEN", "").strip().lower() in {"1", "true", "yes", "on"}
+
+
+def _diary_freeze_base_url() -> str:
+    return os.getenv("DIARY_FREEZE_BASE_URL", "https://diary.aaaaaso.com/").strip()
+
+
+def _frozen_diary_page_path(page_no: int) -> str:
+    filename = "index.html" if page_no == 1 else f"page{page_no}.html"
+    return os.path.join(_diary_freeze_dir(), filename)
+
+
+def _write_file_atomic(path: str, data: bytes) -> None:
+    tmp_path = f"{path}.{secrets.token_hex(4)}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _freeze_diary_page(page_no: int, total_pages: int) -> None:
+    with app.test_request_context("/" if page_no == 1 else f"/page{page_no}", base_url=_diary_freeze_base_url()):
+        diary = fetch_diary_by_page(page_no)
+        if any(item.get("date") == "error" for item in diary):
+            raise RuntimeError(f"page {page_no} could not be rendered")
+        body = render_template(
+            "index.html",
+            diary=diary,
+            current_page=page_no,
+            total_pages=total_pages,
+            diary_pages=_diary_page_items(),
+        )
+    _write_file_atomic(_frozen_diary_page_path(page_no), body.encode("utf-8"))
+
+
+def _freeze_manifest_path() -> str:
+    return os.path.join(_diary_freeze_dir(), "manifest.json")
+
+
+def _read_freeze_manifest():
+    try:
+        with open(_freeze_manifest_path(), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _freeze_diary_pages(page_numbers=None):
+    os.makedirs(_diary_freeze_dir(), exist_ok=True)
+    period_ids = [period["period_id"] for period in _load_diary_period_index()]
+    total_pages = len(period_ids)
+    targets = range(1, total_pages + 1) if page_numbers is None else sorted(set(page_numbers))
+    written = []
+    for page_no in targets:
+        if 1 <= page_no <= total_pages:
+            _freeze_diary_page(page_no, total_pages)
+            written.append(page_no)
+
+    if page_numbers is None:
+        for name in os.listdir(_diary_freeze_dir()):
+            match = re.fullmatch(r"page(\d+)\.html", name)
+            if match and int(match.group(1)) > total_pages:
+                os.remove(os.path.join(_diary_freeze_dir(), name))
+
+    manifest = {"total_pages": total_pages, "period_ids": period_ids}
+    _write_file_atomic(_freeze_manifest_path(), json.dumps(manifest).encode("utf-8"))
+    return written
+
+
+def _refreeze_diary_periods(period_ids):
+    # Only the edited periods need re-rendering unless the page numbering moved,
+    # in which case every page's pager is out of date.
+    manifest = _read_freeze_manifest()
+    current_ids = [period["period_id"] for period in _load_diary_period_index()]
+    if not manifest or manifest.get("period_ids") != current_ids:
+        return _freeze_diary_pages()
+    page_by_period = {period_id: index for index, period_id in enumerate(current_ids, start=1)}
+    return _freeze_diary_pages([page_by_period[p] for p in period_ids if p in page_by_period])
+
+
+def _frozen_diary_page_response(page_no: int):
+    if not (_diary_serve_frozen_enabled() and _diary_freeze_dir()):
+        return None
+    path = _frozen_diary_page_path(page_no)
+    if not os.path.isfile(path):
+        return None
+    response = send_file(path, mimetype="text/html", conditional=True, etag=True, max_age=None)
+    response.headers["Cache-Control"] = "public, no-cache"
+    return response
+
+
+def _diary_page_response(page_no: int, allow_empty: bool = False):
+    frozen = _frozen_diary_page_response(page_no)
+    if frozen is not None:
+        return frozen
+    entry = _render_diary_page(page_no, allow_empty)
+    response = app.response_class(entry.body, mimetype="text/html")
+    response.set_etag(entry.etag)
+    response.headers["Cache-Control"] = "public, no-cache"
+    return response.make_conditional(request)
+
+
 @app.route("/")
 def page1():
-    total_pages = _diary_total_pages()
-    diary = fetch_diary_by_page(1)
-    return render_template(
-        "index.html",
-        diary=diary,
-        current_page=1,
-        total_pages=total_pages,
-        diary_pages=_diary_page_items(),
-    )
+    return _diary_page_response(1, allow_empty=True)
 
 @app.route("/page<int:page_no>")
 def page_n(page_no: int):
-    total_pages = _diary_total_pages()
-    if page_no < 1 or page_no > total_pages:
-        abort(404)
+    return _diary_page_response(page_no)
+
 
-    diary = fetch_diary_by_page(page_no)
+@app.route("/search")
+def diary_search():
+    search_query = request.args.get("q", "").strip()[:100]
+    page_no = max(1, request.args.get("page", default=1, type=int) or 1)
+    results, has_next = _diary_search(search_query, page_no)
     return render_template(
-        "index.html",
-        diary=diary,
+        "diary_search.html",
+        search_query=search_query,
+        results=results,
         current_page=page_no,
-        total_pages=total_pages,
-        diary_pages=_diary_page_items(),
+        has_next=has_next,
     )
 
 
@@ -1828,9 +3525,28 @@ def diary_edit_export_json(token: str):
     if not expected or token != expected:
         abort(404)
 
-    return jsonify({
-        "items": _fetch_all_diary_entry_records(),
-    })
+    try:
+        since = _parse_diary_export_since(request.args.get("since", ""))
+    except ValueError:
+        return jsonify({"error": "since must be an ISO 8601 timestamp"}), 400
+
+    records = _iter_diary_entry_records(since=since)
+    export_format = request.args.get("format", "").strip().lower()
+    if not export_format:
+        best = request.accept_mimetypes.best_match(["application/json", "application/x-ndjson"])
+        export_format = "ndjson" if best == "application/x-ndjson" else "json"
+
+    if export_format == "ndjson":
+        return app.response_class(
+            _stream_diary_export_ndjson(records),
+            mimetype="application/x-ndjson",
+            headers={"Vary": "Accept"},
+        )
+    return app.response_class(
+        _stream_diary_export_json(records),
+        mimetype="application/json",
+        headers={"Vary": "Accept"},
+    )
 
 
 @app.route("/edit/<token>/update/<int:entry_id>", methods=["POST"])
@@ -1879,14 +3595,61 @@ def diary_edit_delete(token: str, entry_id: int):
 @app.route("/mytimeline")
 def mytimeline():
     search_query = request.args.get("q", "").strip()
-    all_posts = _timeline_list_posts()
-    filtered_posts = _timeline_search_posts(all_posts, search_query)
-    posts = _timeline_prepare_posts(filtered_posts)
+    before = _timeline_request_cursor()
+    posts, next_cursor = _timeline_page(before, query=search_query)
+    q = search_query or None
     return render_template(
         "mytimeline.html",
-        posts=posts,
+        posts=_timeline_prepare_posts(posts, prev_created_at=before[0] if before else None),
         search_query=search_query,
+        latest_page_url=url_for("mytimeline", q=q) if before else "",
+        next_page_url=url_for("mytimeline", q=q, before=next_cursor) if next_cursor else "",
+        next_fragment_url=url_for("mytimeline_items", q=q, before=next_cursor) if next_cursor else "",
+    )
+
+
+@app.route("/mytimeline/tag/<tag>")
+def mytimeline_tag(tag: str):
+    tag = _normalize_tag(tag)
+    if not tag or not TAG_PATTERN.fullmatch(f"#{tag}"):
+        abort(404)
+    before = _timeline_request_cursor()
+    posts, next_cursor = _timeline_page(before, tags=[tag])
+    return render_template(
+        "mytimeline.html",
+        posts=_timeline_prepare_posts(posts, prev_created_at=before[0] if before else None),
+        search_query=f"#{tag}",
+        latest_page_url=url_for("mytimeline_tag", tag=tag) if before else "",
+        next_page_url=url_for("mytimeline_tag", tag=tag, before=next_cursor) if next_cursor else "",
+        next_fragment_url=url_for("mytimeline_items", tag=tag, before=next_cursor) if next_cursor else "",
+    )
+
+
+@app.route("/mytimeline/items")
+def mytimeline_items():
+    search_query = request.args.get("q", "").strip()
+    tag = _normalize_tag(request.args.get("tag", ""))
+    before = _timeline_request_cursor()
+    if before is None:
+        abort(400)
+    if tag:
+        posts, next_cursor = _timeline_page(before, tags=[tag])
+        page_values = {"endpoint": "mytimeline_tag", "tag": tag}
+        fragment_values = {"tag": tag}
+    else:
+        posts, next_cursor = _timeline_page(before, query=search_query)
+        page_values = {"endpoint": "mytimeline", "q": search_query or None}
+        fragment_values = {"q": search_query or None}
+    items_html = "".join(
+        render_template("_mytimeline_item.html", post=post)
+        for post in _timeline_prepare_posts(posts, prev_created_at=before[0])
     )
+    return jsonify({
+        "ok": True,
+        "items_html": items_html,
+        "next_page_url": url_for(**page_values, before=next_cursor) if next_cursor else "",
+        "next_fragment_url": url_for("mytimeline_items", **fragment_values, before=next_cursor) if next_cursor else "",
+    })
 
 
 @app.route("/mytimeline/image/<int:post_id>")
@@ -1894,18 +3657,72 @@ def mytimeline_image(post_id: int):
     post = _timeline_get_post(post_id)
     if not post or not post.get("image_drive_file_id"):
         abort(404)
+    file_id = post["image_drive_file_id"]
     try:
-        image_bytes = _download_timeline_image(post["image_drive_file_id"])
+        path = _timeline_image_path(file_id)
     except Exception as exc:
         app.logger.warning("Failed to fetch timeline image for post %s: %s", post_id, exc)
         abort(404)
 
+    image_key = _timeline_image_key(file_id)
     response = send_file(
-        io.BytesIO(image_bytes),
+        path,
         mimetype=post.get("image_mime_type") or "application/octet-stream",
         download_name=f"mytimeline-{post_id}",
+        etag=image_key,
+    )
+    if request.args.get("v") == image_key:
+        response.headers["Cache-Control"] = f"public, max-age={IMMUTABLE_CACHE_SECONDS}, immutable"
+    else:
+        # Unversioned or outdated links can change when the post's image is replaced.
+        response.headers["Cache-Control"] = "public, max-age=3600"
+    return response
+
+
+@app.route("/mytimeline/image/<int:post_id>/<image_key>")
+def mytimeline_image_variant(post_id: int, image_key: str):
+    post = _timeline_get_post(post_id)
+    variants = post.get("image_variants") if post else []
+    variant = next((item for item in variants if _timeline_image_key(item["drive_file_id"]) == image_key), None)
+    if variant is None:
+        abort(404)
+    try:
+        path = _timeline_image_path(variant["drive_file_id"])
+    except Exception as exc:
+        app.logger.warning("Failed to fetch image variant %s for post %s: %s", image_key, post_id, exc)
+        abort(404)
+
+    response = send_file(
+        path,
+        mimetype=variant.get("mime_type") or "application/octet-stream",
+        download_name=f"mytimeline-{post_id}-{variant.get('width')}w",
+        etag=image_key,
     )
-    response.headers["Cache-Control"] = "public, max-age=3600"
+    # The key is derived from the variant's file id, so this URL always names the same bytes.
+    response.headers["Cache-Control"] = f"public, max-age={IMMUTABLE_CACHE_SECONDS}, immutable"
+    return response
+
+
+@app.route("/mytimeline/preview-image/<image_key>")
+def mytimeline_preview_image(image_key: str):
+    if Image is None or not re.fullmatch(r"[0-9a-f]{32}", image_key):
+        abort(404)
+    path = _preview_image_cache_path(image_key)
+    if os.path.exists(path):
+        _touch_disk_cache_file(path)
+    else:
+        # Only the link-preview worker fetches; a cold cache queues the warm-up and hotlinks meanwhile.
+        page_url, image_url = _preview_image_source(image_key)
+        if not image_url or not _is_public_fetchable_url(image_url):
+            abort(404)
+        _enqueue_link_previews([page_url])
+        response = redirect(image_url)
+        response.headers["Cache-Control"] = "public, max-age=300"
+        return response
+
+    # The key names the source URL, so the bytes behind it never change.
+    response = send_file(path, mimetype="image/webp", etag=image_key, max_age=IMMUTABLE_CACHE_SECONDS)
+    response.headers["Cache-Control"] = f"public, max-age={IMMUTABLE_CACHE_SECONDS}, immutable"
     return response
 
 
@@ -1925,20 +3742,20 @@ def mytimeline_edit(token: str):
         content = _strip_tags_from_content(raw_content)
         validation_error = ""
         image_meta = None
-        image_payload = None
+        upload = None
         if len(content) > 100:
             validation_error = "投稿内容は100文字以内にしてください。"
         elif len(tags) > 3:
             validation_error = "タグは最大3つまでです。"
         else:
             try:
-                image_payload = _normalize_uploaded_image(image_file)
-                if not content and not image_payload:
+                upload = _read_uploaded_image(image_file)
+                if not content and not upload:
                     validation_error = "投稿内容が空です。"
-                if image_payload and not _timeline_image_upload_enabled():
+                if upload and not _timeline_image_upload_enabled():
                     validation_error = "画像アップロード設定が未完了です。"
-                elif image_payload:
-                    image_meta = _store_timeline_image(image_payload)
+                elif upload:
+                    image_meta = {"status": "pending", "upload": _spool_timeline_image_upload(upload)}
             except ValueError as exc:
                 validation_error = str(exc)
             except Exception as exc:
@@ -1951,11 +3768,14 @@ def mytimeline_edit(token: str):
             error_message = validation_error
         else:
             try:
-                _timeline_insert_post(content, tags, image_meta=image_meta)
+                post_id = _timeline_insert_post(content, tags, image_meta=image_meta)
             except Exception:
-                if image_meta and image_meta.get("drive_file_id"):
-                    _delete_timeline_image(image_meta["drive_file_id"])
+                if image_meta:
+                    _discard_timeline_image_upload(image_meta["upload"])
                 raise
+            if image_meta:
+                _enqueue_timeline_image(post_id)
+            _enqueue_link_previews(_extract_urls(content))
             if is_ajax:
                 latest_posts = _timeline_prepare_posts(_timeline_list_posts(limit=1))
                 post_html = ""
@@ -1969,14 +3789,16 @@ def mytimeline_edit(token: str):
                 return jsonify({"ok": True, "post_html": post_html})
             return redirect(url_for("mytimeline_edit", token=token, posted=1, q=search_query or None))
 
-    all_posts = _timeline_list_posts()
-    filtered_posts = _timeline_search_posts(all_posts, search_query)
-    posts = _timeline_prepare_posts(filtered_posts)
+    before = _timeline_request_cursor()
+    posts, next_cursor = _timeline_page(before, query=search_query)
+    q = search_query or None
     posted = request.args.get("posted") == "1"
     return render_template(
         "mytimeline_edit.html",
-        posts=posts,
+        posts=_timeline_prepare_posts(posts, prev_created_at=before[0] if before else None),
         search_query=search_query,
+        latest_page_url=url_for("mytimeline_edit", token=token, q=q) if before else "",
+        next_page_url=url_for("mytimeline_edit", token=token, q=q, before=next_cursor) if next_cursor else "",
         token=token,
         posted=posted,
         error_message=error_message,
@@ -1984,6 +3806,37 @@ def mytimeline_edit(token: str):
     )
 
 
+@app.route("/mytimeline/edit/<token>/db-stats")
+def mytimeline_db_stats(token: str):
+    expected_token = _timeline_edit_token()
+    if not expected_token or token != expected_token:
+        abort(404)
+    # Pool sizes, connection waits and SQLite connection reuse for this process.
+    return jsonify(db.pool_stats())
+
+
+@app.route("/mytimeline/edit/<token>/image-status/<int:post_id>")
+def mytimeline_image_status(token: str, post_id: int):
+    expected_token = _timeline_edit_token()
+    if not expected_token or token != expected_token:
+        abort(404)
+    post = _timeline_get_post(post_id)
+    if not post:
+        abort(404)
+    status = post.get("image_status") or "ready"
+    if status == "pending":
+        # Also restarts the worker if this process has not run it since a restart.
+        _ensure_timeline_image_worker()
+        return jsonify({"ok": True, "status": status, "post_html": ""})
+    post_html = render_template(
+        "_mytimeline_edit_item.html",
+        post=_timeline_prepare_posts([post])[0],
+        token=token,
+        search_query=request.args.get("q", "").strip(),
+    )
+    return jsonify({"ok": True, "status": status, "post_html": post_html})
+
+
 @app.route("/mytimeline/edit/<token>/update/<int:post_id>", methods=["POST"])
 def mytimeline_update(token: str, post_id: int):
     expected_token = _timeline_edit_token()
@@ -2011,46 +3864,66 @@ def mytimeline_update(token: str, post_id: int):
     if not created_at_utc:
         return redirect(url_for("mytimeline_edit", token=token, q=search_query or None, error="日時の形式が不正です。"))
     try:
-        image_payload = _normalize_uploaded_image(image_file)
+        upload = _read_uploaded_image(image_file)
     except ValueError as exc:
         return redirect(url_for("mytimeline_edit", token=token, q=search_query or None, error=str(exc)))
     except Exception as exc:
         app.logger.warning("Failed to read timeline image: %s", exc)
         return redirect(url_for("mytimeline_edit", token=token, q=search_query or None, error="画像の読み込みに失敗しました。"))
-    if not content and not image_payload and not existing_post.get("image_drive_file_id"):
+    if not content and not upload and not existing_post.get("image_drive_file_id") and existing_post.get("image_status") != "pending":
         return redirect(url_for("mytimeline_edit", token=token, q=search_query or None, error="投稿内容が空です。"))
 
-    current_image_meta = {
-        "drive_file_id": existing_post.get("image_drive_file_id", ""),
-        "mime_type": existing_post.get("image_mime_type", ""),
-        "width": existing_post.get("image_width"),
-        "height": existing_post.get("image_height"),
-    }
-    next_image_meta = dict(current_image_meta)
-    old_drive_file_id = current_image_meta.get("drive_file_id", "")
-    newly_uploaded_file_id = ""
+    current_image_meta = _timeline_post_image_meta(existing_post)
+    next_image_meta = None
+    superseded_upload = None
 
-    if image_payload:
+    if upload:
         if not _timeline_image_upload_enabled():
             return redirect(url_for("mytimeline_edit", token=token, q=search_query or None, error="画像アップロード設定が未完了です。"))
         try:
-            next_image_meta = _store_timeline_image(image_payload)
-            newly_uploaded_file_id = next_image_meta.get("drive_file_id", "")
+            # The current image stays up until the worker has stored the replacement.
+            next_image_meta = {**current_image_meta, "status": "pending", "upload": _spool_timeline_image_upload(upload)}
         except Exception as exc:
             app.logger.warning("Failed to replace timeline image: %s", exc)
             return redirect(url_for("mytimeline_edit", token=token, q=search_query or None, error="画像のアップロードに失敗しました。"))
+        superseded_upload = current_image_meta["upload"]
     elif remove_image:
-        next_image_meta = {"drive_file_id": "", "mime_type": "", "width": None, "height": None}
+        next_image_meta = {
+            "drive_file_id": "",
+            "mime_type": "",
+            "width": None,
+            "height": None,
+            "variants": [],
+            "status": "",
+            "upload": {},
+        }
+        superseded_upload = current_image_meta["upload"]
 
     try:
-        _timeline_update_post(post_id, content, tags, created_at_utc, image_meta=next_image_meta)
+        updated = _timeline_update_post(
+            post_id,
+            content,
+            tags,
+            created_at_utc,
+            image_meta=next_image_meta,
+            expected_image_meta=current_image_meta if next_image_meta is not None else None,
+        )
     except Exception:
-        if newly_uploaded_file_id:
-            _delete_timeline_image(newly_uploaded_file_id)
+        if upload:
+            _discard_timeline_image_upload(next_image_meta["upload"])
         raise
+    if not updated:
+        if upload:
+            _discard_timeline_image_upload(next_image_meta["upload"])
+        return redirect(url_for("mytimeline_edit", token=token, q=search_query or None, error="画像の処理状況が変わりました。もう一度保存してください。"))
+    if upload:
+        _enqueue_timeline_image(post_id)
+    _discard_timeline_image_upload(superseded_upload)
+    _enqueue_link_previews(_extract_urls(content))
 
-    if old_drive_file_id and old_drive_file_id != next_image_meta.get("drive_file_id", ""):
-        _delete_timeline_image(old_drive_file_id)
+    old_drive_file_id = current_image_meta.get("drive_file_id", "")
+    if next_image_meta is not None and old_drive_file_id and old_drive_file_id != next_image_meta.get("drive_file_id", ""):
+        _delete_timeline_images(_timeline_image_file_ids(current_image_meta))
     return redirect(url_for("mytimeline_edit", token=token, q=search_query or None))
 
 
@@ -2080,5 +3953,66 @@ def super_tetris_ranking_api():
     _tetris_insert_score(name, score)
     return jsonify(_tetris_top3())
 
+@app.cli.command("migrate")
+@click.option("--status", is_flag=True, help="List pending migrations without applying them.")
+def migrate_command(status: bool):
+    if status:
+        with _open_timeline_db() as conn:
+            pending = migrations.pending_migrations(conn, _timeline_db_kind())
+        if not pending:
+            click.echo("Schema is up to date.")
+        for version, name in pending:
+            click.echo(f"pending {version:03d} {name}")
+        return
+
+    applied = _run_migrations()
+    if not applied:
+        click.echo("Schema is up to date.")
+    for version in applied:
+        click.echo(f"applied {version:03d}")
+
+
+@app.cli.command("freeze")
+@click.option("--output", default="", help="Directory for the static pages (defaults to DIARY_FREEZE_DIR).")
+def freeze_command(output: str):
+    if output:
+        os.environ["DIARY_FREEZE_DIR"] = output
+    if not _diary_freeze_dir():
+        raise click.UsageError("Set DIARY_FREEZE_DIR or pass --output.")
+    started = time.perf_counter()
+    written = _freeze_diary_pages()
+    elapsed = time.perf_counter() - started
+    click.echo(f"Froze {len(written)} diary pages into {_diary_freeze_dir()} in {elapsed:.2f}s")
+
+
+@app.cli.command("prune-link-previews")
+@click.option("--max-rows", default=LINK_PREVIEW_MAX_ROWS, show_default=True, help="Previews to keep, most recently used first.")
+def prune_link_previews_command(max_rows: int):
+    pruned, pruned_failures = _prune_link_previews(max_rows=max_rows)
+    click.echo(f"Pruned {pruned} link previews and {pruned_failures} failure records.")
+
+
+@app.cli.command("backfill-image-variants")
+@click.option("--workers", default=os.cpu_count() or 1, show_default=True, help="Worker processes for resizing.")
+@click.option("--limit", default=0, help="Process at most this many posts, newest first (0 = all).")
+def backfill_image_variants_command(workers: int, limit: int):
+    processed, failed = _backfill_timeline_image_variants(workers=max(1, workers), limit=limit)
+    click.echo(f"Added image variants to {processed} posts; {failed} failed.")
+
+
+@app.cli.command("render-diary-html")
+@click.option("--all", "force", is_flag=True, help="Re-render every entry, not only outdated ones.")
+def render_diary_html_command(force: bool):
+    rendered = _backfill_diary_html(force=force)
+    click.echo(f"Rendered {rendered} diary entries (render version {DIARY_RENDER_VERSION}).")
+
+
+# Spawned image workers name themselves before re-running the main script.
+if multiprocessing.current_process().name == "MainProcess":
+    if _timeline_auto_migrate_enabled():
+        _run_migrations()
+        _backfill_diary_html()
+    _resume_timeline_image_uploads()
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5001, debug=True)
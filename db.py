@@ -0,0 +1,196 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import psycopg
+except ImportError:
+    psycopg = None
+
+try:
+    from psycopg_pool import ConnectionPool
+except ImportError:
+    ConnectionPool = None
+
+logger = logging.getLogger(__name__)
+
+POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "5"))
+POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "10"))
+POOL_MAX_LIFETIME_SECONDS = float(os.getenv("DB_POOL_MAX_LIFETIME_SECONDS", str(30 * 60)))
+POOL_MAX_IDLE_SECONDS = float(os.getenv("DB_POOL_MAX_IDLE_SECONDS", str(5 * 60)))
+POOL_SLOW_WAIT_SECONDS = 0.5
+SQLITE_MAX_IDLE = int(os.getenv("DB_SQLITE_MAX_IDLE", "4"))
+
+_pools = {}
+_pool_wait_stats = {}
+_pools_lock = threading.Lock()
+_sqlite_local = threading.local()
+_sqlite_idle = {}
+_sqlite_stats = {}
+
+
+def _require_psycopg() -> None:
+    if psycopg is None:
+        raise RuntimeError("psycopg is required when using PostgreSQL. Install dependencies from requirements.txt.")
+
+
+def postgres_pool(conninfo: str):
+    pool = _pools.get(conninfo)
+    if pool is not None:
+        return pool
+
+    _require_psycopg()
+    if ConnectionPool is None:
+        return None
+
+    with _pools_lock:
+        pool = _pools.get(conninfo)
+        if pool is None:
+            pool = ConnectionPool(
+                conninfo,
+                min_size=POOL_MIN_SIZE,
+                max_size=max(POOL_MIN_SIZE, POOL_MAX_SIZE),
+                timeout=POOL_TIMEOUT_SECONDS,
+                max_lifetime=POOL_MAX_LIFETIME_SECONDS,
+                max_idle=POOL_MAX_IDLE_SECONDS,
+                check=ConnectionPool.check_connection,
+                name=f"db-pool-{len(_pools) + 1}",
+                open=True,
+            )
+            _pools[conninfo] = pool
+            _pool_wait_stats[pool.name] = {"acquired": 0, "wait_seconds_total": 0.0, "wait_seconds_max": 0.0}
+    return pool
+
+
+def _record_pool_wait(pool_name: str, waited: float) -> None:
+    stats = _pool_wait_stats[pool_name]
+    with _pools_lock:
+        stats["acquired"] += 1
+        stats["wait_seconds_total"] += waited
+        stats["wait_seconds_max"] = max(stats["wait_seconds_max"], waited)
+    if waited >= POOL_SLOW_WAIT_SECONDS:
+        logger.warning("Waited %.3fs for a connection from %s", waited, pool_name)
+
+
+def pool_stats():
+    stats = {}
+    for pool in list(_pools.values()):
+        wait = dict(_pool_wait_stats.get(pool.name, {}))
+        if wait.get("acquired"):
+            wait["wait_seconds_avg"] = wait["wait_seconds_total"] / wait["acquired"]
+        stats[pool.name] = {**pool.get_stats(), **wait}
+    with _pools_lock:
+        for path, counts in _sqlite_stats.items():
+            stats[f"sqlite:{os.path.basename(path)}"] = {**counts, "idle": len(_sqlite_idle.get(path, []))}
+    return stats
+
+
+@contextmanager
+def postgres_connection(conninfo: str, row_factory=None):
+    pool = postgres_pool(conninfo)
+    if pool is None:
+        # psycopg_pool is not installed: fall back to one connection per use.
+        with psycopg.connect(conninfo) as conn:
+            if row_factory is not None:
+                conn.row_factory = row_factory
+            yield conn
+        return
+
+    started = time.perf_counter()
+    with pool.connection() as conn:
+        _record_pool_wait(pool.name, time.perf_counter() - started)
+        default_row_factory = conn.row_factory
+        if row_factory is not None:
+            conn.row_factory = row_factory
+        try:
+            yield conn
+        finally:
+            conn.row_factory = default_row_factory
+
+
+def _sqlite_active():
+    active = getattr(_sqlite_local, "active", None)
+    if active is None:
+        active = {}
+        _sqlite_local.active = active
+    return active
+
+
+def _checkout_sqlite(path: str):
+    with _pools_lock:
+        idle = _sqlite_idle.setdefault(path, [])
+        stats = _sqlite_stats.setdefault(path, {"opened": 0, "reused": 0})
+        if idle:
+            stats["reused"] += 1
+            return idle.pop()
+        stats["opened"] += 1
+    # Connections move between request threads, but only one thread holds one at a time.
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _checkin_sqlite(path: str, conn) -> None:
+    conn.row_factory = sqlite3.Row
+    with _pools_lock:
+        idle = _sqlite_idle.setdefault(path, [])
+        if len(idle) < SQLITE_MAX_IDLE:
+            idle.append(conn)
+            return
+    conn.close()
+
+
+@contextmanager
+def sqlite_connection(path):
+    path = os.fspath(path)
+    active = _sqlite_active()
+    entry = active.get(path)
+    if entry is not None:
+        # A nested block shares the outer block's connection and transaction; only the
+        # outermost exit commits or rolls back.
+        entry["depth"] += 1
+        try:
+            yield entry["conn"]
+        finally:
+            entry["depth"] -= 1
+        return
+
+    conn = _checkout_sqlite(path)
+    active[path] = {"conn": conn, "depth": 1}
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    else:
+        try:
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    finally:
+        del active[path]
+        _checkin_sqlite(path, conn)
+
+
+def connection(kind: str, target, row_factory=None):
+    if kind == "postgres":
+        return postgres_connection(target, row_factory=row_factory)
+    return sqlite_connection(target)
+
+
+def close_all() -> None:
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+    with _pools_lock:
+        idle = [conn for conns in _sqlite_idle.values() for conn in conns]
+        _sqlite_idle.clear()
+    for conn in idle:
+        conn.close()
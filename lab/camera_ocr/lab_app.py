@@ -1,13 +1,14 @@
 import base64
 import os
 import re
-import sqlite3
 import subprocess
 import tempfile
 from pathlib import Path
 
 from flask import Blueprint, jsonify, render_template, request
 
+from db import sqlite_connection
+
 LAB_TITLE = "Camera OCR Tool"
 LAB_DESCRIPTION = "撮影、トリミング、OCR、ラベル保存をひとつの流れで行う。"
 
@@ -26,27 +27,23 @@ bp = Blueprint(
 
 
 def db_conn():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return sqlite_connection(DB_PATH)
 
 
 def init_db():
-    conn = db_conn()
-    conn.execute(
-        """
-        CREATE TABLE IF NOT EXISTS captures (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            label TEXT NOT NULL,
-            extracted_text TEXT NOT NULL DEFAULT '',
-            image_blob BLOB NOT NULL,
-            mime_type TEXT NOT NULL,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    with db_conn() as conn:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS captures (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                label TEXT NOT NULL,
+                extracted_text TEXT NOT NULL DEFAULT '',
+                image_blob BLOB NOT NULL,
+                mime_type TEXT NOT NULL,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+            """
         )
-        """
-    )
-    conn.commit()
-    conn.close()
 
 
 def _decode_data_url(data_url: str) -> tuple[bytes, str]:
@@ -142,38 +139,36 @@ def save_record():
     except ValueError as exc:
         return jsonify({"error": str(exc)}), 400
 
-    conn = db_conn()
-    cursor = conn.execute(
-        """
-        INSERT INTO captures(label, extracted_text, image_blob, mime_type)
-        VALUES(?, ?, ?, ?)
-        """,
-        (label, extracted_text, image_bytes, mime_type),
-    )
-    conn.commit()
-    record_id = cursor.lastrowid
-    row = conn.execute(
-        """
-        SELECT id, label, extracted_text, mime_type, created_at
-        FROM captures
-        WHERE id = ?
-        """,
-        (record_id,),
-    ).fetchone()
-    conn.close()
+    with db_conn() as conn:
+        cursor = conn.execute(
+            """
+            INSERT INTO captures(label, extracted_text, image_blob, mime_type)
+            VALUES(?, ?, ?, ?)
+            """,
+            (label, extracted_text, image_bytes, mime_type),
+        )
+        conn.commit()
+        record_id = cursor.lastrowid
+        row = conn.execute(
+            """
+            SELECT id, label, extracted_text, mime_type, created_at
+            FROM captures
+            WHERE id = ?
+            """,
+            (record_id,),
+        ).fetchone()
     return jsonify(dict(row)), 201
 
 
 @bp.get("/api/records")
 def list_records():
-    conn = db_conn()
-    rows = conn.execute(
-        """
-        SELECT id, label, extracted_text, mime_type, created_at
-        FROM captures
-        ORDER BY created_at DESC, id DESC
-        LIMIT 20
-        """
-    ).fetchall()
-    conn.close()
+    with db_conn() as conn:
+        rows = conn.execute(
+            """
+            SELECT id, label, extracted_text, mime_type, created_at
+            FROM captures
+            ORDER BY created_at DESC, id DESC
+            LIMIT 20
+            """
+        ).fetchall()
     return jsonify([dict(row) for row in rows])
@@ -1,7 +1,12 @@
 import os
+import sys
+from pathlib import Path
 
 from flask import Flask
 
+# Make the repository root importable so lab_app can use the shared db module.
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
 from lab_app import bp as cooking_chart_bp
 
 app = Flask(__name__)
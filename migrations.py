@@ -0,0 +1,799 @@
+import hashlib
+import json
+import sqlite3
+from datetime import datetime
+
+from settings import DIARY_PERIOD_BASE_DATE, DIARY_PERIOD_MONTH_SPAN
+
+# Arbitrary key for pg_advisory_xact_lock so concurrent workers don't race.
+POSTGRES_MIGRATION_LOCK_KEY = 7_314_202_501
+
+
+def _diary_period_base_date():
+    return datetime.strptime(DIARY_PERIOD_BASE_DATE, "%Y-%m-%d").date()
+
+
+def _sqlite_column_names(conn, table_name: str):
+    columns = conn.execute(f"PRAGMA table_info({table_name})").fetchall()
+    return {col[1] for col in columns}
+
+
+def _sqlite_add_missing_columns(conn, table_name: str, columns) -> None:
+    existing = _sqlite_column_names(conn, table_name)
+    for column_name, column_def in columns:
+        if column_name not in existing:
+            conn.execute(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_def}")
+
+
+def _m001_diary_entries(conn, kind: str) -> None:
+    base_date = _diary_period_base_date()
+    if kind == "postgres":
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS diary_entries (
+                  id BIGSERIAL PRIMARY KEY,
+                  period_id INTEGER,
+                  entry_date DATE NOT NULL,
+                  body TEXT NOT NULL,
+                  created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                  updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                )
+                """
+            )
+            cur.execute(
+                """
+                ALTER TABLE diary_entries
+                ADD COLUMN IF NOT EXISTS period_id INTEGER
+                """
+            )
+            cur.execute(
+                """
+                UPDATE diary_entries
+                SET period_id = (
+                  (((EXTRACT(YEAR FROM entry_date)::INT - %s) * 12)
+                  + (EXTRACT(MONTH FROM entry_date)::INT - %s)) / %s
+                ) + 1
+                WHERE period_id IS NULL
+                AND entry_date >= %s
+                """,
+                (base_date.year, base_date.month, DIARY_PERIOD_MONTH_SPAN, base_date),
+            )
+            cur.execute(
+                """
+                CREATE INDEX IF NOT EXISTS diary_entries_period_id_idx
+                ON diary_entries (period_id DESC, entry_date DESC, id DESC)
+                """
+            )
+            cur.execute(
+                """
+                CREATE INDEX IF NOT EXISTS diary_entries_entry_date_idx
+                ON diary_entries (entry_date DESC, id DESC)
+                """
+            )
+        return
+
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS diary_entries (
+          id INTEGER PRIMARY KEY AUTOINCREMENT,
+          period_id INTEGER,
+          entry_date TEXT NOT NULL,
+          body TEXT NOT NULL,
+          created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+          updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    _sqlite_add_missing_columns(conn, "diary_entries", [("period_id", "INTEGER")])
+    conn.execute(
+        """
+        UPDATE diary_entries
+        SET period_id = (((CAST(strftime('%Y', entry_date) AS INTEGER) - ?) * 12)
+          + (CAST(strftime('%m', entry_date) AS INTEGER) - ?)) / ? + 1
+        WHERE period_id IS NULL
+        AND entry_date >= ?
+        """,
+        (base_date.year, base_date.month, DIARY_PERIOD_MONTH_SPAN, base_date.isoformat()),
+    )
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS diary_entries_period_id_idx
+        ON diary_entries (period_id DESC, entry_date DESC, id DESC)
+        """
+    )
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS diary_entries_entry_date_idx
+        ON diary_entries (entry_date DESC, id DESC)
+        """
+    )
+
+
+def _m002_timeline_link_previews(conn, kind: str) -> None:
+    if kind == "postgres":
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS mytimeline_link_previews (
+                  url TEXT PRIMARY KEY,
+                  title TEXT NOT NULL,
+                  description TEXT NOT NULL DEFAULT '',
+                  image_url TEXT NOT NULL DEFAULT '',
+                  site_name TEXT NOT NULL DEFAULT '',
+                  fetched_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                )
+                """
+            )
+        return
+
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS mytimeline_link_previews (
+          url TEXT PRIMARY KEY,
+          title TEXT NOT NULL,
+          description TEXT NOT NULL DEFAULT '',
+          image_url TEXT NOT NULL DEFAULT '',
+          site_name TEXT NOT NULL DEFAULT '',
+          fetched_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+
+
+def _m003_timeline_posts(conn, kind: str) -> None:
+    if kind == "postgres":
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS mytimeline_posts (
+                  id BIGSERIAL PRIMARY KEY,
+                  content TEXT NOT NULL,
+                  tags TEXT NOT NULL DEFAULT '[]',
+                  image_drive_file_id TEXT NOT NULL DEFAULT '',
+                  image_mime_type TEXT NOT NULL DEFAULT '',
+                  image_width INTEGER,
+                  image_height INTEGER,
+                  created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                )
+                """
+            )
+            cur.execute(
+                """
+                ALTER TABLE mytimeline_posts
+                ADD COLUMN IF NOT EXISTS tags TEXT NOT NULL DEFAULT '[]',
+                ADD COLUMN IF NOT EXISTS image_drive_file_id TEXT NOT NULL DEFAULT '',
+                ADD COLUMN IF NOT EXISTS image_mime_type TEXT NOT NULL DEFAULT '',
+                ADD COLUMN IF NOT EXISTS image_width INTEGER,
+                ADD COLUMN IF NOT EXISTS image_height INTEGER
+                """
+            )
+        return
+
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS mytimeline_posts (
+          id INTEGER PRIMARY KEY AUTOINCREMENT,
+          content TEXT NOT NULL,
+          tags TEXT NOT NULL DEFAULT '[]',
+          image_drive_file_id TEXT NOT NULL DEFAULT '',
+          image_mime_type TEXT NOT NULL DEFAULT '',
+          image_width INTEGER,
+          image_height INTEGER,
+          created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    _sqlite_add_missing_columns(
+        conn,
+        "mytimeline_posts",
+        [
+            ("tags", "TEXT NOT NULL DEFAULT '[]'"),
+            ("image_drive_file_id", "TEXT NOT NULL DEFAULT ''"),
+            ("image_mime_type", "TEXT NOT NULL DEFAULT ''"),
+            ("image_width", "INTEGER"),
+            ("image_height", "INTEGER"),
+        ],
+    )
+
+
+def _m004_super_tetris_scores(conn, kind: str) -> None:
+    if kind == "postgres":
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS super_tetris_scores (
+                  id BIGSERIAL PRIMARY KEY,
+                  name VARCHAR(16) NOT NULL,
+                  score INTEGER NOT NULL CHECK (score >= 0),
+                  created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                )
+                """
+            )
+        return
+
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS super_tetris_scores (
+          id INTEGER PRIMARY KEY AUTOINCREMENT,
+          name TEXT NOT NULL,
+          score INTEGER NOT NULL CHECK (score >= 0),
+          created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+
+
+def _m005_diary_periods(conn, kind: str) -> None:
+    if kind == "postgres":
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS diary_periods (
+                  period_id INTEGER PRIMARY KEY,
+                  entry_count INTEGER NOT NULL DEFAULT 0,
+                  first_entry_date DATE,
+                  last_entry_date DATE,
+                  last_updated_at TIMESTAMPTZ
+                )
+                """
+            )
+            cur.execute("DELETE FROM diary_periods")
+            cur.execute(
+                """
+                INSERT INTO diary_periods (period_id, entry_count, first_entry_date, last_entry_date, last_updated_at)
+                SELECT period_id, COUNT(*), MIN(entry_date), MAX(entry_date), MAX(updated_at)
+                FROM diary_entries
+                WHERE period_id IS NOT NULL
+                GROUP BY period_id
+                """
+            )
+        return
+
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS diary_periods (
+          period_id INTEGER PRIMARY KEY,
+          entry_count INTEGER NOT NULL DEFAULT 0,
+          first_entry_date TEXT,
+          last_entry_date TEXT,
+          last_updated_at TEXT
+        )
+        """
+    )
+    conn.execute("DELETE FROM diary_periods")
+    conn.execute(
+        """
+        INSERT INTO diary_periods (period_id, entry_count, first_entry_date, last_entry_date, last_updated_at)
+        SELECT period_id, COUNT(*), MIN(entry_date), MAX(entry_date), MAX(updated_at)
+        FROM diary_entries
+        WHERE period_id IS NOT NULL
+        GROUP BY period_id
+        """
+    )
+
+
+def _m006_diary_body_html(conn, kind: str) -> None:
+    # Rows start at render version 0; app.py re-renders them after migrating.
+    if kind == "postgres":
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                ALTER TABLE diary_entries
+                ADD COLUMN IF NOT EXISTS body_html TEXT NOT NULL DEFAULT '',
+                ADD COLUMN IF NOT EXISTS body_html_version INTEGER NOT NULL DEFAULT 0
+                """
+            )
+        return
+
+    _sqlite_add_missing_columns(
+        conn,
+        "diary_entries",
+        [
+            ("body_html", "TEXT NOT NULL DEFAULT ''"),
+            ("body_html_version", "INTEGER NOT NULL DEFAULT 0"),
+        ],
+    )
+
+
+def sqlite_supports_trigram() -> bool:
+    return sqlite3.sqlite_version_info >= (3, 34, 0)
+
+
+def _m007_diary_search_index(conn, kind: str) -> None:
+    if kind == "postgres":
+        with conn.cursor() as cur:
+            cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            cur.execute(
+                """
+                CREATE INDEX IF NOT EXISTS diary_entries_body_trgm_idx
+                ON diary_entries USING gin (body gin_trgm_ops)
+                """
+            )
+        return
+
+    # The trigram tokenizer needs SQLite 3.34+; without it search falls back to LIKE.
+    if not sqlite_supports_trigram():
+        return
+    conn.execute(
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS diary_entries_fts USING fts5(
+          body,
+          content='diary_entries',
+          content_rowid='id',
+          tokenize='trigram'
+        )
+        """
+    )
+    # Triggers keep the index in sync for every writer, including the import script.
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS diary_entries_fts_ai AFTER INSERT ON diary_entries BEGIN
+          INSERT INTO diary_entries_fts (rowid, body) VALUES (new.id, new.body);
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS diary_entries_fts_ad AFTER DELETE ON diary_entries BEGIN
+          INSERT INTO diary_entries_fts (diary_entries_fts, rowid, body) VALUES ('delete', old.id, old.body);
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS diary_entries_fts_au AFTER UPDATE OF body ON diary_entries BEGIN
+          INSERT INTO diary_entries_fts (diary_entries_fts, rowid, body) VALUES ('delete', old.id, old.body);
+          INSERT INTO diary_entries_fts (rowid, body) VALUES (new.id, new.body);
+        END
+        """
+    )
+    conn.execute("INSERT INTO diary_entries_fts (diary_entries_fts) VALUES ('rebuild')")
+
+
+def _m008_diary_entry_date_unique(conn, kind: str) -> None:
+    # Keep the newest row for each date; the old write path deleted then re-inserted.
+    if kind == "postgres":
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                DELETE FROM diary_entries AS older
+                USING diary_entries AS newer
+                WHERE older.entry_date = newer.entry_date
+                AND older.id < newer.id
+                """
+            )
+            cur.execute(
+                """
+                CREATE UNIQUE INDEX IF NOT EXISTS diary_entries_entry_date_key
+                ON diary_entries (entry_date)
+                """
+            )
+            cur.execute("DELETE FROM diary_periods")
+            cur.execute(
+                """
+                INSERT INTO diary_periods (period_id, entry_count, first_entry_date, last_entry_date, last_updated_at)
+                SELECT period_id, COUNT(*), MIN(entry_date), MAX(entry_date), MAX(updated_at)
+                FROM diary_entries
+                WHERE period_id IS NOT NULL
+                GROUP BY period_id
+                """
+            )
+        return
+
+    conn.execute(
+        """
+        DELETE FROM diary_entries
+        WHERE id NOT IN (SELECT MAX(id) FROM diary_entries GROUP BY entry_date)
+        """
+    )
+    conn.execute(
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS diary_entries_entry_date_key
+        ON diary_entries (entry_date)
+        """
+    )
+    conn.execute("DELETE FROM diary_periods")
+    conn.execute(
+        """
+        INSERT INTO diary_periods (period_id, entry_count, first_entry_date, last_entry_date, last_updated_at)
+        SELECT period_id, COUNT(*), MIN(entry_date), MAX(entry_date), MAX(updated_at)
+        FROM diary_entries
+        WHERE period_id IS NOT NULL
+        GROUP BY period_id
+        """
+    )
+
+
+def _timeline_tags_from_json(tags_raw):
+    try:
+        tags = json.loads(tags_raw or "[]")
+    except (ValueError, TypeError):
+        return []
+    normalized = []
+    for tag in tags if isinstance(tags, list) else []:
+        tag = str(tag).strip().lstrip("#").lower()
+        if tag and tag not in normalized:
+            normalized.append(tag)
+    return normalized
+
+
+def _m009_timeline_post_tags(conn, kind: str) -> None:
+    if kind == "postgres":
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS mytimeline_post_tags (
+                  post_id BIGINT NOT NULL REFERENCES mytimeline_posts (id) ON DELETE CASCADE,
+                  tag TEXT NOT NULL,
+                  PRIMARY KEY (tag, post_id)
+                )
+                """
+            )
+            cur.execute(
+                """
+                CREATE INDEX IF NOT EXISTS mytimeline_post_tags_post_id_idx
+                ON mytimeline_post_tags (post_id)
+                """
+            )
+            cur.execute("SELECT id, tags FROM mytimeline_posts")
+            rows = cur.fetchall()
+            pairs = [(post_id, tag) for post_id, tags_raw in rows for tag in _timeline_tags_from_json(tags_raw)]
+            if pairs:
+                cur.executemany(
+                    """
+                    INSERT INTO mytimeline_post_tags (post_id, tag)
+                    VALUES (%s, %s)
+                    ON CONFLICT DO NOTHING
+                    """,
+                    pairs,
+                )
+        return
+
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS mytimeline_post_tags (
+          post_id INTEGER NOT NULL REFERENCES mytimeline_posts (id) ON DELETE CASCADE,
+          tag TEXT NOT NULL,
+          PRIMARY KEY (tag, post_id)
+        ) WITHOUT ROWID
+        """
+    )
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS mytimeline_post_tags_post_id_idx
+        ON mytimeline_post_tags (post_id)
+        """
+    )
+    rows = conn.execute("SELECT id, tags FROM mytimeline_posts").fetchall()
+    pairs = [(row[0], tag) for row in rows for tag in _timeline_tags_from_json(row[1])]
+    conn.executemany("INSERT OR IGNORE INTO mytimeline_post_tags (post_id, tag) VALUES (?, ?)", pairs)
+
+
+def _m010_timeline_search_index(conn, kind: str) -> None:
+    if kind == "postgres":
+        with conn.cursor() as cur:
+            cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            cur.execute(
+                """
+                CREATE INDEX IF NOT EXISTS mytimeline_posts_content_trgm_idx
+                ON mytimeline_posts USING gin (content gin_trgm_ops)
+                """
+            )
+        return
+
+    if not sqlite_supports_trigram():
+        return
+    conn.execute(
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS mytimeline_posts_fts USING fts5(
+          content,
+          content='mytimeline_posts',
+          content_rowid='id',
+          tokenize='trigram'
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS mytimeline_posts_fts_ai AFTER INSERT ON mytimeline_posts BEGIN
+          INSERT INTO mytimeline_posts_fts (rowid, content) VALUES (new.id, new.content);
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS mytimeline_posts_fts_ad AFTER DELETE ON mytimeline_posts BEGIN
+          INSERT INTO mytimeline_posts_fts (mytimeline_posts_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS mytimeline_posts_fts_au AFTER UPDATE OF content ON mytimeline_posts BEGIN
+          INSERT INTO mytimeline_posts_fts (mytimeline_posts_fts, rowid, content) VALUES ('delete', old.id, old.content);
+          INSERT INTO mytimeline_posts_fts (rowid, content) VALUES (new.id, new.content);
+        END
+        """
+    )
+    conn.execute("INSERT INTO mytimeline_posts_fts (mytimeline_posts_fts) VALUES ('rebuild')")
+
+
+def _m011_timeline_posts_created_at_index(conn, kind: str) -> None:
+    if kind == "postgres":
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                CREATE INDEX IF NOT EXISTS mytimeline_posts_created_at_id_idx
+                ON mytimeline_posts (created_at DESC, id DESC)
+                """
+            )
+        return
+
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS mytimeline_posts_created_at_id_idx
+        ON mytimeline_posts (created_at DESC, id DESC)
+        """
+    )
+
+
+def _m012_timeline_link_preview_failures(conn, kind: str) -> None:
+    if kind == "postgres":
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS mytimeline_link_preview_failures (
+                  url TEXT PRIMARY KEY,
+                  failure_count INTEGER NOT NULL DEFAULT 1,
+                  last_error TEXT NOT NULL DEFAULT '',
+                  last_failed_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                  retry_after TIMESTAMPTZ NOT NULL
+                )
+                """
+            )
+        return
+
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS mytimeline_link_preview_failures (
+          url TEXT PRIMARY KEY,
+          failure_count INTEGER NOT NULL DEFAULT 1,
+          last_error TEXT NOT NULL DEFAULT '',
+          last_failed_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+          retry_after TEXT NOT NULL
+        )
+        """
+    )
+
+
+def _m013_timeline_link_preview_access(conn, kind: str) -> None:
+    if kind == "postgres":
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                ALTER TABLE mytimeline_link_previews
+                ADD COLUMN IF NOT EXISTS last_accessed_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                """
+            )
+            cur.execute(
+                """
+                CREATE INDEX IF NOT EXISTS mytimeline_link_previews_last_accessed_idx
+                ON mytimeline_link_previews (last_accessed_at)
+                """
+            )
+        return
+
+    # SQLite cannot add a column with a CURRENT_TIMESTAMP default, so seed it from fetched_at.
+    _sqlite_add_missing_columns(conn, "mytimeline_link_previews", [("last_accessed_at", "TEXT")])
+    conn.execute("UPDATE mytimeline_link_previews SET last_accessed_at = fetched_at WHERE last_accessed_at IS NULL")
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS mytimeline_link_previews_last_accessed_idx
+        ON mytimeline_link_previews (last_accessed_at)
+        """
+    )
+
+
+def _m014_timeline_link_preview_validators(conn, kind: str) -> None:
+    if kind == "postgres":
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                ALTER TABLE mytimeline_link_previews
+                ADD COLUMN IF NOT EXISTS etag TEXT NOT NULL DEFAULT '',
+                ADD COLUMN IF NOT EXISTS last_modified TEXT NOT NULL DEFAULT ''
+                """
+            )
+        return
+
+    _sqlite_add_missing_columns(
+        conn,
+        "mytimeline_link_previews",
+        [
+            ("etag", "TEXT NOT NULL DEFAULT ''"),
+            ("last_modified", "TEXT NOT NULL DEFAULT ''"),
+        ],
+    )
+
+
+def preview_image_key(image_url: str) -> str:
+    if not image_url:
+        return ""
+    return hashlib.sha256(image_url.encode("utf-8")).hexdigest()[:32]
+
+
+def _m015_timeline_link_preview_image_key(conn, kind: str) -> None:
+    if kind == "postgres":
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                ALTER TABLE mytimeline_link_previews
+                ADD COLUMN IF NOT EXISTS image_key TEXT NOT NULL DEFAULT ''
+                """
+            )
+            cur.execute("SELECT url, image_url FROM mytimeline_link_previews WHERE image_url <> ''")
+            rows = [(preview_image_key(image_url), url) for url, image_url in cur.fetchall()]
+            if rows:
+                cur.executemany("UPDATE mytimeline_link_previews SET image_key = %s WHERE url = %s", rows)
+            cur.execute(
+                """
+                CREATE INDEX IF NOT EXISTS mytimeline_link_previews_image_key_idx
+                ON mytimeline_link_previews (image_key)
+                """
+            )
+        return
+
+    _sqlite_add_missing_columns(conn, "mytimeline_link_previews", [("image_key", "TEXT NOT NULL DEFAULT ''")])
+    rows = conn.execute("SELECT url, image_url FROM mytimeline_link_previews WHERE image_url <> ''").fetchall()
+    conn.executemany(
+        "UPDATE mytimeline_link_previews SET image_key = ? WHERE url = ?",
+        [(preview_image_key(image_url), url) for url, image_url in rows],
+    )
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS mytimeline_link_previews_image_key_idx
+        ON mytimeline_link_previews (image_key)
+        """
+    )
+
+
+def _m016_timeline_post_image_variants(conn, kind: str) -> None:
+    if kind == "postgres":
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                ALTER TABLE mytimeline_posts
+                ADD COLUMN IF NOT EXISTS image_variants TEXT NOT NULL DEFAULT '[]'
+                """
+            )
+        return
+
+    _sqlite_add_missing_columns(conn, "mytimeline_posts", [("image_variants", "TEXT NOT NULL DEFAULT '[]'")])
+
+
+def _m017_timeline_post_image_status(conn, kind: str) -> None:
+    if kind == "postgres":
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                ALTER TABLE mytimeline_posts
+                ADD COLUMN IF NOT EXISTS image_status TEXT NOT NULL DEFAULT '',
+                ADD COLUMN IF NOT EXISTS image_upload TEXT NOT NULL DEFAULT ''
+                """
+            )
+        return
+
+    _sqlite_add_missing_columns(
+        conn,
+        "mytimeline_posts",
+        [
+            ("image_status", "TEXT NOT NULL DEFAULT ''"),
+            ("image_upload", "TEXT NOT NULL DEFAULT ''"),
+        ],
+    )
+
+
+# (version, name, function). Migrations must not commit; apply_migrations commits
+# once after every pending step succeeds. Append only; never renumber.
+MIGRATIONS = (
+    (1, "diary_entries", _m001_diary_entries),
+    (2, "mytimeline_link_previews", _m002_timeline_link_previews),
+    (3, "mytimeline_posts", _m003_timeline_posts),
+    (4, "super_tetris_scores", _m004_super_tetris_scores),
+    (5, "diary_periods", _m005_diary_periods),
+    (6, "diary_entries.body_html", _m006_diary_body_html),
+    (7, "diary search index", _m007_diary_search_index),
+    (8, "diary_entries.entry_date unique", _m008_diary_entry_date_unique),
+    (9, "mytimeline_post_tags", _m009_timeline_post_tags),
+    (10, "mytimeline_posts search index", _m010_timeline_search_index),
+    (11, "mytimeline_posts (created_at, id) index", _m011_timeline_posts_created_at_index),
+    (12, "mytimeline_link_preview_failures", _m012_timeline_link_preview_failures),
+    (13, "mytimeline_link_previews.last_accessed_at", _m013_timeline_link_preview_access),
+    (14, "mytimeline_link_previews validators", _m014_timeline_link_preview_validators),
+    (15, "mytimeline_link_previews.image_key", _m015_timeline_link_preview_image_key),
+    (16, "mytimeline_posts.image_variants", _m016_timeline_post_image_variants),
+    (17, "mytimeline_posts image processing status", _m017_timeline_post_image_status),
+)
+
+
+def _ensure_schema_version_table(conn, kind: str) -> None:
+    if kind == "postgres":
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS schema_version (
+                  version INTEGER PRIMARY KEY,
+                  name TEXT NOT NULL,
+                  applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                )
+                """
+            )
+        conn.commit()
+        return
+
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_version (
+          version INTEGER PRIMARY KEY,
+          name TEXT NOT NULL,
+          applied_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    conn.commit()
+
+
+def applied_versions(conn, kind: str):
+    _ensure_schema_version_table(conn, kind)
+    if kind == "postgres":
+        with conn.cursor() as cur:
+            cur.execute("SELECT version FROM schema_version")
+            rows = cur.fetchall()
+    else:
+        rows = conn.execute("SELECT version FROM schema_version").fetchall()
+    return {int(row[0]) for row in rows}
+
+
+def pending_migrations(conn, kind: str):
+    done = applied_versions(conn, kind)
+    return [(version, name) for version, name, _ in MIGRATIONS if version not in done]
+
+
+def apply_migrations(conn, kind: str):
+    _ensure_schema_version_table(conn, kind)
+
+    if kind == "postgres":
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_xact_lock(%s)", (POSTGRES_MIGRATION_LOCK_KEY,))
+            cur.execute("SELECT version FROM schema_version")
+            done = {int(row[0]) for row in cur.fetchall()}
+    else:
+        if conn.in_transaction:
+            conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+        done = {int(row[0]) for row in conn.execute("SELECT version FROM schema_version").fetchall()}
+
+    applied = []
+    try:
+        for version, name, migrate in MIGRATIONS:
+            if version in done:
+                continue
+            migrate(conn, kind)
+            if kind == "postgres":
+                with conn.cursor() as cur:
+                    cur.execute(
+                        "INSERT INTO schema_version (version, name) VALUES (%s, %s)",
+                        (version, name),
+                    )
+            else:
+                conn.execute(
+                    "INSERT INTO schema_version (version, name) VALUES (?, ?)",
+                    (version, name),
+                )
+            applied.append(version)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return applied
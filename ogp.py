@@ -0,0 +1,167 @@
+import codecs
+import html
+import re
+from urllib.parse import urljoin, urlsplit
+
+MAX_HEAD_BYTES = 250_000
+CHUNK_SIZE = 16_384
+# Everything og:* that a preview card shows; once all are seen the rest of <head> is irrelevant.
+COMPLETE_PROPERTIES = ("og:title", "og:description", "og:image", "og:site_name")
+# HTML requires <meta charset> within the first 1024 bytes.
+CHARSET_SNIFF_BYTES = 1024
+
+_META_CHARSET_RE = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([A-Za-z0-9_.:-]+)""", re.IGNORECASE)
+# Only the tags that matter are matched; everything else in <head> is skipped inside the regex engine.
+_HEAD_TOKEN_RE = re.compile(r"<(?:(meta|title|script|style|body)\b|(/head)\s*>|(!--))", re.IGNORECASE)
+_ATTR_RE = re.compile(r"""([^\s=/>]+)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))""")
+_CLOSE_TAG_RES = {
+    name: re.compile(rf"</{name}\s*>", re.IGNORECASE) for name in ("title", "script", "style")
+}
+
+
+class OgpHeadScanner:
+    def __init__(self):
+        self.by_property = {}
+        self.by_name = {}
+        self.title = ""
+        self.done = False
+        self._buffer = ""
+
+    def feed(self, text: str) -> None:
+        buffer = self._buffer + text
+        pos = 0
+        while not self.done:
+            match = _HEAD_TOKEN_RE.search(buffer, pos)
+            if match is None:
+                # Keep a trailing "<..." that may be the start of a tag split across chunks.
+                tail = buffer.rfind("<", max(pos, len(buffer) - 16))
+                pos = tail if tail >= 0 else len(buffer)
+                break
+            tag, head_end, comment = match.groups()
+            if head_end:
+                self.done = True
+                break
+            if comment:
+                end = buffer.find("-->", match.end())
+                if end < 0:
+                    pos = match.start()
+                    break
+                pos = end + 3
+                continue
+            tag_end = buffer.find(">", match.end())
+            if tag_end < 0:
+                pos = match.start()
+                break
+            tag = tag.lower()
+            if tag == "body":
+                self.done = True
+                break
+            if tag == "meta":
+                self._handle_meta(buffer[match.end():tag_end])
+                pos = tag_end + 1
+                continue
+            close = _CLOSE_TAG_RES[tag].search(buffer, tag_end + 1)
+            if close is None:
+                pos = match.start()
+                break
+            if tag == "title" and not self.title:
+                self.title = html.unescape(buffer[tag_end + 1:close.start()]).strip()
+            pos = close.end()
+        self._buffer = "" if self.done else buffer[pos:]
+
+    def close(self) -> None:
+        # An unterminated <title> at the end of the input still counts.
+        buffer, self._buffer = self._buffer, ""
+        match = re.match(r"<title\b[^>]*>(.*)", buffer, flags=re.IGNORECASE | re.DOTALL)
+        if match and not self.title:
+            self.title = html.unescape(match.group(1)).strip()
+
+    def _handle_meta(self, attr_text: str) -> None:
+        values = {}
+        for name, double_quoted, single_quoted, bare in _ATTR_RE.findall(attr_text):
+            values[name.lower()] = html.unescape(double_quoted or single_quoted or bare).strip()
+        content = values.get("content", "")
+        if not content:
+            return
+        prop = values.get("property", "").lower()
+        name = values.get("name", "").lower()
+        if prop:
+            self.by_property[prop] = content
+        if name:
+            self.by_name[name] = content
+        if all(key in self.by_property for key in COMPLETE_PROPERTIES):
+            self.done = True
+
+    def preview(self, page_url: str):
+        title = self.by_property.get("og:title") or self.by_name.get("twitter:title") or self.title
+        if not title:
+            return None
+        description = (
+            self.by_property.get("og:description")
+            or self.by_name.get("twitter:description")
+            or self.by_name.get("description")
+            or ""
+        )
+        image_url = self.by_property.get("og:image") or self.by_name.get("twitter:image") or ""
+        if image_url:
+            image_url = urljoin(page_url, image_url)
+        return {
+            "url": page_url,
+            "title": title,
+            "description": description,
+            "image_url": image_url,
+            "site_name": self.by_property.get("og:site_name") or urlsplit(page_url).hostname or "",
+        }
+
+
+def sniff_charset(head: bytes) -> str:
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    match = _META_CHARSET_RE.search(head[:2048])
+    return match.group(1).decode("ascii") if match else ""
+
+
+def _incremental_decoder(charset: str):
+    try:
+        return codecs.getincrementaldecoder(charset)(errors="replace")
+    except LookupError:
+        return codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+
+# Returns (preview, bytes_read); stops pulling chunks as soon as the head is closed or complete.
+def parse_ogp_stream(page_url: str, chunks, charset: str = "", max_bytes: int = MAX_HEAD_BYTES):
+    parser = OgpHeadScanner()
+    decoder = None
+    pending = b""
+    bytes_read = 0
+    for chunk in chunks:
+        if not chunk:
+            break
+        chunk = chunk[:max_bytes - bytes_read]
+        bytes_read += len(chunk)
+        if decoder is None:
+            # Hold bytes back until the charset sniff has its full window; chunks may be tiny.
+            pending += chunk
+            if not charset and len(pending) < CHARSET_SNIFF_BYTES and b"</head" not in pending.lower() and bytes_read < max_bytes:
+                continue
+            decoder = _incremental_decoder(charset or sniff_charset(pending) or "utf-8")
+            chunk, pending = pending, b""
+        parser.feed(decoder.decode(chunk))
+        if parser.done or bytes_read >= max_bytes:
+            break
+    if decoder is None and pending:
+        decoder = _incremental_decoder(charset or sniff_charset(pending) or "utf-8")
+        parser.feed(decoder.decode(pending))
+    if not parser.done:
+        if decoder is not None:
+            parser.feed(decoder.decode(b"", final=True))
+        parser.close()
+    return parser.preview(page_url), bytes_read
+
+
+def iter_response_chunks(response, chunk_size: int = CHUNK_SIZE):
+    while True:
+        chunk = response.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
@@ -0,0 +1,145 @@
+import argparse
+import io
+import json
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+FORMATS = {".jpg": "JPEG", ".png": "PNG", ".webp": "WEBP", ".heic": "HEIF"}
+
+
+# The decode path app.py used before spooling and draft decoding: read the whole upload,
+# verify and decode it from two BytesIO copies, decode HEIC at full size, then downscale.
+def legacy_normalize(timeline_images, path: Path):
+    from PIL import Image, ImageOps
+
+    raw_bytes = path.read_bytes()
+    if timeline_images.is_heif_upload(path.name, ""):
+        from pillow_heif import open_heif
+
+        image = open_heif(io.BytesIO(raw_bytes)).to_pillow()
+    else:
+        with Image.open(io.BytesIO(raw_bytes)) as verified:
+            verified.verify()
+        image = Image.open(io.BytesIO(raw_bytes))
+    with image:
+        working = ImageOps.exif_transpose(image)
+        working = working.convert("RGBA" if "A" in working.getbands() else "RGB")
+        working.thumbnail((timeline_images.MAX_DIMENSION, timeline_images.MAX_DIMENSION), Image.Resampling.LANCZOS)
+        output = io.BytesIO()
+        working.convert("RGB").save(output, format="JPEG", quality=timeline_images.JPEG_QUALITY, optimize=True, progressive=True)
+    return working.size
+
+
+def current_normalize(timeline_images, path: Path):
+    result = timeline_images.normalize_upload({"path": str(path), "filename": path.name, "mimetype": ""})
+    return result["width"], result["height"]
+
+
+def peak_rss_kb():
+    # VmHWM starts over at exec; ru_maxrss can carry the parent's peak into the child.
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_once(mode: str, path: Path, variants: bool):
+    # Runs in a fresh interpreter so the high-water mark only reflects this one decode.
+    # timeline_images is what the image worker processes import; app.py would run migrations.
+    import timeline_images
+
+    if not variants:
+        timeline_images.variant_formats = lambda: []
+    normalize = legacy_normalize if mode == "legacy" else current_normalize
+    baseline_kb = peak_rss_kb()
+    started = time.perf_counter()
+    size = normalize(timeline_images, path)
+    seconds = time.perf_counter() - started
+    peak_kb = peak_rss_kb() - baseline_kb
+    print(json.dumps({"seconds": seconds, "peak_kb": peak_kb, "size": list(size)}))
+
+
+def measure(mode: str, path: Path, repeat: int, variants: bool):
+    timings = []
+    peaks = []
+    size = None
+    for _ in range(repeat):
+        command = [sys.executable, __file__, "--run", mode, str(path)]
+        if variants:
+            command.append("--variants")
+        out = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        timings.append(result["seconds"])
+        peaks.append(result["peak_kb"])
+        size = tuple(result["size"])
+    return statistics.median(timings), max(peaks), size
+
+
+def generate_samples(corpus_dir: Path, width: int, height: int):
+    from PIL import Image
+
+    corpus_dir.mkdir(parents=True, exist_ok=True)
+    size = (width, height)
+    image = Image.merge("RGB", [
+        Image.linear_gradient("L").resize(size),
+        Image.radial_gradient("L").resize(size),
+        Image.effect_noise(size, 48),
+    ])
+    image.save(corpus_dir / "sample.jpg", format="JPEG", quality=90)
+    image.save(corpus_dir / "sample.png", format="PNG")
+    image.save(corpus_dir / "sample.webp", format="WEBP", quality=90)
+    try:
+        from pillow_heif import register_heif_opener
+    except ImportError:
+        print("pillow-heif is not installed; skipping sample.heic")
+    else:
+        register_heif_opener()
+        # Tiled with an embedded preview, the way phone cameras write large HEIC files.
+        image.save(corpus_dir / "sample.heic", format="HEIF", quality=90, tile_size=512, thumbnails=[2048])
+    for path in sorted(corpus_dir.glob("sample.*")):
+        print(f"generated {path} ({path.stat().st_size} bytes)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare peak memory and time of the legacy and current upload decode paths.")
+    parser.add_argument("corpus", help="Directory of images (*.jpg, *.png, *.webp, *.heic).")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per image; the median time and the highest peak are reported.")
+    parser.add_argument("--generate", nargs=2, type=int, metavar=("WIDTH", "HEIGHT"), help="Write synthetic samples of this size into the corpus first.")
+    parser.add_argument("--variants", action="store_true", help="Also render the AVIF / WebP variants on the current path.")
+    parser.add_argument("--run", choices=("legacy", "current"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_once(args.run, Path(args.corpus), args.variants)
+        return
+
+    corpus_dir = Path(args.corpus)
+    if args.generate:
+        generate_samples(corpus_dir, *args.generate)
+    images = sorted(path for path in corpus_dir.glob("*") if path.suffix.lower() in FORMATS) if corpus_dir.is_dir() else []
+    if not images:
+        raise SystemExit(f"No images found in {corpus_dir}")
+
+    print(f"{'image':<28} {'format':<6} {'legacy MB':>10} {'current MB':>11} {'legacy ms':>10} {'current ms':>11}  output")
+    for path in images:
+        legacy_time, legacy_peak, legacy_size = measure("legacy", path, args.repeat, args.variants)
+        current_time, current_peak, current_size = measure("current", path, args.repeat, args.variants)
+        same = "same" if legacy_size == current_size else f"legacy {legacy_size[0]}x{legacy_size[1]}"
+        print(
+            f"{path.name[:28]:<28} {FORMATS[path.suffix.lower()]:<6} {legacy_peak / 1024:>10.1f} {current_peak / 1024:>11.1f} "
+            f"{legacy_time * 1000:>10.1f} {current_time * 1000:>11.1f}  {current_size[0]}x{current_size[1]} ({same})"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import argparse
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+from urllib.parse import urljoin, urlsplit
+from urllib.request import Request, urlopen
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import ogp  # noqa: E402
+
+LEGACY_MAX_BYTES = 250_000
+FETCH_USER_AGENT = "Mozilla/5.0 (compatible; diary-timeline-bot/1.0; +https://diary.aaaaaso.com)"
+
+
+# The parser app.py used before ogp.py: read 250 KB, decode it all, regex over the first 200 KB.
+def legacy_extract_attr(tag: str, attr_name: str):
+    pattern = rf'{attr_name}\s*=\s*["\']([^"\']+)["\']'
+    match = re.search(pattern, tag, flags=re.IGNORECASE)
+    return match.group(1).strip() if match else ""
+
+
+def legacy_parse(page_url: str, raw: bytes):
+    raw = raw[:LEGACY_MAX_BYTES]
+    head = raw.decode("utf-8", errors="replace")[:200_000]
+    metas = re.findall(r"<meta\s+[^>]*>", head, flags=re.IGNORECASE)
+    by_property = {}
+    by_name = {}
+    for meta_tag in metas:
+        prop = legacy_extract_attr(meta_tag, "property").lower()
+        name = legacy_extract_attr(meta_tag, "name").lower()
+        content = legacy_extract_attr(meta_tag, "content")
+        if not content:
+            continue
+        if prop:
+            by_property[prop] = content
+        if name:
+            by_name[name] = content
+    title = by_property.get("og:title") or by_name.get("twitter:title")
+    if not title:
+        title_match = re.search(r"<title[^>]*>(.*?)</title>", head, flags=re.IGNORECASE | re.DOTALL)
+        title = title_match.group(1).strip() if title_match else ""
+    if not title:
+        return None, len(raw)
+    image_url = by_property.get("og:image") or by_name.get("twitter:image") or ""
+    return {
+        "url": page_url,
+        "title": title,
+        "description": by_property.get("og:description") or by_name.get("description") or "",
+        "image_url": urljoin(page_url, image_url) if image_url else "",
+        "site_name": by_property.get("og:site_name") or urlsplit(page_url).hostname or "",
+    }, len(raw)
+
+
+def streaming_parse(page_url: str, raw: bytes):
+    chunks = (raw[start:start + ogp.CHUNK_SIZE] for start in range(0, len(raw), ogp.CHUNK_SIZE))
+    return ogp.parse_ogp_stream(page_url, chunks)
+
+
+def time_parse(parse, page_url: str, raw: bytes, repeat: int):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = parse(page_url, raw)
+        timings.append(time.perf_counter() - started)
+    return result, statistics.median(timings)
+
+
+def save_pages(urls, corpus_dir: Path):
+    corpus_dir.mkdir(parents=True, exist_ok=True)
+    for url in urls:
+        req = Request(url, headers={"User-Agent": FETCH_USER_AGENT})
+        with urlopen(req, timeout=10) as res:
+            raw = res.read(LEGACY_MAX_BYTES)
+        name = re.sub(r"[^A-Za-z0-9._-]+", "_", url.split("://", 1)[-1]).strip("_")[:120] or "page"
+        path = corpus_dir / f"{name}.html"
+        path.write_bytes(raw)
+        print(f"saved {url} -> {path} ({len(raw)} bytes)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the legacy regex OGP parser with the streaming head parser.")
+    parser.add_argument("corpus", help="Directory of saved pages (*.html). The file name stands in for the page URL.")
+    parser.add_argument("--repeat", type=int, default=20, help="Parses per page; the median time is reported.")
+    parser.add_argument("--save", nargs="+", default=[], metavar="URL", help="Download these pages into the corpus first.")
+    args = parser.parse_args()
+
+    corpus_dir = Path(args.corpus)
+    if args.save:
+        save_pages(args.save, corpus_dir)
+    pages = sorted(corpus_dir.glob("*.html")) if corpus_dir.is_dir() else []
+    if not pages:
+        raise SystemExit(f"No *.html pages found in {corpus_dir}")
+
+    totals = {"legacy_bytes": 0, "stream_bytes": 0, "legacy_time": 0.0, "stream_time": 0.0}
+    mismatches = 0
+    print(f"{'page':<40} {'legacy B':>9} {'stream B':>9} {'legacy ms':>10} {'stream ms':>10}  same")
+    for path in pages:
+        raw = path.read_bytes()
+        page_url = f"https://{path.stem}/"
+        (legacy, legacy_bytes), legacy_time = time_parse(legacy_parse, page_url, raw, args.repeat)
+        (streamed, stream_bytes), stream_time = time_parse(streaming_parse, page_url, raw, args.repeat)
+        same = bool(legacy) == bool(streamed) and (not legacy or legacy["title"] == streamed["title"])
+        mismatches += not same
+        totals["legacy_bytes"] += legacy_bytes
+        totals["stream_bytes"] += stream_bytes
+        totals["legacy_time"] += legacy_time
+        totals["stream_time"] += stream_time
+        print(
+            f"{path.stem[:40]:<40} {legacy_bytes:>9} {stream_bytes:>9} "
+            f"{legacy_time * 1000:>10.3f} {stream_time * 1000:>10.3f}  {'yes' if same else 'NO'}"
+        )
+
+    print(
+        f"{'total':<40} {totals['legacy_bytes']:>9} {totals['stream_bytes']:>9} "
+        f"{totals['legacy_time'] * 1000:>10.3f} {totals['stream_time'] * 1000:>10.3f}"
+    )
+    if totals["legacy_bytes"]:
+        print(f"bytes read: {totals['stream_bytes'] / totals['legacy_bytes']:.1%} of legacy")
+    if totals["legacy_time"]:
+        print(f"parse time: {totals['stream_time'] / totals['legacy_time']:.1%} of legacy")
+    if mismatches:
+        print(f"{mismatches} page(s) produced a different title; the legacy parser leaves entities escaped and always decodes as UTF-8.")
+
+
+if __name__ == "__main__":
+    main()
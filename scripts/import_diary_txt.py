@@ -1,10 +1,17 @@
 import argparse
+import hashlib
 import os
 import re
 import sqlite3
+import sys
+import time
 from datetime import datetime
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import migrations  # noqa: E402
+
 DATE_HEADING_RE = re.compile(r"^##\s+(\d{4}-\d{2}-\d{2})\s*$")
 DIARY_PERIOD_BASE_DATE = datetime.strptime("2025-06-01", "%Y-%m-%d").date()
 DIARY_PERIOD_MONTH_SPAN = 3
@@ -51,98 +58,163 @@ def compute_diary_period_id(entry_date):
     return (months_since_base // DIARY_PERIOD_MONTH_SPAN) + 1
 
 
-def init_diary_table(conn):
-    conn.execute(
-        """
-        CREATE TABLE IF NOT EXISTS diary_entries (
-          id INTEGER PRIMARY KEY AUTOINCREMENT,
-          period_id INTEGER,
-          entry_date TEXT NOT NULL,
-          body TEXT NOT NULL,
-          created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
-          updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
-        )
-        """
+REBUILD_DIARY_PERIODS_SQL = """
+INSERT INTO diary_periods (period_id, entry_count, first_entry_date, last_entry_date, last_updated_at)
+SELECT period_id, COUNT(*), MIN(entry_date), MAX(entry_date), MAX(updated_at)
+FROM diary_entries
+WHERE period_id IS NOT NULL
+GROUP BY period_id
+"""
+
+
+def content_hash(body: str) -> str:
+    # md5 so PostgreSQL can hash existing rows server-side with md5(body).
+    return hashlib.md5(body.encode("utf-8")).hexdigest()
+
+
+def prepare_entries(entries):
+    prepared = {}
+    for entry in entries:
+        entry_date = datetime.strptime(entry["entry_date"], "%Y-%m-%d").date()
+        prepared[entry["entry_date"]] = {
+            "entry_date": entry["entry_date"],
+            "period_id": compute_diary_period_id(entry_date),
+            "body": entry["body"],
+            "hash": content_hash(entry["body"]),
+        }
+    return list(prepared.values())
+
+
+def plan_import(entries, existing_hashes):
+    plan = {"insert": [], "update": [], "unchanged": []}
+    for entry in entries:
+        current = existing_hashes.get(entry["entry_date"])
+        if current is None:
+            plan["insert"].append(entry)
+        elif current != entry["hash"]:
+            plan["update"].append(entry)
+        else:
+            plan["unchanged"].append(entry)
+    return plan
+
+
+class PhaseTimer:
+    def __init__(self):
+        self.phases = []
+
+    def run(self, name, func, *args):
+        started = time.perf_counter()
+        result = func(*args)
+        self.phases.append((name, time.perf_counter() - started))
+        return result
+
+    def report(self):
+        for name, elapsed in self.phases:
+            print(f"  {name:<10} {elapsed * 1000:8.1f} ms")
+
+
+def print_plan(plan, verbose: bool):
+    if verbose:
+        for action in ("insert", "update"):
+            for entry in plan[action]:
+                print(f"{action:<9} {entry['entry_date']}")
+    print(
+        f"insert: {len(plan['insert'])}, update: {len(plan['update'])}, unchanged: {len(plan['unchanged'])}"
     )
-    conn.execute(
-        """
-        CREATE INDEX IF NOT EXISTS diary_entries_period_id_idx
-        ON diary_entries (period_id DESC, entry_date DESC, id DESC)
+
+
+def load_hashes_sqlite(conn):
+    rows = conn.execute("SELECT entry_date, body FROM diary_entries").fetchall()
+    return {entry_date: content_hash(body) for entry_date, body in rows}
+
+
+def write_plan_sqlite(conn, plan):
+    # body_html_version = 0 marks the stored HTML stale; the app re-renders it.
+    conn.executemany(
         """
+        UPDATE diary_entries
+        SET period_id = ?, body = ?, body_html = '', body_html_version = 0, updated_at = CURRENT_TIMESTAMP
+        WHERE entry_date = ?
+        """,
+        [(entry["period_id"], entry["body"], entry["entry_date"]) for entry in plan["update"]],
     )
-    conn.execute(
-        """
-        CREATE INDEX IF NOT EXISTS diary_entries_entry_date_idx
-        ON diary_entries (entry_date DESC, id DESC)
+    conn.executemany(
         """
+        INSERT INTO diary_entries (period_id, entry_date, body)
+        VALUES (?, ?, ?)
+        """,
+        [(entry["period_id"], entry["entry_date"], entry["body"]) for entry in plan["insert"]],
     )
-    conn.commit()
+    conn.execute("DELETE FROM diary_periods")
+    conn.execute(REBUILD_DIARY_PERIODS_SQL)
+
 
+def import_entries_sqlite(entries, db_path: Path, dry_run: bool):
+    timer = PhaseTimer()
+    conn = sqlite3.connect(db_path)
+    try:
+        migrations.apply_migrations(conn, "sqlite")
+        existing = timer.run("load", load_hashes_sqlite, conn)
+        plan = timer.run("diff", plan_import, entries, existing)
+        if not dry_run:
+            conn.execute("BEGIN")
+            timer.run("write", write_plan_sqlite, conn, plan)
+            timer.run("commit", conn.commit)
+    finally:
+        conn.close()
+    return plan, timer
 
-def init_diary_table_postgres(conn):
+
+def load_hashes_postgres(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT entry_date::text, md5(body) FROM diary_entries")
+        return dict(cur.fetchall())
+
+
+def write_plan_postgres(conn, plan):
+    changed = plan["insert"] + plan["update"]
     with conn.cursor() as cur:
         cur.execute(
             """
-            CREATE TABLE IF NOT EXISTS diary_entries (
-              id BIGSERIAL PRIMARY KEY,
-              period_id INTEGER,
-              entry_date DATE NOT NULL,
-              body TEXT NOT NULL,
-              created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
-              updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
-            )
-            """
-        )
-        cur.execute(
-            """
-            CREATE INDEX IF NOT EXISTS diary_entries_period_id_idx
-            ON diary_entries (period_id DESC, entry_date DESC, id DESC)
+            CREATE TEMP TABLE diary_import_staging (
+              entry_date DATE PRIMARY KEY,
+              period_id INTEGER NOT NULL,
+              body TEXT NOT NULL
+            ) ON COMMIT DROP
             """
         )
+        with cur.copy("COPY diary_import_staging (entry_date, period_id, body) FROM STDIN") as copy:
+            for entry in changed:
+                copy.write_row((entry["entry_date"], entry["period_id"], entry["body"]))
         cur.execute(
             """
-            CREATE INDEX IF NOT EXISTS diary_entries_entry_date_idx
-            ON diary_entries (entry_date DESC, id DESC)
+            INSERT INTO diary_entries (period_id, entry_date, body, updated_at)
+            SELECT period_id, entry_date, body, NOW()
+            FROM diary_import_staging
+            ON CONFLICT (entry_date) DO UPDATE SET
+              period_id = EXCLUDED.period_id,
+              body = EXCLUDED.body,
+              body_html = '',
+              body_html_version = 0,
+              updated_at = EXCLUDED.updated_at
             """
         )
-    conn.commit()
-
-
-def upsert_entries_sqlite(entries, db_path: Path):
-    with sqlite3.connect(db_path) as conn:
-        init_diary_table(conn)
-        for entry in entries:
-            entry_date = datetime.strptime(entry["entry_date"], "%Y-%m-%d").date()
-            period_id = compute_diary_period_id(entry_date)
-            conn.execute("DELETE FROM diary_entries WHERE entry_date = ?", (entry["entry_date"],))
-            conn.execute(
-                """
-                INSERT INTO diary_entries (period_id, entry_date, body)
-                VALUES (?, ?, ?)
-                """,
-                (period_id, entry["entry_date"], entry["body"]),
-            )
-        conn.commit()
-
-
-def upsert_entries_postgres(entries, database_url: str):
+        cur.execute("DELETE FROM diary_periods")
+        cur.execute(REBUILD_DIARY_PERIODS_SQL)
+
+
+def import_entries_postgres(entries, database_url: str, dry_run: bool):
     import psycopg
 
+    timer = PhaseTimer()
     with psycopg.connect(database_url) as conn:
-        init_diary_table_postgres(conn)
-        with conn.cursor() as cur:
-            for entry in entries:
-                entry_date = datetime.strptime(entry["entry_date"], "%Y-%m-%d").date()
-                period_id = compute_diary_period_id(entry_date)
-                cur.execute("DELETE FROM diary_entries WHERE entry_date = %s", (entry_date,))
-                cur.execute(
-                    """
-                    INSERT INTO diary_entries (period_id, entry_date, body, updated_at)
-                    VALUES (%s, %s, %s, NOW())
-                    """,
-                    (period_id, entry_date, entry["body"]),
-                )
-        conn.commit()
+        migrations.apply_migrations(conn, "postgres")
+        existing = timer.run("load", load_hashes_postgres, conn)
+        plan = timer.run("diff", plan_import, entries, existing)
+        if not dry_run:
+            timer.run("write", write_plan_postgres, conn, plan)
+            timer.run("commit", conn.commit)
+    return plan, timer
 
 
 def main():
@@ -162,25 +234,40 @@ def main():
         default="",
         help="PostgreSQL connection URL. If omitted, uses DATABASE_URL from env when present.",
     )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Print the insert/update/unchanged diff without writing anything.",
+    )
     args = parser.parse_args()
 
     source_path = Path(args.source)
     if not source_path.exists():
         raise SystemExit(f"Source file not found: {source_path}")
 
+    started = time.perf_counter()
     entries = parse_diary_text(source_path.read_text(encoding="utf-8"))
     if not entries:
         raise SystemExit("No diary entries found in source file.")
+    entries = prepare_entries(entries)
+    parse_elapsed = time.perf_counter() - started
 
     db_path = Path(args.db)
     database_url = args.database_url.strip() or os.getenv("DATABASE_URL", "").strip()
     if database_url:
-        upsert_entries_postgres(entries, database_url)
-        print(f"Imported {len(entries)} diary entries from {source_path} into PostgreSQL")
-        return
+        plan, timer = import_entries_postgres(entries, database_url, args.dry_run)
+        target = "PostgreSQL"
+    else:
+        plan, timer = import_entries_sqlite(entries, db_path, args.dry_run)
+        target = str(db_path)
+    timer.phases.insert(0, ("parse", parse_elapsed))
 
-    upsert_entries_sqlite(entries, db_path)
-    print(f"Imported {len(entries)} diary entries from {source_path} into {db_path}")
+    print_plan(plan, verbose=args.dry_run)
+    if args.dry_run:
+        print(f"Dry run: nothing written to {target}")
+    else:
+        print(f"Imported {len(entries)} diary entries from {source_path} into {target}")
+    timer.report()
 
 
 if __name__ == "__main__":
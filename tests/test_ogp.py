@@ -0,0 +1,56 @@
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import ogp  # noqa: E402
+
+
+def split_chunks(raw: bytes, first: int, size: int = ogp.CHUNK_SIZE):
+    yield raw[:first]
+    for start in range(first, len(raw), size):
+        yield raw[start:start + size]
+
+
+class ParseOgpStreamTest(unittest.TestCase):
+    def test_site_name_after_image_is_read(self):
+        raw = (
+            b"<html><head>"
+            b'<meta property="og:title" content="Title">'
+            b'<meta property="og:description" content="Description">'
+            b'<meta property="og:image" content="/a.png">'
+            b'<meta property="og:site_name" content="My Site">'
+            b"</head><body></body></html>"
+        )
+        preview, _ = ogp.parse_ogp_stream("https://example.com/a", [raw])
+        self.assertEqual(preview["site_name"], "My Site")
+        self.assertEqual(preview["image_url"], "https://example.com/a.png")
+
+    def test_missing_site_name_stops_at_head_end(self):
+        raw = (
+            b"<html><head>"
+            b'<meta property="og:title" content="Title">'
+            b'<meta property="og:description" content="Description">'
+            b'<meta property="og:image" content="/a.png">'
+            b"</head><body>" + b"x" * 100_000 + b"</body></html>"
+        )
+        preview, bytes_read = ogp.parse_ogp_stream("https://example.com/a", split_chunks(raw, 256, 256))
+        self.assertEqual(preview["site_name"], "example.com")
+        self.assertLess(bytes_read, 2048)
+
+    def test_charset_found_past_a_short_first_chunk(self):
+        raw = (
+            '<html><head><meta charset="shift_jis"><title>日記のタイトル</title></head><body></body></html>'
+        ).encode("shift_jis")
+        preview, _ = ogp.parse_ogp_stream("https://example.com/a", split_chunks(raw, 10, 7))
+        self.assertEqual(preview["title"], "日記のタイトル")
+
+    def test_short_page_without_head_end(self):
+        raw = '<meta charset="shift_jis"><title>短い'.encode("shift_jis")
+        preview, _ = ogp.parse_ogp_stream("https://example.com/a", split_chunks(raw, 5, 5))
+        self.assertEqual(preview["title"], "短い")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,170 @@
+import io
+import logging
+import math
+import os
+
+try:
+    from PIL import Image, ImageOps, UnidentifiedImageError
+except ImportError:
+    Image = None
+    ImageOps = None
+    UnidentifiedImageError = Exception
+
+try:
+    from pillow_heif import register_heif_opener
+except ImportError:
+    register_heif_opener = None
+
+# Decode and encode helpers for timeline uploads. The image worker pool runs these in
+# spawned processes, so this module must stay importable without app.py.
+
+logger = logging.getLogger(__name__)
+
+MAX_BYTES = 8 * 1024 * 1024
+MAX_DIMENSION = 1600
+JPEG_QUALITY = 82
+WEBP_QUALITY = 80
+AVIF_QUALITY = 55
+# Widths offered in srcset; the timeline shows images at up to 420 CSS px.
+VARIANT_WIDTHS = (320, 640, 1024, 1600)
+ALLOWED_FORMATS = {"JPEG", "PNG", "WEBP", "GIF", "HEIF", "HEIC"}
+HEIF_SUPPORTED = register_heif_opener is not None
+
+if HEIF_SUPPORTED:
+    register_heif_opener()
+
+
+class TimelineImageError(ValueError):
+    pass
+
+
+def is_heif_upload(filename: str, mimetype: str) -> bool:
+    image_extension = os.path.splitext(filename or "")[1].lower()
+    return image_extension in {".heic", ".heif"} or (mimetype or "").lower() in {"image/heic", "image/heif"}
+
+
+def _draft_to_max_dimension(image) -> None:
+    # Ask the decoder for the smallest scale that still covers the output size:
+    # JPEG decodes at 1/2, 1/4 or 1/8 in the DCT domain and HEIC picks an embedded
+    # thumbnail when one is large enough. Other formats ignore the request.
+    width, height = image.size
+    scale = MAX_DIMENSION / max(width, height, 1)
+    if scale < 1:
+        image.draft(image.mode, (math.ceil(width * scale), math.ceil(height * scale)))
+
+
+def normalize_upload(upload):
+    # The upload is read from its spool file and decoded once, at reduced scale where possible.
+    if Image is None:
+        raise RuntimeError("Pillow is not installed. Install requirements.txt first.")
+    path = upload["path"]
+    filename = upload["filename"]
+    variants = []
+
+    try:
+        if is_heif_upload(filename, upload["mimetype"]) and not HEIF_SUPPORTED:
+            raise TimelineImageError("HEIC / HEIF を扱う設定が不足しています。")
+        with Image.open(path) as image:
+            image_format = (image.format or "").upper()
+            if image_format not in ALLOWED_FORMATS:
+                raise TimelineImageError("画像は JPEG / PNG / WEBP / GIF / HEIC / HEIF のみ対応です。")
+            if image_format == "GIF":
+                image.load()
+                width, height = image.size
+                with open(path, "rb") as f:
+                    normalized_bytes = f.read()
+                mime_type = Image.MIME.get(image_format, upload["mimetype"] or "application/octet-stream")
+            else:
+                _draft_to_max_dimension(image)
+                image.load()
+                working = image
+                if working.mode not in {"RGB", "RGBA"}:
+                    if "A" in working.getbands():
+                        working = working.convert("RGBA")
+                    else:
+                        working = working.convert("RGB")
+
+                # Shrink before rotating so the transpose copy is output-sized.
+                working.thumbnail((MAX_DIMENSION, MAX_DIMENSION), Image.Resampling.LANCZOS)
+                if ImageOps is not None:
+                    working = ImageOps.exif_transpose(working)
+                width, height = working.size
+
+                output = io.BytesIO()
+                has_alpha = "A" in working.getbands()
+                if has_alpha:
+                    working.save(output, format="WEBP", quality=WEBP_QUALITY, method=6)
+                    image_format = "WEBP"
+                else:
+                    if working.mode != "RGB":
+                        working = working.convert("RGB")
+                    working.save(output, format="JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+                    image_format = "JPEG"
+                normalized_bytes = output.getvalue()
+                mime_type = Image.MIME.get(image_format, upload["mimetype"] or "application/octet-stream")
+
+                if len(normalized_bytes) <= MAX_BYTES:
+                    try:
+                        variants = _render_variants_from(working, image_format, filename)
+                    except (ValueError, OSError) as exc:
+                        logger.warning("Failed to render image variants for %s: %s", filename, exc)
+    except TimelineImageError:
+        raise
+    except (UnidentifiedImageError, ValueError, EOFError, SyntaxError, RuntimeError, OSError) as exc:
+        raise TimelineImageError("画像ファイルを読み取れませんでした。") from exc
+
+    if len(normalized_bytes) > MAX_BYTES:
+        raise TimelineImageError("圧縮後も画像サイズが大きすぎます。もう少し小さい画像を使ってください。")
+
+    return {
+        "bytes": normalized_bytes,
+        "mime_type": mime_type,
+        "width": int(width),
+        "height": int(height),
+        "filename": filename,
+        "variants": variants,
+    }
+
+
+def variant_formats():
+    if Image is None:
+        return []
+    Image.init()
+    # Listed smallest-first; AVIF needs a Pillow build with libavif.
+    return [image_format for image_format in ("AVIF", "WEBP") if image_format in Image.SAVE]
+
+
+def render_variants(raw_bytes: bytes, filename: str = "upload"):
+    with Image.open(io.BytesIO(raw_bytes)) as image:
+        source_format = (image.format or "").upper()
+        if source_format == "GIF":
+            return []
+        working = ImageOps.exif_transpose(image)
+        working = working.convert("RGBA" if "A" in working.getbands() else "RGB")
+    return _render_variants_from(working, source_format, filename)
+
+
+def _render_variants_from(working, source_format: str, filename: str):
+    variants = []
+    full_width, full_height = working.size
+    widths = sorted({width for width in VARIANT_WIDTHS if width < full_width} | {full_width})
+    for image_format in variant_formats():
+        for width in widths:
+            if image_format == source_format and width == full_width:
+                # The stored original already fills this slot.
+                continue
+            height = max(1, round(full_height * width / full_width))
+            resized = working if width == full_width else working.resize((width, height), Image.Resampling.LANCZOS)
+            output = io.BytesIO()
+            if image_format == "AVIF":
+                resized.save(output, format="AVIF", quality=AVIF_QUALITY)
+            else:
+                resized.save(output, format="WEBP", quality=WEBP_QUALITY, method=6)
+            variants.append({
+                "bytes": output.getvalue(),
+                "mime_type": Image.MIME[image_format],
+                "width": width,
+                "height": height,
+                "filename": f"{width}w-{filename}",
+            })
+    return variants